@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+'''
+Pomiar zimnego startu SimpleMarkupConverter.
+
+Każdy pomiar wykonywany jest w osobnym procesie interpretera:
+ - czas importu main.py,
+ - czas Translator.__init__ każdej klasy (osobno budowa lexera i parsera),
+   bez tablic (pusty katalog tablic) i z gotowymi tablicami,
+ - opóźnienie pierwszej konwersji dla każdej pary wejście/wyjście.
+
+Wynik (mediana z kilku powtórzeń, w sekundach) jest zapisywany jako JSON.
+
+Użycie: python3 benchmarks/cold_start.py [-o wynik.json] [-r powtórzenia]
+'''
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# przykładowe dokumenty dla formatów wejściowych
+SAMPLES = {
+    'txt2tags': os.path.join(ROOT, 'tests', 'document.t2t'),
+    'textile': os.path.join(ROOT, 'tests', 'document.textile'),
+    'pass': os.path.join(ROOT, 'tests', 'document.t2t'),
+}
+
+DOKUWIKI_SAMPLE = '''====== DokuWiki ======
+
+**DokuWiki** to //prosty **jezyk**// znacznikow __do //formatowania//__ tekstu.
+
+===== Lamanie linii =====
+
+Pierwsza linia\\\\
+druga linia
+
+* pierwszy
+  * zagniezdzony
+* drugi
+
+- numer jeden
+- numer dwa
+'''
+
+
+def worker_import():
+    start = time.perf_counter()
+    import main
+    return {'import': time.perf_counter() - start}
+
+
+def worker_construct(path):
+    from translator import registry
+    from translator import tables
+
+    timings = {'lex': 0.0, 'yacc': 0.0}
+
+    def timed(name, func):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings[name] += time.perf_counter() - start
+        return wrapper
+
+    tables.build_lexer = timed('lex', tables.build_lexer)
+    tables.build_parser = timed('yacc', tables.build_parser)
+
+    translator_type = registry.load_class(path)
+    start = time.perf_counter()
+    translator_type()
+    timings['init'] = time.perf_counter() - start
+    return timings
+
+
+def worker_convert(input_t, output_t, sample):
+    start = time.perf_counter()
+    from main import SimpleMarkupConverter
+    imported = time.perf_counter()
+    # komunikaty o błędach konwersji nie mogą trafić do wyniku JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        smc = SimpleMarkupConverter(input=sample, input_t=input_t, output_t=output_t)
+        constructed = time.perf_counter()
+        smc.parse()
+        done = time.perf_counter()
+    return {
+        'import': imported - start,
+        'construct': constructed - imported,
+        'convert': done - constructed,
+        'total': done - start,
+    }
+
+
+def run_worker(args, table_dir, stdin=None):
+    env = dict(os.environ, SMC_TABLE_DIR=table_dir)
+    out = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--worker'] + args,
+                                  input=stdin, cwd=ROOT, env=env, stderr=subprocess.DEVNULL,
+                                  universal_newlines=True)
+    return json.loads(out)
+
+
+def median(results):
+    return dict((key, statistics.median(r[key] for r in results)) for key in results[0])
+
+
+def measure(args, repeat, warm_dir=None, stdin=None):
+    '''
+    Mediana z powtórzeń; bez warm_dir każde uruchomienie dostaje pusty katalog tablic.
+    '''
+    results = []
+    for _ in range(repeat):
+        if warm_dir:
+            results.append(run_worker(args, warm_dir, stdin))
+        else:
+            cold_dir = tempfile.mkdtemp()
+            try:
+                results.append(run_worker(args, cold_dir, stdin))
+            finally:
+                shutil.rmtree(cold_dir)
+    return median(results)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Cold start benchmark')
+    ap.add_argument('-o', '--output_file', help='JSON result file (default: stdout)')
+    ap.add_argument('-r', '--repeat', type=int, default=5, help='runs per measurement')
+    res = ap.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from main import SimpleMarkupConverter, build_tables, extra_translators
+
+    warm_dir = tempfile.mkdtemp()
+    try:
+        # komunikaty budowania tablic (także ostrzeżenia PLY) są pomijane
+        with open(os.devnull, 'w') as devnull:
+            with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+                build_tables(warm_dir)
+
+        result = {
+            'python': sys.version.split()[0],
+            'repeat': res.repeat,
+            'import': measure(['import'], res.repeat, warm_dir)['import'],
+            'construct': {},
+            'first_conversion': {},
+        }
+
+        for path in SimpleMarkupConverter.translator_paths() + extra_translators:
+            result['construct'][path] = {
+                'cold': measure(['construct', path], res.repeat),
+                'warm': measure(['construct', path], res.repeat, warm_dir),
+            }
+
+        translator_map = SimpleMarkupConverter.translator_map
+        for input_t in sorted(translator_map):
+            if SimpleMarkupConverter.IN not in translator_map[input_t]:
+                continue
+            if input_t in SAMPLES:
+                with open(SAMPLES[input_t]) as f:
+                    sample = f.read()
+            else:
+                sample = DOKUWIKI_SAMPLE
+            for output_t in sorted(translator_map):
+                if SimpleMarkupConverter.OUT not in translator_map[output_t]:
+                    continue
+                args = ['convert', input_t, output_t]
+                result['first_conversion']['%s %s' % (input_t, output_t)] = {
+                    'cold': measure(args, res.repeat, stdin=sample),
+                    'warm': measure(args, res.repeat, warm_dir, stdin=sample),
+                }
+    finally:
+        shutil.rmtree(warm_dir)
+
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if res.output_file:
+        with open(res.output_file, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--worker']:
+        sys.path.insert(0, ROOT)
+        mode, args = sys.argv[2], sys.argv[3:]
+        if mode == 'import':
+            result = worker_import()
+        elif mode == 'construct':
+            result = worker_construct(*args)
+        else:
+            result = worker_convert(args[0], args[1], sys.stdin.read())
+        print(json.dumps(result))
+    else:
+        main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+'''
+Pomiar pamięci wyniku parsowania dużych dokumentów.
+
+Dla każdego formatu wejściowego i rozmiaru dokumentu porównywany jest
+dotychczasowy wynik - tekst HTML sklejany z napisów (run) - z drzewem
+dokumentu (document): pamięć zajmowana przez gotowy wynik, szczyt pamięci
+w trakcie parsowania (tracemalloc), czas parsowania i liczba zdarzeń
+(tablic) drzewa.
+
+Użycie: python3 benchmarks/memory.py [-o wynik.json] [-s 1,4]
+'''
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# przykładowe dokumenty powielane do zadanego rozmiaru
+SAMPLES = {
+    'txt2tags': os.path.join(ROOT, 'tests', 'document.t2t'),
+    'textile': os.path.join(ROOT, 'tests', 'document.textile'),
+}
+
+DOKUWIKI_SAMPLE = '''====== DokuWiki ======
+
+**DokuWiki** to //prosty **jezyk**// znacznikow __do //formatowania//__ tekstu.
+
+===== Lamanie linii =====
+
+Pierwsza linia\\\\
+druga linia
+
+* pierwszy
+  * zagniezdzony
+* drugi
+
+- numer jeden
+- numer dwa
+'''
+
+
+def sample(input_t, size):
+    if input_t in SAMPLES:
+        with open(SAMPLES[input_t]) as f:
+            text = f.read()
+    else:
+        text = DOKUWIKI_SAMPLE
+    text = text.strip('\n') + '\n\n'
+    return text * max(1, size // len(text))
+
+
+def measure(func, text):
+    '''
+    Pamięć zajmowana przez wynik func(text) i szczyt pamięci w trakcie
+    wywołania (w bajtach) oraz czas wywołania - mierzony osobno,
+    bo tracemalloc wielokrotnie spowalnia parsowanie.
+    '''
+    gc.collect()
+    start = time.perf_counter()
+    func(text)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    result = func(text)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {'retained': retained, 'peak': peak, 'time': elapsed}
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Parse result memory benchmark')
+    ap.add_argument('-o', '--output_file', help='JSON result file (default: stdout)')
+    ap.add_argument('-s', '--sizes', default='1,4', help='document sizes in MB, comma separated')
+    res = ap.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from translator import registry
+    from translator import tables
+
+    table_dir = tempfile.mkdtemp()
+    tables.table_dir = table_dir
+    sizes = [float(s) for s in res.sizes.split(',')]
+    paths = {
+        'txt2tags': 'translator.txt2tags.Txt2TagsToHTML',
+        'textile': 'translator.textile_to_html.TextileToHTML',
+        'dokuwiki': 'translator.dokuwiki_to_html.DokuWikiToHTML',
+    }
+
+    result = {'python': sys.version.split()[0], 'documents': {}}
+    # komunikaty budowania tablic (także ostrzeżenia PLY) są pomijane
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            translators = dict((input_t, registry.get(path)) for input_t, path in paths.items())
+
+    for input_t in sorted(translators):
+        t = translators[input_t]
+        for size in sizes:
+            text = sample(input_t, int(size * 1024 * 1024))
+            html, html_stats = measure(t.run, text)
+            del html
+            tree, tree_stats = measure(t.document, text)
+            tree_stats['events'] = len(tree.kinds)
+            del tree
+            result['documents']['%s %sMB' % (input_t, size)] = {
+                'source': len(text),
+                'html': html_stats,
+                'tree': tree_stats,
+            }
+
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if res.output_file:
+        with open(res.output_file, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
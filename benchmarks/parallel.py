@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+'''
+Pomiar równoległej konwersji części jednego dokumentu
+(SimpleMarkupConverter.iter_convert z processes).
+
+Dla każdej liczby procesów mierzony jest czas konwersji dużego dokumentu
+i przyspieszenie względem konwersji części w jednym procesie oraz
+sprawdzane, czy wynik jest identyczny (bajt po bajcie). Wynik jest
+zapisywany jako JSON.
+
+Użycie: python3 benchmarks/parallel.py [-o wynik.json] [-i dokuwiki] [-f html] [-s 8] [-c 1048576] [-j 2,4]
+'''
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+from memory import ROOT, sample
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Parallel chunked conversion benchmark')
+    ap.add_argument('-o', '--output_file', help='JSON result file (default: stdout)')
+    ap.add_argument('-i', '--input_format', default='dokuwiki', help='input format')
+    ap.add_argument('-f', '--output_format', default='html', help='output format')
+    ap.add_argument('-s', '--size', type=float, default=8, help='document size in MB')
+    ap.add_argument('-c', '--chunk_size', type=int, default=1024 * 1024, help='minimum part size in characters')
+    ap.add_argument('-j', '--jobs', default='2,4', help='numbers of processes, comma separated')
+    res = ap.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import logging
+    from main import SimpleMarkupConverter
+    from translator import tables
+
+    logging.disable(logging.CRITICAL)
+    # procesy robocze dziedziczą katalog tablic (i zbudowane translatory)
+    tables.table_dir = tempfile.mkdtemp()
+    # komunikaty budowania tablic (także ostrzeżenia PLY) są pomijane
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            smc = SimpleMarkupConverter(input_t=res.input_format, output_t=res.output_format, use_direct=False)
+    text = sample(res.input_format, int(res.size * 1024 * 1024))
+
+    start = time.perf_counter()
+    expected = ''.join(smc.iter_convert(text, res.chunk_size))
+    sequential = time.perf_counter() - start
+
+    result = {
+        'python': sys.version.split()[0],
+        'cpus': os.cpu_count(),
+        'source': len(text),
+        'chunk_size': res.chunk_size,
+        'sequential_time': sequential,
+        'processes': {},
+    }
+    for jobs in [int(j) for j in res.jobs.split(',')]:
+        start = time.perf_counter()
+        output = ''.join(smc.iter_convert(text, res.chunk_size, jobs))
+        elapsed = time.perf_counter() - start
+        result['processes'][str(jobs)] = {
+            'time': elapsed,
+            'speedup': sequential / elapsed,
+            'identical': output == expected,
+        }
+
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if res.output_file:
+        with open(res.output_file, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
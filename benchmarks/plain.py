@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+'''
+Pomiar szybkiej ścieżki akapitów bez znaczników w translatorach wejściowych.
+
+Dla każdego translatora mierzony jest czas run() dokumentów, w których
+podana część akapitów nie ma znaczników (reszta to przykładowy dokument),
+z szybką ścieżką i bez niej, oraz liczba bloków, które jej użyły
+(block_stats). Wynik (najlepszy z kilku powtórzeń) jest zapisywany jako JSON.
+
+Użycie: python3 benchmarks/plain.py [-o wynik.json] [-s 1] [-r 3] [-p 0,50,90,100]
+'''
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+from memory import ROOT, sample
+
+TRANSLATORS = {
+    'txt2tags': 'translator.txt2tags.Txt2TagsToHTML',
+    'textile': 'translator.textile_to_html.TextileToHTML',
+    'dokuwiki': 'translator.dokuwiki_to_html.DokuWikiToHTML',
+}
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do '
+         'eiusmod tempor incididunt ut labore et dolore magna aliqua').split()
+
+
+def plain_paragraph(n):
+    lines = [' '.join(WORDS[(n + i + j) % len(WORDS)] for j in range(12)) for i in range(6)]
+    return '\n'.join(lines) + '\n\n'
+
+
+def document(input_t, size, percent):
+    # bloki przykładowego dokumentu przeplatane akapitami bez znaczników
+    marked = [block + '\n\n' for block in sample(input_t, 64 * 1024).split('\n\n') if block.strip()]
+    parts = []
+    length = 0
+    n = 0
+    while length < size:
+        if n % 100 < percent:
+            part = plain_paragraph(n)
+        else:
+            part = marked[n % len(marked)]
+        parts.append(part)
+        length += len(part)
+        n += 1
+    return ''.join(parts)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Plain paragraph fast path benchmark')
+    ap.add_argument('-o', '--output_file', help='JSON result file (default: stdout)')
+    ap.add_argument('-s', '--size', type=float, default=1, help='document size in MB')
+    ap.add_argument('-r', '--repeats', type=int, default=3, help='number of repetitions')
+    ap.add_argument('-p', '--percent', default='0,50,90,100',
+                    help='share of paragraphs without markup, comma separated')
+    res = ap.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import logging
+    from translator import registry
+    from translator import tables
+
+    logging.disable(logging.CRITICAL)
+    tables.table_dir = tempfile.mkdtemp()
+    # komunikaty budowania tablic (także ostrzeżenia PLY) są pomijane
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            translators = dict((name, registry.get(path)) for name, path in TRANSLATORS.items())
+
+    result = {'python': sys.version.split()[0], 'translators': {}}
+    for name in sorted(translators):
+        t = translators[name]
+        runs = result['translators'][name] = {}
+        for percent in [int(p) for p in res.percent.split(',')]:
+            text = document(name, int(res.size * 1024 * 1024), percent)
+            best = {}
+            for _ in range(res.repeats):
+                # na przemian - najlepszy czas każdego wariantu
+                for fast in [False, True]:
+                    t.plain_fast_path = fast
+                    t.block_stats = {'plain': 0, 'parsed': 0}
+                    start = time.perf_counter()
+                    t.run(text)
+                    elapsed = time.perf_counter() - start
+                    best[fast] = min(best.get(fast, elapsed), elapsed)
+            t.plain_fast_path = True
+            runs['%d%%' % percent] = {
+                'source': len(text),
+                'parse_time': best[False],
+                'fast_path_time': best[True],
+                'speedup': best[False] / best[True],
+                'blocks': t.block_stats,
+            }
+
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if res.output_file:
+        with open(res.output_file, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+'''
+Pomiar pamięci odczytu dużego pliku wejściowego w CLI.
+
+Dla każdego sposobu odczytu - open().read() w trybie tekstowym (dawny),
+read_text (mmap, kawałki złączone w jeden napis) i read_chunks (mmap,
+dekodowanie kawałkami) - w osobnym procesie mierzony jest szczyt pamięci
+(ru_maxrss) i czas. Wynik jest zapisywany jako JSON.
+
+Użycie: python3 benchmarks/read.py [-o wynik.json] [-s 256] [--crlf]
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from memory import ROOT, sample
+
+# kod procesu mierzącego - jeden sposób odczytu pliku sys.argv[1]
+READERS = {
+    'none': 'pass',
+    'read': 'text = open(path).read()',
+    'read_text': 'text = main.read_text(open(path, "rb"))',
+    'read_chunks': 'length = sum(len(chunk) for chunk in main.read_chunks(open(path, "rb")))',
+}
+
+MEASURE = '''
+import resource, sys, time
+sys.path.insert(0, %r)
+import main
+path = sys.argv[1]
+start = time.perf_counter()
+%s
+elapsed = time.perf_counter() - start
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, elapsed)
+'''
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Input reading memory benchmark')
+    ap.add_argument('-o', '--output_file', help='JSON result file (default: stdout)')
+    ap.add_argument('-s', '--size', type=float, default=256, help='input file size in MB')
+    ap.add_argument('--crlf', action='store_true', default=False, help='input with \\r\\n line ends')
+    res = ap.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.t2t')
+    try:
+        with os.fdopen(fd, 'w', newline='\r\n' if res.crlf else None) as f:
+            block = sample('txt2tags', 1024 * 1024)
+            for _ in range(int(res.size)):
+                f.write(block)
+        result = {'python': sys.version.split()[0], 'source': os.path.getsize(path), 'crlf': res.crlf,
+                  'readers': {}}
+        for name, code in sorted(READERS.items()):
+            out = subprocess.check_output([sys.executable, '-c', MEASURE % (ROOT, code), path])
+            rss, elapsed = out.split()
+            result['readers'][name] = {'max_rss': int(rss), 'time': float(elapsed)}
+    finally:
+        os.remove(path)
+
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if res.output_file:
+        with open(res.output_file, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
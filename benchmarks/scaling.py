@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+'''
+Pomiar skalowania czasu konwersji z rozmiarem dokumentu.
+
+Dla każdego formatu wejściowego mierzony jest czas pełnej konwersji
+(do txt2tags, przez drzewo dokumentu i przez HTML) dokumentów o rosnącym
+rozmiarze w dwóch postaciach:
+ blocks    - przykładowy dokument powielony (tysiące bloków),
+ paragraph - jeden akapit z bardzo wielu linii.
+
+Przy liniowym czasie konwersji czas na bajt nie rośnie z rozmiarem;
+gdy dla największego dokumentu jest większy niż max_ratio razy czas na
+bajt dla najmniejszego, program kończy się kodem 1.
+
+Użycie: python3 benchmarks/scaling.py [-o wynik.json] [-s 1,10] [-m 2.0]
+'''
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+from memory import ROOT, sample
+
+# linia powielana w jednym akapicie
+PARAGRAPH_LINES = {
+    'txt2tags': 'word **bold** //italic// __under__ end\n',
+    'textile': 'word *bold* _italic_ +under+ end\n',
+    'dokuwiki': 'word **bold** //italic// __under__ end\n',
+}
+
+
+def paragraph(input_t, size):
+    line = PARAGRAPH_LINES[input_t]
+    return line * max(1, size // len(line))
+
+
+SHAPES = {'blocks': sample, 'paragraph': paragraph}
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Conversion time scaling benchmark')
+    ap.add_argument('-o', '--output_file', help='JSON result file (default: stdout)')
+    ap.add_argument('-s', '--sizes', default='1,10', help='document sizes in MB, comma separated')
+    ap.add_argument('-m', '--max_ratio', type=float, default=2.0,
+                    help='allowed growth of time per byte between the smallest and the largest size')
+    res = ap.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import logging
+    from main import SimpleMarkupConverter
+    from translator import tables
+
+    logging.disable(logging.CRITICAL)
+    tables.table_dir = tempfile.mkdtemp()
+    sizes = [float(s) for s in res.sizes.split(',')]
+
+    converters = {}
+    # komunikaty budowania tablic (także ostrzeżenia PLY) są pomijane
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            for input_t in sorted(PARAGRAPH_LINES):
+                for path, use_document in [('tree', True), ('html', False)]:
+                    converters[input_t, path] = SimpleMarkupConverter(
+                        input_t=input_t, output_t='txt2tags', use_document=use_document, use_direct=False)
+
+    result = {'python': sys.version.split()[0], 'max_ratio': res.max_ratio, 'runs': {}}
+    exit_code = 0
+    for (input_t, path), smc in sorted(converters.items()):
+        for shape in sorted(SHAPES):
+            times = []
+            for size in sizes:
+                text = SHAPES[shape](input_t, int(size * 1024 * 1024))
+                start = time.perf_counter()
+                code, output = smc.convert(text)
+                elapsed = time.perf_counter() - start
+                del output
+                times.append({'source': len(text), 'time': elapsed, 'code': code,
+                              'us_per_kb': elapsed * 1e6 / (len(text) / 1024.0)})
+            ratio = times[-1]['us_per_kb'] / times[0]['us_per_kb']
+            linear = ratio <= res.max_ratio and all(t['code'] == 0 for t in times)
+            if not linear:
+                exit_code = 1
+            result['runs']['%s %s %s' % (input_t, path, shape)] = {
+                'sizes': times, 'ratio': ratio, 'linear': linear}
+
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if res.output_file:
+        with open(res.output_file, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
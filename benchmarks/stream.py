@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+'''
+Pomiar konwersji strumieniowej (SimpleMarkupConverter.iter_convert).
+
+Dla każdego formatu wejściowego porównywana jest konwersja całego dokumentu
+(convert) z konwersją częściami: czas do pierwszej części wyniku, czas
+całości i szczyt pamięci (tracemalloc, części wyniku są od razu odrzucane).
+Wynik jest zapisywany jako JSON.
+
+Użycie: python3 benchmarks/stream.py [-o wynik.json] [-s 4] [-c 65536] [-f textile]
+'''
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from memory import ROOT, sample
+
+
+def stream(smc, text, chunk_size):
+    '''
+    Czas do pierwszej części, czas całości i liczba części.
+    '''
+    start = time.perf_counter()
+    first = None
+    parts = 0
+    for _ in smc.iter_convert(text, chunk_size):
+        if first is None:
+            first = time.perf_counter() - start
+        parts += 1
+    return first, time.perf_counter() - start, parts
+
+
+def peak(func):
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Streaming conversion benchmark')
+    ap.add_argument('-o', '--output_file', help='JSON result file (default: stdout)')
+    ap.add_argument('-s', '--size', type=float, default=4, help='document size in MB')
+    ap.add_argument('-c', '--chunk_size', type=int, default=64 * 1024, help='minimum part size in characters')
+    ap.add_argument('-f', '--output_format', default='textile', help='output format')
+    res = ap.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import logging
+    from main import SimpleMarkupConverter
+    from translator import tables
+
+    logging.disable(logging.CRITICAL)
+    tables.table_dir = tempfile.mkdtemp()
+    result = {'python': sys.version.split()[0], 'chunk_size': res.chunk_size, 'documents': {}}
+    for input_t in ['dokuwiki', 'textile', 'txt2tags']:
+        # komunikaty budowania tablic (także ostrzeżenia PLY) są pomijane
+        with open(os.devnull, 'w') as devnull:
+            with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+                smc = SimpleMarkupConverter(input_t=input_t, output_t=res.output_format, use_direct=False)
+        text = sample(input_t, int(res.size * 1024 * 1024))
+
+        start = time.perf_counter()
+        smc.convert(text)
+        convert_time = time.perf_counter() - start
+        first, stream_time, parts = stream(smc, text, res.chunk_size)
+
+        result['documents'][input_t] = {
+            'source': len(text),
+            'parts': parts,
+            'convert_time': convert_time,
+            'first_part_time': first,
+            'stream_time': stream_time,
+            'convert_peak': peak(lambda: smc.convert(text)),
+            'stream_peak': peak(lambda: stream(smc, text, res.chunk_size)),
+        }
+
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if res.output_file:
+        with open(res.output_file, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+'''
+Pomiar kosztu komunikatów debug w regułach lexera i parsera.
+
+Dla każdego translatora mierzona jest liczba tokenów na sekundę przy
+pełnym przebiegu (lexer i parser):
+ untraced - poziom INFO, funkcje t_* i p_* bez wywołań self.log.debug
+            (domyślne zachowanie),
+ traced   - poziom INFO, oryginalne funkcje (strip_trace = False) -
+            każde wywołanie self.log.debug sprawdza tylko poziom,
+ debug    - poziom DEBUG, komunikaty formatowane i odrzucane przez
+            pusty handler.
+
+Wynik (najlepszy czas z kilku powtórzeń, tryby mierzone na przemian)
+jest zapisywany jako JSON.
+
+Użycie: python3 benchmarks/trace.py [-o wynik.json] [-s 0.5] [-r 3]
+'''
+
+import argparse
+import contextlib
+import copy
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from memory import ROOT, sample
+
+TRANSLATORS = {
+    'txt2tags': 'translator.txt2tags.Txt2TagsToHTML',
+    'textile': 'translator.textile_to_html.TextileToHTML',
+    'dokuwiki': 'translator.dokuwiki_to_html.DokuWikiToHTML',
+    'html (txt2tags)': 'translator.html_to_t2t.HtmlToTxt2Tags',
+}
+
+MODES = ['untraced', 'traced', 'debug']
+
+
+def count_tokens(translator, text):
+    lexer = copy.copy(translator.my_lex)
+    lexer.lexstatestack = []
+    lexer.begin('INITIAL')
+    lexer.context = translator.new_context()
+    lexer.input(text + '\n\n\n')
+    return sum(1 for _ in iter(lexer.token, None))
+
+
+def run_mode(t, mode, text, root, handler):
+    t.strip_trace = mode == 'untraced'
+    if mode == 'debug':
+        root.handlers, saved = [handler], root.handlers
+        root.setLevel(logging.DEBUG)
+    try:
+        start = time.perf_counter()
+        t.run(text)
+        return time.perf_counter() - start
+    finally:
+        t.strip_trace = True
+        if mode == 'debug':
+            root.handlers = saved
+            root.setLevel(logging.INFO)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Debug logging overhead benchmark')
+    ap.add_argument('-o', '--output_file', help='JSON result file (default: stdout)')
+    ap.add_argument('-s', '--size', type=float, default=0.5, help='document size in MB')
+    ap.add_argument('-r', '--repeats', type=int, default=3, help='number of repetitions')
+    res = ap.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from translator import registry
+    from translator import tables
+
+    tables.table_dir = tempfile.mkdtemp()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    # komunikaty budowania tablic (także ostrzeżenia PLY) są pomijane
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            translators = dict((name, registry.get(path)) for name, path in TRANSLATORS.items())
+            t2t = registry.get('translator.txt2tags.Txt2TagsToHTML')
+
+    # pusty handler - w trybie debug mierzone jest formatowanie, nie zapis
+    handler = logging.NullHandler()
+    result = {'python': sys.version.split()[0], 'translators': {}}
+    size = int(res.size * 1024 * 1024)
+    for name in sorted(translators):
+        t = translators[name]
+        if name.startswith('html'):
+            text = t2t.run(sample('txt2tags', size))
+        else:
+            text = sample(name, size)
+        tokens = count_tokens(t, text)
+        t.untraced_parser()  # budowa funkcji bez komunikatów debug
+
+        # tryby na przemian w każdym powtórzeniu - najlepszy czas każdego z nich
+        best = {}
+        for _ in range(res.repeats):
+            for mode in MODES:
+                elapsed = run_mode(t, mode, text, root, handler)
+                best[mode] = min(best.get(mode, elapsed), elapsed)
+        modes = dict((mode, {'time': best[mode], 'tokens_per_s': tokens / best[mode]}) for mode in MODES)
+
+        for mode in ['traced', 'debug']:
+            modes[mode]['slowdown'] = modes[mode]['time'] / modes['untraced']['time']
+        result['translators'][name] = {'source': len(text), 'tokens': tokens, 'modes': modes}
+
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if res.output_file:
+        with open(res.output_file, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
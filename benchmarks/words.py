@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# -*- coding: utf-8 -*-
+
+'''
+Mikrobenchmark lexerów na dokumentach złożonych prawie wyłącznie ze słów.
+
+Dla każdego translatora mierzona jest liczba tokenów na sekundę samego
+lexera oraz czas pełnego przebiegu (lexer i parser) dokumentu z długich
+akapitów zwykłych słów; co kilka linii słowo kończy się łamaniem linii
+(w txt2tags i DokuWiki), a co kilka akapitów jest nagłówek.
+
+Wynik (najlepszy z kilku powtórzeń) jest zapisywany jako JSON.
+
+Użycie: python3 benchmarks/words.py [-o wynik.json] [-s 1] [-r 3]
+'''
+
+import argparse
+import contextlib
+import copy
+import json
+import os
+import sys
+import tempfile
+import time
+
+from memory import ROOT
+
+TRANSLATORS = {
+    'txt2tags': 'translator.txt2tags.Txt2TagsToHTML',
+    'textile': 'translator.textile_to_html.TextileToHTML',
+    'dokuwiki': 'translator.dokuwiki_to_html.DokuWikiToHTML',
+    'html': 'translator.html_to_t2t.HtmlToTxt2Tags',
+}
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do '
+         'eiusmod tempor incididunt ut labore et dolore magna aliqua').split()
+
+HEADINGS = {
+    'txt2tags': '== %s ==\n\n',
+    'textile': 'h2. %s\n\n',
+    'dokuwiki': '===== %s =====\n\n',
+    'html': '<h2>%s</h2>',
+}
+
+
+def paragraph(input_t, n):
+    lines = []
+    for i in range(8):
+        line = ' '.join(WORDS[(n + i + j) % len(WORDS)] for j in range(12))
+        if i % 4 == 1 and input_t in ('txt2tags', 'dokuwiki'):
+            line += '\\\\'
+        lines.append(line)
+    if input_t == 'html':
+        return '<p>%s</p>' % ' '.join(lines)
+    return '\n'.join(lines) + '\n\n'
+
+
+def document(input_t, size):
+    parts = []
+    length = 0
+    n = 0
+    while length < size:
+        part = paragraph(input_t, n)
+        if n % 5 == 0:
+            part = HEADINGS[input_t] % WORDS[n % len(WORDS)] + part
+        parts.append(part)
+        length += len(part)
+        n += 1
+    return ''.join(parts)
+
+
+def lex_tokens(translator, text):
+    '''
+    Liczba tokenów i czas samego lexera (funkcje t_* bez komunikatów debug,
+    tak jak w Translator.parse).
+    '''
+    lexer = copy.copy(translator.untraced_parser()[0])
+    lexer.lexstatestack = []
+    lexer.begin('INITIAL')
+    lexer.context = translator.new_context()
+    lexer.input(text + '\n\n\n')
+    start = time.perf_counter()
+    tokens = sum(1 for _ in iter(lexer.token, None))
+    return tokens, time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Word-heavy lexer microbenchmark')
+    ap.add_argument('-o', '--output_file', help='JSON result file (default: stdout)')
+    ap.add_argument('-s', '--size', type=float, default=1, help='document size in MB')
+    ap.add_argument('-r', '--repeats', type=int, default=3, help='number of repetitions')
+    res = ap.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import logging
+    from translator import registry
+    from translator import tables
+
+    logging.disable(logging.CRITICAL)
+    tables.table_dir = tempfile.mkdtemp()
+    # komunikaty budowania tablic (także ostrzeżenia PLY) są pomijane
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            translators = dict((name, registry.get(path)) for name, path in TRANSLATORS.items())
+
+    result = {'python': sys.version.split()[0], 'translators': {}}
+    for name in sorted(translators):
+        t = translators[name]
+        text = document(name, int(res.size * 1024 * 1024))
+        lex_time = run_time = None
+        for _ in range(res.repeats):
+            tokens, elapsed = lex_tokens(t, text)
+            lex_time = elapsed if lex_time is None else min(lex_time, elapsed)
+            start = time.perf_counter()
+            t.run(text)
+            elapsed = time.perf_counter() - start
+            run_time = elapsed if run_time is None else min(run_time, elapsed)
+        result['translators'][name] = {
+            'source': len(text),
+            'tokens': tokens,
+            'lex_time': lex_time,
+            'lex_tokens_per_s': tokens / lex_time,
+            'run_time': run_time,
+        }
+
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if res.output_file:
+        with open(res.output_file, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -17,16 +17,17 @@
 # You should have received a copy of the GNU General Public License
 # along with SimpleMarkupConverter.  If not, see <http://www.gnu.org/licenses/>.
 
-from ply import lex
-from translator.dummy import PassTranslator
-from translator.txt2tags import Txt2TagsToHTML
-from translator.html_to_t2t import HtmlToTxt2Tags
-from translator.textile_to_html import TextileToHTML
-from translator.html_to_textile import HtmlToTextile
-from translator.dokuwiki_to_html import DokuWikiToHTML
-from translator.html_to_dokuwiki import HtmlToDokuWiki
+from translator import registry
 import argparse
+import codecs
+import contextlib
+import io
+import locale
 import logging
+import mmap
+import os
+import sys
+import tempfile
 
 class Exit(object):
     SUCCESS = 0
@@ -35,9 +36,34 @@ class Exit(object):
     TRANSLATION_ERROR = 3
     PARSER_CONSTRUCTION_FAIL = 4
     NO_INPUT = 5
+    STALE_TABLES = 6
     
+
+class ConversionError(Exception):
+    '''
+    Błąd konwersji strumieniowej (SimpleMarkupConverter.iter_convert);
+    exit_code - kod wyjścia (Exit).
+    '''
+
+    def __init__(self, message, exit_code=Exit.TRANSLATION_ERROR):
+        super().__init__(message)
+        self.exit_code = exit_code
+
     
 class SimpleMarkupConverter(object):
+    '''
+    Konwerter dla jednej pary formatów wejście/wyjście.
+    
+    Translatory są budowane raz, w konstruktorze; metodę convert() można
+    wywoływać dowolnie wiele razy dla kolejnych tekstów. Dawny sposób
+    użycia (input w konstruktorze, parse() i get_output()) nadal działa.
+    '''
+    
+    # tekst wejściowy podany w konstruktorze (dla parse())
+    input = None
+    
+    # kod wyjścia konstrukcji - inny niż SUCCESS oznacza, że konwersja jest niemożliwa
+    status = Exit.SUCCESS
     
     # przechowywany tekst wyjściowy po parse()
     output = ''
@@ -45,24 +71,58 @@ class SimpleMarkupConverter(object):
     # flaga, czy wykonano już parsowanie
     is_parsed = False
 
+    # konwersja przez drzewo dokumentu, gdy obie strony je obsługują
+    # (False - zawsze przez tekst HTML i drugi translator)
+    use_document = True
+
+    # konwersja bezpośrednim translatorem pary formatów, jeśli istnieje
+    use_direct = True
+
+    # pamięć podręczna wyników translatora wejściowego
+    # (translator.cache.IntermediateCache, może być wspólna dla wielu konwerterów)
+    cache = None
+
+    # najmniejsza długość części tekstu w konwersji strumieniowej (iter_convert)
+    chunk_size = 64 * 1024
+
     # stałe kierunku translacji
     IN = "input"
     OUT = "output"
+    # bezpośrednie translatory: format wyjściowy -> ścieżka importu klasy
+    DIRECT = "direct"
     
-    # przechowuje odwzorowanie kodu_<input/output> -> klasa translatora
+    # przechowuje odwzorowanie kodu_<input/output> -> ścieżka importu klasy translatora
+    # (moduły translatorów i PLY są importowane dopiero przy użyciu, przez rejestr)
     translator_map = {
                       "pass":
-                      {IN: PassTranslator, OUT: PassTranslator },
+                      {IN: "translator.dummy.PassTranslator", OUT: "translator.dummy.PassTranslator" },
                       "html":
-                      {OUT: PassTranslator},
+                      {OUT: "translator.dummy.PassTranslator"},
                       "txt2tags":
-                      {IN: Txt2TagsToHTML, OUT: HtmlToTxt2Tags},
+                      {IN: "translator.txt2tags.Txt2TagsToHTML", OUT: "translator.html_to_t2t.HtmlToTxt2Tags",
+                       DIRECT: {"dokuwiki": "translator.direct.Txt2TagsToDokuWiki"}},
                       "textile":
-                      {IN: TextileToHTML, OUT: HtmlToTextile},
+                      {IN: "translator.textile_to_html.TextileToHTML", OUT: "translator.html_to_textile.HtmlToTextile"},
 			"dokuwiki":
-			{IN: DokuWikiToHTML, OUT: HtmlToDokuWiki}
+			{IN: "translator.dokuwiki_to_html.DokuWikiToHTML", OUT: "translator.html_to_dokuwiki.HtmlToDokuWiki",
+			 DIRECT: {"txt2tags": "translator.direct.DokuWikiToTxt2Tags"}}
                     }
 
+    @classmethod
+    def translator_paths(cls):
+        '''
+        Ścieżki importu wszystkich klas translatorów z translator_map (bez powtórzeń).
+        '''
+        paths = []
+        for formats in cls.translator_map.values():
+            for direction in [cls.IN, cls.OUT]:
+                if direction in formats and formats[direction] not in paths:
+                    paths.append(formats[direction])
+            for path in formats.get(cls.DIRECT, {}).values():
+                if path not in paths:
+                    paths.append(path)
+        return paths
+
     def __init__(self, **kwargs):
         self.log = logging.getLogger(self.__class__.__name__)
         
@@ -74,42 +134,76 @@ class SimpleMarkupConverter(object):
                         
         logging.basicConfig(format='%(levelname)s[%(name)s]: %(message)s', level=log_level)
 
+        # tekst wejściowy jest opcjonalny - można go podać później do convert()
         if 'input' in kwargs:
             self.input = kwargs['input']
-        else:
-            self.log.error('No input specified.')
-            return(Exit.NO_INPUT)
 
+        if 'use_document' in kwargs:
+            self.use_document = kwargs['use_document']
+
+        if 'use_direct' in kwargs:
+            self.use_direct = kwargs['use_direct']
+
+        if 'cache' in kwargs:
+            self.cache = kwargs['cache']
 
-        file_format = {}
         try:
-            file_format[self.IN] = kwargs['input_t']
+            input_t = kwargs['input_t']
         except KeyError:
             self.log.error('No input translator specified')
-            return Exit.WRONG_CMD
+            self.status = Exit.WRONG_CMD
+            return
         try:
-            file_format[self.OUT] = kwargs['output_t']
+            output_t = kwargs['output_t']
         except KeyError:
             self.log.error('No output translator specified')
-            return Exit.WRONG_CMD
+            self.status = Exit.WRONG_CMD
+            return
+        
+        # output_t - jeden format albo lista formatów wyjściowych
+        if isinstance(output_t, str):
+            output_t = [output_t]
+        self.input_format = input_t
+        self.output_formats = list(output_t)
+        if not self.output_formats:
+            self.log.error('No output translator specified')
+            self.status = Exit.WRONG_CMD
+            return
         
         self.translator = {}
+        # format wyjściowy -> translatory OUT (i DIRECT) tego formatu
+        self.outputs = {}
         
         # TODO: można obsłużyć gdy jest translator, ale w nie w tą stronę
+        direction, file_format = self.IN, input_t
         try:
-            # wyszukanie w mapie odpowiednich translatorów we/wy i ich konstrukcja
-            for direction in [self.IN, self.OUT]:
-                translator_type = self.translator_map[file_format[direction]][direction]
-                self.translator[direction] = translator_type()
+            # wyszukanie w mapie odpowiednich translatorów we/wy;
+            # rejestr buduje każdą klasę raz, a tu dostajemy jej kopię
+            translator_type = self.translator_map[input_t][self.IN]
+            self.translator[self.IN] = registry.get(translator_type)
+            direct = self.translator_map[input_t].get(self.DIRECT, {})
+            for file_format in self.output_formats:
+                direction = self.OUT
+                translators = self.outputs[file_format] = {}
+                translator_type = self.translator_map[file_format][self.OUT]
+                translators[self.OUT] = registry.get(translator_type)
+                # bezpośredni translator pary - pełna konwersja zostaje na wypadek,
+                # gdy tekstu nie da się przetłumaczyć bezpośrednio
+                if self.use_direct and file_format in direct:
+                    direction = self.DIRECT
+                    translator_type = direct[file_format]
+                    translators[self.DIRECT] = registry.get(translator_type)
+            # translatory pierwszego formatu - dla convert() i parse()
+            self.translator.update(self.outputs[self.output_formats[0]])
         except KeyError:
-            print("Wrong %s format specified: %s" % (direction, file_format[direction]))
-            return Exit.WRONG_CMD
+            print("Wrong %s format specified: %s" % (direction, file_format))
+            self.status = Exit.WRONG_CMD
             # TODO: dawna obsługa, która jest bardziej szczegółowa
 #        except (SyntaxError, yacc.LALRError) as e:
         except Exception as e:
             # błąd w konstrukcji translatora
-            print("Construction of %s parser %s failed: %s" % (direction, translator_type.__name__, e))
-            return Exit.PARSER_CONSTRUCTION_FAIL
+            print("Construction of %s parser %s failed: %s" % (direction, translator_type, e))
+            self.status = Exit.PARSER_CONSTRUCTION_FAIL
 
     def get_output(self):
         if not self.is_parsed:
@@ -117,71 +211,602 @@ class SimpleMarkupConverter(object):
         return self.output
     
     def parse(self):
+        if self.input is None:
+            self.log.error('No input specified.')
+            return Exit.NO_INPUT
+        
+        exit_code, output = self.convert(self.input)
+        
+        if exit_code == Exit.SUCCESS:
+            self.output = output
+            self.is_parsed = True
+        
+        return exit_code
+    
+    def uses_document(self, output_t=None):
+        '''
+        Czy konwersja do formatu output_t (domyślnie pierwszego) przechodzi
+        przez drzewo dokumentu (translator wejściowy je buduje, a wyjściowy
+        umie je zapisać), a nie przez tekst HTML.
+        '''
+        if output_t is None:
+            output_t = self.output_formats[0]
+        return self.use_document and \
+            hasattr(self.translator[self.IN], 'document') and \
+            self.outputs[output_t][self.OUT].renderer is not None
+
+    def convert(self, text):
+        '''
+        Konwertuje tekst przez translator wejściowy i wyjściowy (pierwszego
+        formatu wyjściowego).
+        Zwraca parę (kod wyjścia, tekst wyjściowy); w razie błędu tekst to None.
+        '''
+        output_t = self.output_formats[0] if self.status == Exit.SUCCESS else None
+        exit_code, outputs = self.convert_all(text, [output_t])
+        return exit_code, outputs and outputs[output_t]
+
+    def convert_all(self, text, formats=None, processes=None):
+        '''
+        Konwertuje tekst do wielu formatów wyjściowych (domyślnie wszystkich
+        podanych w konstruktorze). Translator wejściowy jest uruchamiany raz
+        dla każdej potrzebnej reprezentacji pośredniej (drzewa dokumentu
+        i HTML), a jego wynik trafia do translatorów wyjściowych - kolejno
+        albo w processes procesach. Wynik każdego formatu jest taki sam jak
+        z convert() konwertera tylko tego formatu.
+        Zwraca parę (kod wyjścia, słownik format -> tekst wyjściowy);
+        w razie błędu słownik to None.
+        '''
+        if self.status != Exit.SUCCESS:
+            return self.status, None
         
-        text = self.input
+        # PLY jest już zaimportowany razem z translatorami
+        from ply import lex
         
+        if formats is None:
+            formats = self.output_formats
+        outputs = {}
+        
+        direction = self.IN
         try:
-            # wywoływanie kolejnych translatorów
-            for direction in [self.IN, self.OUT]:
-                text = self.translator[direction].run(text)
-            
-            if self.input == None:
-                raise Exception("None parser output")
+            pending = []
+            for output_t in formats:
+                translators = self.outputs[output_t]
+                if self.DIRECT in translators:
+                    direction = self.DIRECT
+                    output = translators[self.DIRECT].run(text)
+                    if output is not None:
+                        outputs[output_t] = output
+                        continue
+                    self.log.debug('Direct translation not possible, using full conversion')
+                pending.append(output_t)
             
-            self.output = text
+            # reprezentacja pośrednia każdego formatu taka jak w osobnej
+            # konwersji: drzewo dokumentu dla formatów, które umieją je
+            # zapisać, HTML dla pozostałych - każda budowana najwyżej raz
+            # (wynik przez HTML może się różnić, np. błędem składni)
+            groups = {}
+            for output_t in pending:
+                groups.setdefault(self.uses_document(output_t), []).append(output_t)
+            for use_document, group in sorted(groups.items()):
+                direction = self.IN
+                intermediate = self._intermediate(text, use_document)
+                
+                direction = self.OUT
+                if processes and len(group) > 1:
+                    outputs.update(self._convert_processes(intermediate, use_document, group, processes))
+                else:
+                    for output_t in group:
+                        outputs[output_t] = self._output(self.outputs[output_t][self.OUT], intermediate, use_document)
             
-            self.is_parsed = True
+            for output_t in formats:
+                if outputs[output_t] is None:
+                    raise Exception("None parser output")
             
-            return Exit.SUCCESS
+            return Exit.SUCCESS, outputs
         except lex.LexError as e:
             print("Translation %s lexer error: %s" % (direction, e))
         except Exception as e:
             print("Error: %s" % (e))
         
         # zakończono niepowodzeniem
-        return Exit.TRANSLATION_ERROR
+        return Exit.TRANSLATION_ERROR, None
+
+    def iter_convert(self, source, chunk_size=None, processes=None):
+        '''
+        Konwersja strumieniowa do pierwszego formatu wyjściowego: tekst jest
+        dzielony na części na końcach bloków (DocumentTranslator.split - nigdy
+        wewnątrz akapitu ani listy), a wynik każdej części jest oddawany od
+        razu, więc w pamięci jest tylko jedna część wejścia i wyjścia.
+
+        source - napis albo ciąg kawałków tekstu (np. otwarty plik);
+        chunk_size - najmniejsza długość części (domyślnie self.chunk_size);
+        processes - liczba procesów konwertujących części równolegle (oba
+        etapy); wyniki są oddawane w kolejności części, a w toku jest
+        najwyżej 2 * processes części.
+
+        Bez processes para z translatorem bezpośrednim jest nim tłumaczona
+        część po części (z pustymi liniami między częściami); część, której
+        nie da się przetłumaczyć bezpośrednio, przechodzi pełną konwersję.
+        Pamięć podręczna nie jest używana. Dla tekstu bez błędów złączone
+        części to wynik convert() z use_direct=False, a z translatorem
+        bezpośrednim - wynik convert(), gdy każdą część da się nim
+        przetłumaczyć.
+        Błąd składni albo lexera przerywa konwersję wyjątkiem ConversionError
+        z położeniem błędu w całym dokumencie (convert() po błędzie składni
+        odrzuca wcześniejszy tekst, czego przy oddanych już częściach nie da
+        się zrobić).
+        '''
+        if self.status != Exit.SUCCESS:
+            raise ConversionError('Converter construction failed', self.status)
+        
+        translator = self.translator[self.IN]
+        use_document = self.uses_document()
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        
+        direct = None if processes else self.translator.get(self.DIRECT)
+        if hasattr(translator, 'split') and translator.block_end is not None:
+            # offset - początek części w dokumencie (położenie błędu lexera);
+            # translator bezpośredni przepisuje tekst, więc dostaje też
+            # puste linie między częściami
+            parts = translator.split(source, chunk_size, offsets=True, separators=direct is not None)
+        else:
+            # bez końców bloków (np. pass) - cały tekst jako jedna część
+            parts = [(0, source if isinstance(source, str) else ''.join(source))]
+        
+        if not processes:
+            for offset, part in parts:
+                output = direct.run(part) if direct is not None else None
+                if output is None:
+                    output = self._convert_part(translator, self.translator[self.OUT], part, use_document, offset)
+                yield output
+            return
+        
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+        
+        paths = (self.translator_map[self.input_format][self.IN],
+                 self.translator_map[self.output_formats[0]][self.OUT])
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            pending = deque()
+            try:
+                for offset, part in parts:
+                    pending.append(executor.submit(_process_part, paths, part, use_document, offset))
+                    if len(pending) >= 2 * processes:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                # przerwana konwersja (błąd albo koniec odczytu wyniku)
+                for future in pending:
+                    future.cancel()
+
+    @staticmethod
+    def _convert_part(translator, out, part, use_document, offset=0):
+        '''
+        Wynik części tekstu w iter_convert() - translator wejściowy i wyjściowy
+        w trybie strict; błąd zgłasza ConversionError. offset - początek
+        części w dokumencie, dodawany do położenia błędu translatora
+        wejściowego.
+        '''
+        from ply import lex
+        from translator.translator import ParseError, shift_error
+        
+        direction = SimpleMarkupConverter.IN
+        try:
+            if use_document:
+                intermediate = translator.document(part, strict=True)
+            elif translator.identity:
+                intermediate = part
+            else:
+                intermediate = translator.run(part, strict=True)
+            direction = SimpleMarkupConverter.OUT
+            if use_document:
+                output = out.render(intermediate)
+            elif out.identity:
+                output = intermediate
+            else:
+                output = out.run(intermediate, strict=True)
+        except lex.LexError as e:
+            if direction == SimpleMarkupConverter.IN:
+                e = shift_error(e, offset)
+            raise ConversionError('Translation %s lexer error: %s' % (direction, e))
+        except ParseError as e:
+            if direction == SimpleMarkupConverter.IN:
+                e = shift_error(e, offset)
+            raise ConversionError('Translation %s error: %s' % (direction, e))
+        if output is None:
+            raise ConversionError('None parser output')
+        return output
+
+    def _intermediate(self, text, use_document):
+        '''
+        Wynik translatora wejściowego (drzewo dokumentu albo HTML),
+        z pamięci podręcznej, jeśli ten sam tekst był już parsowany.
+        '''
+        translator = self.translator[self.IN]
+        if not use_document and translator.identity:
+            return text
+        
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(self.input_format, 'document' if use_document else 'html', text)
+            intermediate = self.cache.get(key)
+            if intermediate is not None:
+                self.log.debug('Intermediate result taken from cache')
+                return intermediate
+        
+        if use_document:
+            intermediate = translator.document(text)
+        else:
+            intermediate = translator.run(text)
+        if intermediate is None:
+            raise Exception("None parser output")
+        
+        if key is not None:
+            self.cache.put(key, intermediate)
+        return intermediate
+
+    @staticmethod
+    def _output(translator, intermediate, use_document):
+        '''
+        Wynik translatora wyjściowego dla drzewa dokumentu albo tekstu HTML;
+        etap identycznościowy (pass, wyjście html) jest pomijany.
+        '''
+        if use_document:
+            return translator.render(intermediate)
+        if translator.identity:
+            return intermediate
+        return translator.run(intermediate)
+
+    def _convert_processes(self, intermediate, use_document, formats, processes):
+        '''
+        Translatory wyjściowe w osobnych procesach - każdy proces używa
+        własnych translatorów z rejestru (tablice są już w pamięci podręcznej).
+        '''
+        from concurrent.futures import ProcessPoolExecutor
+        
+        paths = [self.translator_map[output_t][self.OUT] for output_t in formats]
+        with ProcessPoolExecutor(max_workers=min(processes, len(formats))) as executor:
+            results = executor.map(_process_output, paths,
+                                   [intermediate] * len(formats), [use_document] * len(formats))
+            return dict(zip(formats, results))
+
+def _process_output(translator_type, intermediate, use_document):
+    '''
+    Zadanie procesu roboczego convert_all().
+    '''
+    return SimpleMarkupConverter._output(registry.get(translator_type), intermediate, use_document)
+
+def _process_part(paths, part, use_document, offset):
+    '''
+    Zadanie procesu roboczego iter_convert() - paths to ścieżki klas
+    translatora wejściowego i wyjściowego.
+    '''
+    return SimpleMarkupConverter._convert_part(registry.get(paths[0]), registry.get(paths[1]),
+                                               part, use_document, offset)
+
+# rozszerzenia plików wyjściowych (domyślnie nazwa formatu)
+output_extensions = {"txt2tags": "t2t"}
+
+def output_extension(output_t):
+    return output_extensions.get(output_t, output_t)
+
+# translatory spoza translator_map, których tablice też są budowane
+extra_translators = ["translator.example_translator.ExampleTranslator"]
+
+def build_tables(table_dir=None, check=False):
+    '''
+    Buduje tablice parsera i lexera wszystkich translatorów w katalogu
+    table_dir, a w trybie check tylko wypisuje tablice nieaktualne.
+    Zwraca kod wyjścia.
+    '''
+    from translator import tables
+    
+    if table_dir:
+        tables.table_dir = table_dir
+    
+    paths = SimpleMarkupConverter.translator_paths() + extra_translators
+    
+    exit_code = Exit.SUCCESS
+    for path in paths:
+        translator_type = registry.load_class(path)
+        if not translator_type.tokens:
+            # translator bez gramatyki nie ma tablic
+            continue
+        if check:
+            for stale in tables.stale_tables(translator_type):
+                print("%s: stale table %s" % (translator_type.__name__, stale))
+                exit_code = Exit.STALE_TABLES
+        else:
+            try:
+                translator_type()
+            except Exception as e:
+                print("Construction of parser %s failed: %s" % (translator_type.__name__, e))
+                return Exit.PARSER_CONSTRUCTION_FAIL
+            print("%s: tables ready" % translator_type.__name__)
+    
+    return exit_code
+
+# kawałki wejścia dekodowane naraz przy czytaniu kawałkami
+read_size = 1024 * 1024
+
+def map_input(f):
+    '''
+    Plik binarny f odwzorowany w pamięci (mmap) albo None, gdy się nie da
+    (pusty plik, potok).
+    '''
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        return None
+
+def read_text(f):
+    '''
+    Cały tekst pliku binarnego f w kodowaniu i z końcami linii jak przy
+    open() w trybie tekstowym. Kawałki z read_chunks (końce linii zamieniane
+    w każdym kawałku) są łączone raz - bez kopii zawartości pliku jako bytes
+    ani kopii przy zamianie końców linii, a strony odwzorowanego pliku są
+    zwalniane zaraz po dekodowaniu kawałka.
+    '''
+    return ''.join(read_chunks(f))
+
+def read_chunks(f, size=None):
+    '''
+    Tekst pliku binarnego f jako ciąg kawałków (dla iter_convert) - w pamięci
+    jest tylko dekodowany kawałek (size bajtów, domyślnie read_size).
+    Kodowanie i końce linii jak przy open() w trybie tekstowym.
+    '''
+    size = size or read_size
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder(locale.getpreferredencoding(False))(), translate=True)
+    m = map_input(f)
+    if m is None:
+        # read1 oddaje dane od razu, bez czekania na pełny kawałek (potoki)
+        blocks = iter(lambda: getattr(f, 'read1', f.read)(size), b'')
+    else:
+        blocks = _mapped_blocks(m, size)
+    try:
+        for block in blocks:
+            text = decoder.decode(block)
+            if text:
+                yield text
+        text = decoder.decode(b'', final=True)
+        if text:
+            yield text
+    finally:
+        if m is not None:
+            m.close()
+
+class ReplayInput(object):
+    '''
+    Kawałki tekstu (np. z read_chunks) dla iter_convert, zapamiętywane do
+    wywołania release() - do tego czasu text() oddaje cały tekst
+    (przeczytane kawałki i resztę źródła), np. do konwersji całego
+    dokumentu po błędzie w pierwszej części.
+    '''
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.read = []
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            if self.read is not None:
+                self.read.append(chunk)
+            yield chunk
+
+    def release(self):
+        self.read = None
+
+    def replayable(self):
+        return self.read is not None
+
+    def text(self):
+        return ''.join(self.read + list(self.chunks))
+
+    def hold(self, parts):
+        '''
+        Części wyniku; przeczytane kawałki są zapominane po oddaniu pierwszej
+        części, czyli gdy wynik jest już zapisywany.
+        '''
+        for part in parts:
+            yield part
+            self.release()
+
+def _mapped_blocks(m, size):
+    '''
+    Kolejne kawałki odwzorowanego pliku; strony przeczytanego kawałka są
+    zwalniane (madvise), więc nie zostają w pamięci procesu.
+    '''
+    # początki kawałków wyrównane do strony (wymaga tego madvise)
+    size = max(size // mmap.PAGESIZE, 1) * mmap.PAGESIZE
+    for start in range(0, len(m), size):
+        block = m[start:start + size]
+        if hasattr(m, 'madvise'):
+            m.madvise(mmap.MADV_DONTNEED, start, len(block))
+        yield block
+
+@contextlib.contextmanager
+def atomic_output(path):
+    '''
+    Plik tekstowy do zapisu (buforowany), który zastępuje plik path dopiero
+    po udanym zapisie całości (os.replace pliku tymczasowego z tego samego
+    katalogu). Przy błędzie plik tymczasowy jest usuwany, a path zostaje
+    bez zmian - nie ma częściowo zapisanego wyniku.
+    '''
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temp = tempfile.mkstemp(prefix='.%s.' % name, suffix='.tmp', dir=directory)
+    try:
+        # prawa dostępu jak przy open(path, 'w') - mkstemp tworzy plik 0600
+        if os.path.exists(path):
+            mode = os.stat(path).st_mode & 0o7777
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(temp, mode)
+        with open(fd, 'w') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+
+def write_parts(parts, path=None):
+    '''
+    Zapis kolejnych części wyniku, każdej od razu po konwersji: do pliku
+    path (atomic_output - plik pojawia się dopiero po konwersji całości)
+    albo na standardowe wyjście, z końcem linii jak print() całego wyniku.
+    '''
+    if path:
+        with atomic_output(path) as f:
+            for part in parts:
+                f.write(part)
+    else:
+        for part in parts:
+            sys.stdout.write(part)
+            sys.stdout.flush()
+        sys.stdout.write('\n')
 
 # program główny
 if __name__ == '__main__':
-    ap = argparse.ArgumentParser()
+    # podkomenda: main.py build-tables [katalog] [--check]
+    if sys.argv[1:2] == ['build-tables']:
+        ap = argparse.ArgumentParser(prog='main.py build-tables')
+        ap.add_argument('table_dir', nargs='?', help='target directory (default: $SMC_TABLE_DIR or translator/tables)')
+        ap.add_argument('-c', '--check', action='store_true', default=False, help='only report stale tables')
+        res = ap.parse_args(sys.argv[2:])
+        exit(build_tables(res.table_dir, res.check))
+    
+    ap = argparse.ArgumentParser(epilog='"main.py build-tables -h" - precompile parser tables')
     ap.add_argument('input_type', help='input markup language: ')
-    ap.add_argument('output_type', help='output markup language: txt2tags')
-    ap.add_argument('-o', '--output_file', help='output file path: html')
-    ap.add_argument('input_file', help='input file')
+    ap.add_argument('output_type', help='output markup language: txt2tags; several comma separated formats (e.g. html,textile,dokuwiki) write one file per format')
+    ap.add_argument('-o', '--output_file', help='output file path: html, "-" - standard output (default); with several formats - base path, the format extension is appended (default: input file without extension)')
+    ap.add_argument('input_file', help='input file, "-" - standard input')
     ap.add_argument('-v', '--verbose', action='store_true', default=False, help='print debug messages')    
+    ap.add_argument('-j', '--jobs', type=int, default=None, help='number of processes: for several formats - output translators, for one format - parts of the document converted in parallel')
+    ap.add_argument('-c', '--chunk_size', type=int, default=None, help='minimum length of document parts converted and written one by one (one format; default: %d); a syntax error after the first part was written stops the conversion, with -o and a file input the whole document is converted again' % SimpleMarkupConverter.chunk_size)
+    ap.add_argument('-t', '--table_dir', help='parser table cache directory (default: $SMC_TABLE_DIR or translator/tables)')
     res = ap.parse_args()
     
+    if res.table_dir:
+        from translator import tables
+        tables.table_dir = res.table_dir
+    
+    output_formats = res.output_type.split(',')
+    
+    # "-" - standardowe wejście i wyjście; kilka formatów to zawsze pliki,
+    # więc potrzebują ścieżki bazowej
+    if len(output_formats) > 1 and (res.output_file == '-' or
+                                    res.output_file is None and res.input_file == '-'):
+        print("Several output formats need an output base path (-o)")
+        exit(Exit.WRONG_CMD)
+    if res.output_file == '-':
+        res.output_file = None
+    
+    # kilka formatów - plik dla każdego: ścieżka bazowa z rozszerzeniem formatu;
+    # żaden z nich nie może zastąpić pliku wejściowego
+    if len(output_formats) > 1:
+        base = res.output_file or os.path.splitext(res.input_file)[0]
+        output_paths = dict((output_t, '%s.%s' % (base, output_extension(output_t)))
+                            for output_t in output_formats)
+        for path in output_paths.values():
+            if res.input_file != '-' and os.path.exists(path) and os.path.samefile(path, res.input_file):
+                print("Output file %s would overwrite the input file, give another base path (-o)" % path)
+                exit(Exit.WRONG_CMD)
+    
     # otworzenie pliku z parametru
     try:
-        f = open(res.input_file, "r")
+        f = sys.stdin.buffer if res.input_file == '-' else open(res.input_file, "rb")
     except Exception as e:
         print("File open error: %s" % str(e))
         exit(Exit.FILE_ERROR)
     
-    # odczyt pliku
+    # Jeden format - konwersja strumieniowa (także ze standardowego wejścia
+    # i na standardowe wyjście): plik jest czytany kawałkami, a wynik
+    # zapisywany częściami. Błąd składni przed zapisaniem pierwszej części
+    # (krótki dokument to jedna część) albo z -o w pliku, który można
+    # przeczytać jeszcze raz, oznacza konwersję całego dokumentu z obsługą
+    # błędów jak bez podziału (plik tymczasowy i tak jest odrzucany);
+    # później błąd przerywa konwersję z położeniem w dokumencie. Para
+    # z translatorem bezpośrednim też jest tłumaczona częściami.
+    streaming = len(output_formats) == 1
+    
+    # odczyt pliku (odwzorowanego w pamięci - mmap, jeśli to możliwe);
+    # kawałki są czytane i dekodowane dopiero w trakcie konwersji, więc
+    # wynik ze standardowego wejścia pojawia się przed końcem danych
     try:
-        text_input = f.read()
+        text_input = ReplayInput(read_chunks(f)) if streaming else read_text(f)
     except Exception as e:
         print("File read error: %s" % str(e))
         exit(Exit.FILE_ERROR)
     
     # konstrukcja z plikiem wejściowycm
     smc = SimpleMarkupConverter(
-                                input=text_input,
+                                input=None if streaming else text_input,
                                 input_t=res.input_type,
-                                output_t=res.output_type,
+                                output_t=output_formats,
                                 verbose=res.verbose
                                 )
-    exit_code = smc.parse()
+    if smc.status != Exit.SUCCESS:
+        exit(smc.status)
     
-    if exit_code == Exit.SUCCESS:
-        if res.output_file:
-            f = open(res.output_file, 'w')
-            f.write(smc.get_output())
-            f.close()
-        else:
-            print(smc.get_output())
-    else:
+    if len(output_formats) > 1:
+        # jedno parsowanie, osobny plik dla każdego formatu
+        exit_code, outputs = smc.convert_all(text_input, processes=res.jobs)
+        if exit_code != Exit.SUCCESS:
+            print('An error occured while parsing.')
+            exit(exit_code)
+        for output_t in output_formats:
+            path = output_paths[output_t]
+            try:
+                with atomic_output(path) as f:
+                    f.write(outputs[output_t])
+            except Exception as e:
+                print("File write error: %s" % str(e))
+                exit(Exit.FILE_ERROR)
+        exit(Exit.SUCCESS)
+    
+    # części dokumentu (w res.jobs procesach, jeśli podano), wynik w kolejności części
+    parts = text_input.hold(smc.iter_convert(text_input, res.chunk_size, res.jobs))
+    
+    try:
+        try:
+            write_parts(parts, res.output_file)
+        except ConversionError as e:
+            if text_input.replayable():
+                smc.input = text_input.text()
+            elif res.output_file and f.seekable():
+                f.seek(0)
+                smc.input = read_text(f)
+            else:
+                raise
+            smc.log.debug('%s, converting the whole document' % e)
+            exit_code = smc.parse()
+            if exit_code != Exit.SUCCESS:
+                print('An error occured while parsing.')
+                exit(exit_code)
+            write_parts([smc.get_output()], res.output_file)
+    except ConversionError as e:
+        print(e)
         print('An error occured while parsing.')
-        
-    exit(exit_code)
+        exit(e.exit_code)
+    except UnicodeDecodeError as e:
+        print("File read error: %s" % str(e))
+        exit(Exit.FILE_ERROR)
+    except BrokenPipeError:
+        # odbiorca zamknął potok (np. head) - bez komunikatu i bez błędu
+        # przy zamykaniu sys.stdout z niezapisanym buforem
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        exit(Exit.FILE_ERROR)
+    except OSError as e:
+        print("File write error: %s" % str(e))
+        exit(Exit.FILE_ERROR)
+    
+    exit(Exit.SUCCESS)
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2012 Jakub Liput, Mirosław Sajdak
+#
+# SimpleMarkupConverter is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SimpleMarkupConverter is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SimpleMarkupConverter.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Pula gotowych konwerterów dla aplikacji wielowątkowych (np. serwera WWW).
+
+Zamiast budować SimpleMarkupConverter dla każdego żądania, wątek wypożycza
+gotowy konwerter (checkout) i oddaje go po użyciu (checkin). Gdy wszystkie
+konwertery danej pary formatów są zajęte, pula tworzy nowy (do max_size)
+albo wątek czeka na zwolnienie konwertera.
+'''
+
+from main import Exit, SimpleMarkupConverter
+import contextlib
+import logging
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    '''
+    Nie doczekano się wolnego konwertera w zadanym czasie.
+    '''
+    pass
+
+
+class _Slot(object):
+    '''
+    Konwertery jednej pary formatów wraz z licznikami.
+    '''
+
+    def __init__(self):
+        self.free = []
+        self.size = 0
+        self.in_use = 0
+        self.peak = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.grows = 0
+
+
+class ConverterPool(object):
+    '''
+    Pula konwerterów dla par formatów (wejście, wyjście).
+
+    size - liczba konwerterów budowanych z góry dla każdej pary,
+    max_size - górna granica liczby konwerterów pary (None - bez limitu),
+    grow - czy tworzyć nowe konwertery, gdy wszystkie są zajęte
+           (False - wątek czeka na zwolnienie konwertera),
+    timeout - domyślny maksymalny czas oczekiwania (None - bez limitu),
+    formats - pary formatów budowane z góry (domyślnie wszystkie),
+    cache - pamięć podręczna wyników translatorów wejściowych
+            (translator.cache.IntermediateCache) wspólna dla konwerterów puli.
+    '''
+
+    def __init__(self, size=2, max_size=None, grow=True, timeout=None, formats=None, cache=None):
+        self.log = logging.getLogger(self.__class__.__name__)
+        self.size = size
+        self.max_size = max_size
+        self.grow = grow
+        self.timeout = timeout
+        self.cache = cache
+
+        self._cond = threading.Condition()
+        self._slots = {}
+        # konwerter -> para formatów, z której został wypożyczony
+        self._lent = {}
+
+        if formats is None:
+            formats = self.all_formats()
+        for pair in formats:
+            slot = self._slot(pair)
+            for _ in range(size):
+                slot.free.append(self._build(pair))
+                slot.size += 1
+
+    @staticmethod
+    def all_formats():
+        '''
+        Wszystkie pary (wejście, wyjście) z mapy translatorów.
+        '''
+        translator_map = SimpleMarkupConverter.translator_map
+        return [(input_t, output_t)
+                for input_t in sorted(translator_map) if SimpleMarkupConverter.IN in translator_map[input_t]
+                for output_t in sorted(translator_map) if SimpleMarkupConverter.OUT in translator_map[output_t]]
+
+    def _slot(self, pair):
+        slot = self._slots.get(pair)
+        if slot is None:
+            slot = self._slots[pair] = _Slot()
+        return slot
+
+    def _build(self, pair):
+        converter = SimpleMarkupConverter(input_t=pair[0], output_t=pair[1], cache=self.cache)
+        if converter.status != Exit.SUCCESS:
+            raise ValueError('Cannot build converter %s -> %s' % pair)
+        return converter
+
+    def checkout(self, input_t, output_t, timeout=None):
+        '''
+        Wypożycza konwerter dla pary formatów. Rzuca PoolTimeout, gdy
+        w czasie timeout (lub domyślnym czasie puli) nie zwolnił się
+        żaden konwerter, i ValueError od razu, gdy para nie ma konwerterów
+        (nie była zbudowana z góry), a pula nie może ich tworzyć.
+        '''
+        pair = (input_t, output_t)
+        if timeout is None:
+            timeout = self.timeout
+
+        with self._cond:
+            slot = self._slot(pair)
+            start = None
+            while not slot.free:
+                if self.grow and (self.max_size is None or slot.size < self.max_size):
+                    # rezerwacja miejsca - budowa poza blokadą
+                    slot.size += 1
+                    slot.grows += 1
+                    break
+                if slot.size == 0:
+                    # żaden konwerter nie zostanie zwolniony - czekanie bez końca
+                    raise ValueError('No converters %s -> %s and the pool cannot grow' % pair)
+                if start is None:
+                    start = time.perf_counter()
+                    slot.waits += 1
+                remaining = None
+                if timeout is not None:
+                    remaining = timeout - (time.perf_counter() - start)
+                    if remaining <= 0:
+                        self._waited(slot, start)
+                        raise PoolTimeout('No free converter %s -> %s' % pair)
+                self._cond.wait(remaining)
+
+            if start is not None:
+                self._waited(slot, start)
+            converter = slot.free.pop() if slot.free else None
+            slot.in_use += 1
+            slot.peak = max(slot.peak, slot.in_use)
+            slot.checkouts += 1
+
+        if converter is None:
+            self.log.debug('Growing pool %s -> %s' % pair)
+            try:
+                converter = self._build(pair)
+            except Exception:
+                with self._cond:
+                    slot.size -= 1
+                    slot.in_use -= 1
+                    self._cond.notify_all()
+                raise
+
+        with self._cond:
+            self._lent[id(converter)] = pair
+        return converter
+
+    def _waited(self, slot, start):
+        waited = time.perf_counter() - start
+        slot.wait_time += waited
+        slot.max_wait = max(slot.max_wait, waited)
+
+    def checkin(self, converter):
+        '''
+        Zwraca wypożyczony konwerter do puli.
+        '''
+        with self._cond:
+            pair = self._lent.pop(id(converter), None)
+            if pair is None:
+                raise ValueError('Converter was not checked out from this pool')
+            slot = self._slots[pair]
+            slot.in_use -= 1
+            slot.free.append(converter)
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def converter(self, input_t, output_t, timeout=None):
+        '''
+        Wypożyczenie konwertera na czas bloku with.
+        '''
+        converter = self.checkout(input_t, output_t, timeout)
+        try:
+            yield converter
+        finally:
+            self.checkin(converter)
+
+    def convert(self, text, input_t, output_t, timeout=None):
+        '''
+        Konwersja tekstu wypożyczonym konwerterem; zwraca to samo co
+        SimpleMarkupConverter.convert().
+        '''
+        with self.converter(input_t, output_t, timeout) as converter:
+            return converter.convert(text)
+
+    def stats(self):
+        '''
+        Statystyki puli dla każdej pary formatów: rozmiar, zajęte konwertery,
+        wykorzystanie, oczekiwania (liczba i czas w sekundach) i powiększenia.
+        '''
+        with self._cond:
+            result = {}
+            for pair, slot in self._slots.items():
+                result[pair] = {
+                    'size': slot.size,
+                    'in_use': slot.in_use,
+                    'peak_in_use': slot.peak,
+                    'utilisation': float(slot.in_use) / slot.size if slot.size else 0.0,
+                    'checkouts': slot.checkouts,
+                    'waits': slot.waits,
+                    'wait_time': slot.wait_time,
+                    'max_wait': slot.max_wait,
+                    'grows': slot.grows,
+                }
+            return result
@@ -2,8 +2,30 @@
 
 # -*- coding: utf-8 -*-
 
-from main import SimpleMarkupConverter, Exit
+from main import SimpleMarkupConverter, ConversionError, Exit, build_tables, read_chunks, read_text
+from pool import ConverterPool, PoolTimeout
+from translator import document
+from translator.cache import IntermediateCache
+from translator import registry
+from translator import tables
+from translator.dummy import PassTranslator
+from translator.html_to_t2t import HtmlToTxt2Tags
+from translator.html_to_textile import HtmlToTextile
+from translator.translator import untraced
+from translator.txt2tags import Txt2TagsToHTML
+from translator.textile_to_html import TextileToHTML
+import contextlib
+import io
+import itertools
+import logging
+import os
 import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
 
 class SimpleMarkupConverterTests(unittest.TestCase):
@@ -326,5 +348,1041 @@ h2. Sit dolor
                                 rx.findall(smc.get_output())
                                 ))
 
+class ReusableConverterTests(unittest.TestCase):
+    '''
+    Jeden konwerter dla pary formatów, wiele konwersji.
+    '''
+
+    def test_convert_many(self):
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='textile')
+        texts = ['**lorem** ipsum', '= sit =\n\n- dolor\n - amet\n- lorem', '', '//ipsum//']
+        for text in texts:
+            expected = SimpleMarkupConverter(input=text, input_t='txt2tags', output_t='textile')
+            self.assertEqual(expected.parse(), Exit.SUCCESS)
+            self.assertEqual(smc.convert(text), (Exit.SUCCESS, expected.get_output()))
+
+    # błąd w jednym tekście nie wpływa na kolejne
+    def test_convert_after_error(self):
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='html')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(smc.convert('= lorem\nipsum'), (Exit.TRANSLATION_ERROR, None))
+        self.assertEqual(smc.convert('**lorem** ipsum'),
+                         (Exit.SUCCESS, '<p><b>lorem</b> ipsum</p>'))
+
+    def test_construction_errors(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            smc = SimpleMarkupConverter(input_t='foo', output_t='html')
+        self.assertEqual(smc.status, Exit.WRONG_CMD)
+        self.assertEqual(smc.convert('lorem'), (Exit.WRONG_CMD, None))
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='html')
+        self.assertEqual(smc.parse(), Exit.NO_INPUT)
+
+class IdentityStageTests(unittest.TestCase):
+    '''
+    Etapy identycznościowe (pass, wyjście html) nie parsują tekstu.
+    '''
+
+    def test_pass_translator(self):
+        t = PassTranslator()
+        self.assertTrue(t.identity)
+        self.assertIsNone(t.my_lex)
+        self.assertIsNone(t.my_yacc)
+        self.assertEqual(t.run('**lorem**\n\nipsum'), '**lorem**\n\nipsum')
+
+    def test_pass_to_pass(self):
+        text = '= lorem =\n\n**ipsum** sit\n'
+        smc = SimpleMarkupConverter(input=text, input_t='pass', output_t='pass')
+        self.assertEqual(smc.parse(), Exit.SUCCESS)
+        self.assertEqual(smc.get_output(), text)
+
+    # do html tekst przechodzi tylko przez translator wejściowy
+    def test_html_output_single_parse(self):
+        text = '= lorem =\n\n**ipsum** sit\n\n- a\n- b\n'
+        smc = SimpleMarkupConverter(input=text, input_t='txt2tags', output_t='html')
+        self.assertEqual(smc.parse(), Exit.SUCCESS)
+        self.assertEqual(smc.get_output(), Txt2TagsToHTML().run(text))
+
+class LazyImportTests(unittest.TestCase):
+    '''
+    Translatory są importowane dopiero wtedy, gdy są potrzebne.
+    '''
+
+    def loaded_modules(self, code):
+        out = subprocess.check_output([sys.executable, '-c', code + '''
+import sys
+print(' '.join(sorted(m for m in sys.modules if m.startswith(('ply', 'translator.')))))
+'''], cwd=os.path.dirname(os.path.abspath(__file__)), universal_newlines=True)
+        return out.split()
+
+    def test_import_main(self):
+        self.assertEqual(self.loaded_modules('import main'), ['translator.registry'])
+
+    def test_single_pair(self):
+        modules = self.loaded_modules('''
+import main
+main.SimpleMarkupConverter(input='a', input_t='txt2tags', output_t='textile')
+''')
+        self.assertIn('translator.txt2tags', modules)
+        self.assertIn('translator.html_to_textile', modules)
+        self.assertNotIn('translator.textile_to_html', modules)
+        self.assertNotIn('translator.dokuwiki_to_html', modules)
+        self.assertNotIn('translator.html_to_dokuwiki', modules)
+
+class TableCacheTests(unittest.TestCase):
+    '''
+    Testy pamięci podręcznej tablic parsera.
+    '''
+
+    def setUp(self):
+        self.old_table_dir = tables.table_dir
+        tables.table_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(tables.table_dir)
+        tables.table_dir = self.old_table_dir
+
+    # pierwsza konstrukcja buduje tablice, kolejna je wczytuje
+    def test_rebuilt_then_loaded(self):
+        rebuilt = tables.stats['rebuilt']
+        loaded = tables.stats['loaded']
+        Txt2TagsToHTML()
+        self.assertEqual(tables.stats['rebuilt'], rebuilt + 1)
+        self.assertTrue(os.path.exists(tables.parse_table_path(Txt2TagsToHTML)))
+        t = Txt2TagsToHTML()
+        self.assertEqual(tables.stats['loaded'], loaded + 1)
+        self.assertEqual(t.run('lorem **ipsum**'), '<p>lorem <b>ipsum</b></p>')
+
+    # każda klasa ma własny plik tablic
+    def test_tables_per_class(self):
+        Txt2TagsToHTML()
+        TextileToHTML()
+        self.assertNotEqual(tables.parse_table_path(Txt2TagsToHTML),
+                            tables.parse_table_path(TextileToHTML))
+        loaded = tables.stats['loaded']
+        t2t = Txt2TagsToHTML()
+        textile = TextileToHTML()
+        self.assertEqual(tables.stats['loaded'], loaded + 2)
+        self.assertEqual(t2t.run('**a**'), '<p><b>a</b></p>')
+        self.assertEqual(textile.run('*a*'), '<p><b>a</b></p>')
+
+    # tablice innej gramatyki (niezgodna sygnatura) są przebudowywane
+    def test_stale_tables_rebuilt(self):
+        TextileToHTML()
+        shutil.copy(tables.parse_table_path(TextileToHTML),
+                    tables.parse_table_path(Txt2TagsToHTML))
+        rebuilt = tables.stats['rebuilt']
+        t = Txt2TagsToHTML()
+        self.assertEqual(tables.stats['rebuilt'], rebuilt + 1)
+        self.assertEqual(t.run('**a**'), '<p><b>a</b></p>')
+
+    # tablice lexera są zapisywane i wczytywane, wynik jest ten sam
+    def test_lexer_tables(self):
+        text = '= Lorem =\n\n**ipsum** //sit// dolor\\\\\namet\n\n- a\n- b\n'
+        lex_rebuilt = tables.stats['lex_rebuilt']
+        expected = Txt2TagsToHTML().run(text)
+        self.assertEqual(tables.stats['lex_rebuilt'], lex_rebuilt + 1)
+        lex_loaded = tables.stats['lex_loaded']
+        self.assertEqual(Txt2TagsToHTML().run(text), expected)
+        self.assertEqual(tables.stats['lex_loaded'], lex_loaded + 1)
+
+    # zmiana reguł lexera zmienia sygnaturę (a więc i plik tablic)
+    def test_lexer_signature(self):
+        class ChangedRules(Txt2TagsToHTML):
+            t_PAREND = '(\\n\\s*){3,}'
+        signature = tables.lexer_signature(Txt2TagsToHTML, re.MULTILINE)
+        self.assertEqual(signature, tables.lexer_signature(Txt2TagsToHTML(), re.MULTILINE))
+        self.assertNotEqual(signature, tables.lexer_signature(ChangedRules, re.MULTILINE))
+
+    # sygnatura reguł (refleksja) jest liczona raz na klasę, nie przy każdej konstrukcji
+    def test_lexer_signature_cached(self):
+        Txt2TagsToHTML()
+        signatures = tables.stats['lex_signatures']
+        Txt2TagsToHTML()
+        self.assertEqual(tables.stats['lex_signatures'], signatures)
+
+class BuildTablesTests(unittest.TestCase):
+    '''
+    Testy budowania i sprawdzania tablic wszystkich translatorów.
+    '''
+
+    def setUp(self):
+        self.old_table_dir = tables.table_dir
+        self.table_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.table_dir)
+        tables.table_dir = self.old_table_dir
+
+    def build_tables(self, check):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            exit_code = build_tables(self.table_dir, check)
+        return exit_code, out.getvalue()
+
+    def test_build_and_check(self):
+        exit_code, out = self.build_tables(check=True)
+        self.assertEqual(exit_code, Exit.STALE_TABLES)
+        self.assertIn('Txt2TagsToHTML: stale table', out)
+        self.assertEqual(self.build_tables(check=False)[0], Exit.SUCCESS)
+        self.assertEqual(self.build_tables(check=True), (Exit.SUCCESS, ''))
+
+    # tablice zbudowane dla innej gramatyki są zgłaszane jako nieaktualne
+    def test_check_signature(self):
+        self.build_tables(check=False)
+        shutil.copy(tables.parse_table_path(TextileToHTML, self.table_dir),
+                    tables.parse_table_path(Txt2TagsToHTML, self.table_dir))
+        exit_code, out = self.build_tables(check=True)
+        self.assertEqual(exit_code, Exit.STALE_TABLES)
+        self.assertEqual(out.strip(), 'Txt2TagsToHTML: stale table %s'
+                         % tables.parse_table_path(Txt2TagsToHTML, self.table_dir))
+
+class RegistryTests(unittest.TestCase):
+    '''
+    Testy rejestru translatorów.
+    '''
+
+    # klasa jest budowana raz, potem wydawane są kopie
+    def test_build_once(self):
+        registry.clear()
+        builds = registry.stats['builds']
+        hits = registry.stats['hits']
+        first = registry.get(Txt2TagsToHTML)
+        second = registry.get(Txt2TagsToHTML)
+        self.assertEqual(registry.stats['builds'], builds + 1)
+        self.assertEqual(registry.stats['hits'], hits + 1)
+        self.assertIsNot(first, second)
+        self.assertIsNot(first.my_lex, second.my_lex)
+        self.assertIs(first.my_yacc.action, second.my_yacc.action)
+        self.assertEqual(first.run('**a** b'), second.run('**a** b'))
+
+    # akcje kopii działają na jej własnym stanie
+    def test_clone_state(self):
+        html = '<ul><li>a</li><ul><li>b</li></ul><li>c</li></ul>'
+        prototype = HtmlToTxt2Tags()
+        clone = prototype.clone()
+        self.assertEqual(clone.run(html), HtmlToTxt2Tags().run(html))
+        self.assertIs(clone.my_yacc.productions[1].callable.__self__, clone)
+        self.assertEqual(clone.my_lex.lexstate, 'INITIAL')
+
+class ReentrantTranslatorTests(unittest.TestCase):
+    '''
+    Translatory HTML -> znaczniki trzymają stan list w kontekście przebiegu.
+    '''
+
+    lists = [
+        '<ul><li>a</li><ul><li>b</li></ul><li>c</li></ul>',
+        '<ol><li>a</li><ol><li>b</li><li>c</li></ol></ol><p>d</p>',
+        '<p>a</p><ul><li>b</li><ol><li>c</li></ol><li>d</li><ul><li>e</li></ul></ul>',
+    ]
+
+    # przerwane parsowanie nie zmienia wyniku kolejnego
+    def test_aborted_parse(self):
+        t = HtmlToTxt2Tags()
+        expected = t.run(self.lists[0])
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertIsNone(t.run('<ul><li>a</li><ul><li>b</li><li>c'))
+        self.assertEqual(t.run(self.lists[0]), expected)
+        self.assertEqual(expected, '- a\n - b\n- c\n\n\n')
+
+    # jedna instancja translatora używana naraz przez wiele wątków
+    def test_threads(self):
+        t = HtmlToTxt2Tags()
+        expected = [t.run(html) for html in self.lists]
+        errors = []
+
+        def work(n):
+            for i in range(30):
+                k = (n + i) % len(self.lists)
+                if t.run(self.lists[k]) != expected[k]:
+                    errors.append(k)
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(errors, [])
+
+class ConverterPoolTests(unittest.TestCase):
+    '''
+    Wypożyczanie konwerterów z puli.
+    '''
+
+    pair = ('txt2tags', 'html')
+
+    def test_prebuilt(self):
+        pool = ConverterPool(size=2, formats=[self.pair])
+        converter = pool.checkout(*self.pair)
+        self.assertEqual(converter.convert('**a**'), (Exit.SUCCESS, '<p><b>a</b></p>'))
+        pool.checkin(converter)
+        stats = pool.stats()[self.pair]
+        self.assertEqual((stats['size'], stats['checkouts'], stats['grows'], stats['in_use']), (2, 1, 0, 0))
+        self.assertRaises(ValueError, pool.checkin, converter)
+
+    def test_grow(self):
+        pool = ConverterPool(size=1, max_size=2, formats=[self.pair])
+        first = pool.checkout(*self.pair)
+        second = pool.checkout(*self.pair)
+        self.assertIsNot(first, second)
+        stats = pool.stats()[self.pair]
+        self.assertEqual((stats['size'], stats['grows'], stats['utilisation']), (2, 1, 1.0))
+        # limit osiągnięty - czekanie kończy się przekroczeniem czasu
+        self.assertRaises(PoolTimeout, pool.checkout, *self.pair, timeout=0.01)
+        self.assertEqual(pool.stats()[self.pair]['waits'], 1)
+
+    def test_block(self):
+        pool = ConverterPool(size=1, grow=False, formats=[self.pair])
+        converter = pool.checkout(*self.pair)
+        timer = threading.Timer(0.05, pool.checkin, [converter])
+        timer.start()
+        self.assertIs(pool.checkout(*self.pair, timeout=5), converter)
+        timer.join()
+        stats = pool.stats()[self.pair]
+        self.assertEqual((stats['size'], stats['waits'], stats['grows']), (1, 1, 0))
+        self.assertGreater(stats['wait_time'], 0)
+
+    # para niezbudowana z góry w puli bez powiększania - błąd zamiast czekania
+    def test_empty_no_grow(self):
+        pool = ConverterPool(size=1, grow=False, formats=[self.pair])
+        self.assertRaises(ValueError, pool.checkout, 'textile', 'html')
+        self.assertEqual(pool.stats()[('textile', 'html')]['waits'], 0)
+
+    def test_threads(self):
+        pool = ConverterPool(size=2, grow=False, formats=[self.pair])
+        expected = pool.convert('- a\n- b\n', *self.pair)
+        results = []
+
+        def work():
+            for _ in range(20):
+                results.append(pool.convert('- a\n- b\n', *self.pair))
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [expected] * 120)
+        stats = pool.stats()[self.pair]
+        self.assertEqual((stats['size'], stats['in_use']), (2, 0))
+        self.assertLessEqual(stats['peak_in_use'], 2)
+
+    def test_wrong_format(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertRaises(ValueError, ConverterPool, formats=[('txt2tags', 'nope')])
+
+class DocumentTreeTests(unittest.TestCase):
+    '''
+    Drzewo dokumentu jako reprezentacja pośrednia.
+    '''
+
+    def test_tree(self):
+        t = registry.get(Txt2TagsToHTML)
+        tree = t.document('**a** b\\\\\nc\n\n- x\n + y')
+        # pusty akapit na końcu daje gramatyka txt2tags (w HTML <p></p>)
+        self.assertEqual(tree, document.Document([
+            document.Paragraph([document.Bold(['a']), 'b', document.LineBreak(), 'c']),
+            document.List(False, [document.Item(['x']), document.List(True, [document.Item(['y'])])]),
+            document.Paragraph([]),
+        ]))
+        self.assertEqual(t.document('= Title =').children[0], document.Heading(1, ['Title']))
+        self.assertEqual(t.document(''), document.Document([]))
+
+    # dokument w płaskich tablicach: cały tekst w jednym napisie,
+    # bajt na zdarzenie; węzły bloków są odtwarzane przy odczycie
+    def test_compact(self):
+        tree = registry.get(Txt2TagsToHTML).document('a b **c d** e\\\\\nf g\n\n== h ==')
+        self.assertEqual(tree.text, 'a bc def gh')
+        self.assertEqual(tree.kinds.itemsize, 1)
+        self.assertEqual(len(tree.ends), 5)
+        self.assertEqual(document.Document(tree.children), tree)
+        paragraph = tree.children[0]
+        self.assertEqual(paragraph.children, ('a b', document.Bold(['c d']), 'e', document.LineBreak(), 'f g'))
+        self.assertEqual(tree.children[1], document.Heading(2, ['h']))
+        self.assertFalse(hasattr(paragraph, '__dict__'))
+
+    # zapis z drzewa daje to samo co drugi przebieg przez HTML
+    def test_same_as_html(self):
+        sources = {'txt2tags': ['tests/document.t2t', 'tests/t2t_list.txt', 'tests/t2t_plain_3par.txt'],
+                   'textile': ['tests/document.textile']}
+        for input_t, paths in sources.items():
+            for path in paths:
+                with open(path) as f:
+                    text = f.read()
+                for output_t in ['txt2tags', 'textile', 'dokuwiki']:
+                    tree = SimpleMarkupConverter(input_t=input_t, output_t=output_t)
+                    html = SimpleMarkupConverter(input_t=input_t, output_t=output_t, use_document=False)
+                    self.assertTrue(tree.uses_document())
+                    self.assertFalse(html.uses_document())
+                    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                        self.assertEqual(tree.convert(text), html.convert(text), (path, output_t))
+
+    # nagłówek z formatowaniem - drugi przebieg przez HTML go nie obsługuje
+    def test_formatted_heading(self):
+        smc = SimpleMarkupConverter(input_t='textile', output_t='txt2tags')
+        self.assertEqual(smc.convert('h2. a *b*\n\n'), (Exit.SUCCESS, '== a **b** ==\n\n'))
+
+    def test_html_output(self):
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='html')
+        self.assertFalse(smc.uses_document())
+        self.assertEqual(smc.convert('**a**'), (Exit.SUCCESS, '<p><b>a</b></p>'))
+
+class DirectTranslatorTests(unittest.TestCase):
+    '''
+    Bezpośrednia konwersja txt2tags <-> DokuWiki (bez HTML).
+    '''
+
+    def test_t2t_to_doku(self):
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='dokuwiki')
+        self.assertIn(smc.DIRECT, smc.translator)
+        text = '== Title ==\n\n**a** //b//\n\n- x\n - y\n+ z\n  + w\n'
+        self.assertEqual(smc.convert(text), (Exit.SUCCESS,
+                         '===== Title =====\n\n**a** //b//\n\n* x\n  * y\n- z\n  - w\n'))
+
+    def test_doku_to_t2t(self):
+        smc = SimpleMarkupConverter(input_t='dokuwiki', output_t='txt2tags')
+        text = '====== Title ======\n\n* x\n  * y\n- z\n  - w\n__u__'
+        self.assertEqual(smc.convert(text), (Exit.SUCCESS,
+                         '= Title =\n\n- x\n - y\n+ z\n + w\n__u__'))
+
+    # linia będąca punktem listy tylko w języku docelowym - pełna konwersja
+    def test_fallback(self):
+        direct = SimpleMarkupConverter(input_t='txt2tags', output_t='dokuwiki')
+        full = SimpleMarkupConverter(input_t='txt2tags', output_t='dokuwiki', use_direct=False)
+        self.assertNotIn(full.DIRECT, full.translator)
+        for text in ['* x', 'a = b', '- x\n  * y']:
+            self.assertIsNone(direct.translator[direct.DIRECT].run(text))
+            self.assertEqual(direct.convert(text), full.convert(text))
+
+    # wcięty punkt listy po pustej linii jest zwykłym tekstem
+    def test_indented_after_blank(self):
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='dokuwiki')
+        self.assertEqual(smc.convert('a\n\n - x'), (Exit.SUCCESS, 'a\n\n - x'))
+
+    # wynik bezpośredni i pełny mają w języku docelowym tę samą strukturę
+    def test_same_as_full(self):
+        norm = lambda html: re.sub(r'\s*(<[^>]*>)\s*', r'\1', ' '.join(html.split())).replace('<p></p>', '')
+        cases = {
+            'txt2tags': ['- c d c d\n__x,y__\nbb a \\\\\n\n - a a **c d**\n= h =',
+                         '+ a \\\\ \n\n\n - b\n',
+                         '+ a\n - b\n + c\n'],
+            'dokuwiki': ['* a \\\\\n\n  * b\n',
+                         '- a\n  * b\n  - c\n'],
+        }
+        for input_t, output_t in [('txt2tags', 'dokuwiki'), ('dokuwiki', 'txt2tags')]:
+            direct = SimpleMarkupConverter(input_t=input_t, output_t=output_t)
+            full = SimpleMarkupConverter(input_t=input_t, output_t=output_t, use_direct=False)
+            parser = registry.get(full.translator_map[output_t][full.IN])
+            for text in cases[input_t]:
+                a = direct.convert(text)[1]
+                b = full.convert(text)[1]
+                self.assertEqual(norm(parser.run(a)), norm(parser.run(b)), text)
+
+    def test_translator_paths(self):
+        paths = SimpleMarkupConverter.translator_paths()
+        self.assertIn('translator.direct.Txt2TagsToDokuWiki', paths)
+        self.assertIn('translator.direct.DokuWikiToTxt2Tags', paths)
+
+class MultiTargetTests(unittest.TestCase):
+    '''
+    Konwersja jednego tekstu do wielu formatów wyjściowych.
+    '''
+
+    formats = ['html', 'txt2tags', 'textile', 'dokuwiki']
+
+    def setUp(self):
+        with open('tests/document.t2t') as f:
+            self.text = f.read()
+
+    # wynik dla każdego formatu taki sam jak z osobnego konwertera
+    def test_same_as_single(self):
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t=self.formats)
+        exit_code, outputs = smc.convert_all(self.text)
+        self.assertEqual(exit_code, Exit.SUCCESS)
+        for output_t in self.formats:
+            single = SimpleMarkupConverter(input_t='txt2tags', output_t=output_t)
+            self.assertEqual(single.convert(self.text), (Exit.SUCCESS, outputs[output_t]), output_t)
+        self.assertEqual(smc.convert(self.text), (Exit.SUCCESS, outputs['html']))
+
+    # każda para formatów wyjściowych daje to samo co osobne konwertery
+    # (także gdy tylko jeden z nich przechodzi przez drzewo dokumentu)
+    def test_pairs_same_as_single(self):
+        with open('tests/document.textile') as f:
+            texts = {
+                'txt2tags': [self.text, '- a\n - b\n\n= h =\n'],
+                'textile': [f.read(), 'h2. a *b*\n\n'],
+                'dokuwiki': ['===== a **b** =====\n\n* x\n  - y\n', '**a** //b//\n'],
+                'pass': ['<p>a</p>'],
+            }
+        outputs = [output_t for output_t, translators in SimpleMarkupConverter.translator_map.items()
+                   if SimpleMarkupConverter.OUT in translators]
+        for input_t, inputs in texts.items():
+            single = dict((output_t, SimpleMarkupConverter(input_t=input_t, output_t=output_t))
+                          for output_t in outputs)
+            for text in inputs:
+                expected = dict((output_t, single[output_t].convert(text)) for output_t in outputs)
+                for pair in itertools.combinations(outputs, 2):
+                    smc = SimpleMarkupConverter(input_t=input_t, output_t=list(pair))
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        exit_code, result = smc.convert_all(text)
+                    if all(expected[output_t][0] == Exit.SUCCESS for output_t in pair):
+                        self.assertEqual(exit_code, Exit.SUCCESS, (input_t, pair, text))
+                        for output_t in pair:
+                            self.assertEqual(result[output_t], expected[output_t][1], (input_t, output_t, text))
+                    else:
+                        self.assertEqual(exit_code, Exit.TRANSLATION_ERROR, (input_t, pair, text))
+
+    def test_processes(self):
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t=self.formats)
+        self.assertEqual(smc.convert_all(self.text, processes=2), smc.convert_all(self.text))
+
+    def test_wrong_format(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            smc = SimpleMarkupConverter(input_t='txt2tags', output_t=['textile', 'nope'])
+        self.assertEqual(smc.status, Exit.WRONG_CMD)
+
+    # plik dla każdego formatu: ścieżka -o z rozszerzeniem formatu
+    def test_cli(self):
+        directory = tempfile.mkdtemp()
+        try:
+            base = os.path.join(directory, 'out')
+            subprocess.check_call([sys.executable, 'main.py', 'txt2tags', 'textile,txt2tags',
+                                   'tests/document.t2t', '-o', base])
+            smc = SimpleMarkupConverter(input_t='txt2tags', output_t=['textile', 'txt2tags'])
+            outputs = smc.convert_all(self.text)[1]
+            for output_t, path in [('textile', base + '.textile'), ('txt2tags', base + '.t2t')]:
+                with open(path) as f:
+                    self.assertEqual(f.read(), outputs[output_t])
+        finally:
+            shutil.rmtree(directory)
+
+    # plik formatu wejściowego bez -o zastąpiłby plik wejściowy
+    def test_cli_input_overwrite(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'doc.t2t')
+            shutil.copy('tests/document.t2t', path)
+            process = subprocess.run([sys.executable, 'main.py', 'txt2tags', 'html,txt2tags', path],
+                                     stdout=subprocess.PIPE)
+            self.assertEqual(process.returncode, Exit.WRONG_CMD)
+            with open(path) as f:
+                self.assertEqual(f.read(), self.text)
+            self.assertEqual(os.listdir(directory), ['doc.t2t'])
+        finally:
+            shutil.rmtree(directory)
+
+class IntermediateCacheTests(unittest.TestCase):
+    '''
+    Pamięć podręczna wyników translatora wejściowego.
+    '''
+
+    def test_hit(self):
+        cache = IntermediateCache()
+        text = '= T =\n\n**a** b'
+        results = []
+        for output_t in ['textile', 'txt2tags', 'html', 'textile']:
+            smc = SimpleMarkupConverter(input_t='txt2tags', output_t=output_t, cache=cache)
+            plain = SimpleMarkupConverter(input_t='txt2tags', output_t=output_t)
+            self.assertEqual(smc.convert(text), plain.convert(text), output_t)
+        stats = cache.stats()
+        # drzewo (textile dwa razy, txt2tags) i HTML (html)
+        self.assertEqual((stats['entries'], stats['hits'], stats['misses']), (2, 2, 2))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    # klucz zależy od treści i formatu wejściowego
+    def test_key(self):
+        cache = IntermediateCache()
+        t2t = SimpleMarkupConverter(input_t='txt2tags', output_t='html', cache=cache)
+        doku = SimpleMarkupConverter(input_t='dokuwiki', output_t='html', cache=cache)
+        self.assertEqual(t2t.convert('**a**'), (Exit.SUCCESS, '<p><b>a</b></p>'))
+        self.assertEqual(t2t.convert('//a//'), (Exit.SUCCESS, '<p><i>a</i></p>'))
+        self.assertEqual(doku.convert('**a**'), (Exit.SUCCESS, '<p><b>a</b></p>'))
+        self.assertEqual(cache.stats()['hits'], 0)
+
+    def test_limit(self):
+        cache = IntermediateCache(max_entries=2)
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='html', cache=cache)
+        for text in ['a', 'b', 'a', 'c', 'b']:
+            smc.convert(text)
+        self.assertEqual(len(cache), 2)
+        # 'b' usunięte jako najdawniej używane po dodaniu 'c'
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+
+    # limit łącznego rozmiaru wyników w znakach
+    def test_size_limit(self):
+        cache = IntermediateCache(max_size=100)
+        for n, text in enumerate(['a' * 40, 'b' * 40, 'c' * 40]):
+            cache.put(n, text)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(0))
+        self.assertEqual(cache.stats()['size'], 80)
+        # wynik większy niż limit nie jest zapamiętywany
+        cache.put(3, 'd' * 101)
+        self.assertIsNone(cache.get(3))
+        self.assertEqual(len(cache), 2)
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='textile', cache=cache)
+        smc.convert('**a** b')
+        self.assertLessEqual(cache.stats()['size'], 100)
+        self.assertEqual(smc.convert('**a** b'), (Exit.SUCCESS, '*a* b\n\n'))
+        self.assertEqual(cache.hits, 1)
+
+class ScalingTests(unittest.TestCase):
+    '''
+    Reguły gramatyki nie sklejają całego dotychczasowego wyniku w każdej
+    redukcji, więc praca parsera rośnie liniowo z rozmiarem dokumentu
+    (pomiar czasu do 10 MB: benchmarks/scaling.py).
+    '''
+
+    def built(self, translator_type, text):
+        '''
+        Łączna długość napisów i list tworzonych przez reguły p_* - wynik
+        przekazany dalej bez kopii (np. lista rozszerzona w miejscu) się
+        nie liczy.
+        '''
+        total = [0]
+
+        def rebind(f):
+            if not f.__name__.startswith('p_'):
+                return f
+
+            def rule(p):
+                f(p)
+                if isinstance(p[0], (str, list)) and all(p[0] is not s.value for s in p.slice[1:]):
+                    total[0] += len(p[0])
+            return rule
+
+        t = registry.get(translator_type)
+        t.my_lex, t.my_yacc = t.bind(rebind)
+        t.strip_trace = False
+        self.assertIsNotNone(t.run(text))
+        return total[0] / len(text)
+
+    def test_linear(self):
+        sources = {
+            Txt2TagsToHTML: 'word **bold** //italic// end\n',
+            TextileToHTML: 'word *bold* _italic_ end\n',
+            HtmlToTxt2Tags: '<p>word <b>bold</b> <i>italic</i> end</p>',
+            HtmlToTextile: '<ul><li>word <b>bold</b></li></ul><ol><li>end</li></ol>',
+        }
+        for translator_type, line in sources.items():
+            # jeden akapit i dokument z wielu bloków
+            for unit in [line, line + '\n']:
+                small = self.built(translator_type, unit * (8 * 1024 // len(unit)))
+                large = self.built(translator_type, unit * (64 * 1024 // len(unit)))
+                # przy sklejaniu w każdej redukcji byłoby to ok. 8
+                self.assertLess(large / small, 1.5, (translator_type.__name__, unit))
+
+class TraceTests(unittest.TestCase):
+    '''
+    Komunikaty debug w regułach lexera i parsera.
+    '''
+
+    text = '**a** b\n\n- x\n+ y'
+
+    # przy wyłączonym DEBUG reguły nie wywołują self.log.debug
+    def test_untraced(self):
+        calls = []
+
+        class Log(object):
+            def isEnabledFor(self, level):
+                return False
+
+            def debug(self, *args):
+                calls.append(args)
+
+        t = registry.get(Txt2TagsToHTML)
+        t.log = Log()
+        html = t.run(self.text)
+        self.assertEqual(calls, [])
+        t.strip_trace = False
+        self.assertEqual(t.run(self.text), html)
+        self.assertNotEqual(calls, [])
+
+    # kopia wiąże tylko funkcje przepisane raz dla klasy, bez pary
+    # z komunikatami debug
+    def test_clone_untraced(self):
+        t = registry.get(Txt2TagsToHTML)
+        html = t.run(self.text)
+        functions = dict(Txt2TagsToHTML._untraced_functions)
+        clone = t.clone()
+        self.assertEqual(clone.run(self.text), html)
+        self.assertIsNotNone(clone._bind_source)
+        self.assertEqual(Txt2TagsToHTML._untraced_functions, functions)
+        prod = clone.untraced_parser()[1].productions[1]
+        self.assertIs(prod.callable.__func__, functions[prod.func])
+        self.assertIs(prod.callable.__self__, clone)
+
+    def test_debug(self):
+        t = registry.get(Txt2TagsToHTML)
+        with self.assertLogs('Txt2TagsToHTML', logging.DEBUG) as logs:
+            t.run(self.text)
+        self.assertIn('DEBUG:Txt2TagsToHTML:BOLD_S token: **', logs.output)
+
+    def test_untraced_function(self):
+        f = Txt2TagsToHTML.t_ANY_WORD
+        g = untraced(f)
+        self.assertIsNot(g, f)
+        self.assertEqual((g.__name__, g.__doc__, g.__code__.co_firstlineno),
+                         (f.__name__, f.__doc__, f.__code__.co_firstlineno))
+        self.assertNotIn('debug', g.__code__.co_names)
+        # funkcja bez komunikatów debug zostaje bez zmian
+        self.assertIs(untraced(Txt2TagsToHTML.p_heading), Txt2TagsToHTML.p_heading)
+
+class LexerTests(unittest.TestCase):
+    '''
+    Tokeny rozpoznawane bez dodatkowych wyrażeń w funkcjach t_*.
+    '''
+
+    def tokens(self, translator_type, text):
+        t = registry.get(translator_type)
+        lexer = t.my_lex.clone()
+        lexer.context = t.new_context()
+        lexer.input(text)
+        return [(tok.type, tok.value) for tok in iter(lexer.token, None)]
+
+    # słowo przed \\ jest cięte przez grupę break_word wyrażenia lexera
+    def test_break_word(self):
+        self.assertEqual(self.tokens(Txt2TagsToHTML, 'a bc\\\\\nd'),
+                         [('WORD', 'a'), ('WORD', 'bc'), ('BREAKLINE', '\\\\\n'), ('WORD', 'd')])
+        self.assertEqual(self.tokens(Txt2TagsToHTML, 'a-b\\\\ c'),
+                         [('WORD', 'a-b\\\\'), ('WORD', 'c')])
+
+    def test_heading_level(self):
+        self.assertEqual(self.tokens(TextileToHTML, 'h3. x')[0], ('HEADING_S', 3))
+        self.assertEqual(self.tokens(HtmlToTxt2Tags, '<h4>x</h4>')[0], ('H_S', '===='))
+
+    # słowo przed znacznikiem zamykającym kończy się na pierwszym znaczniku
+    def test_tag_end_word(self):
+        self.assertEqual(self.tokens(Txt2TagsToHTML, '**a*b/c**d**')[1], ('WORD', 'a*b/c'))
+        self.assertEqual(self.tokens(Txt2TagsToHTML, '*****')[1], ('WORD', '*'))
+        self.assertEqual(self.tokens(TextileToHTML, '*ab+c*')[1], ('WORD', 'ab'))
+        self.assertEqual(self.tokens(HtmlToTxt2Tags, '<p>a<b</p>')[1], ('WORD', 'a<b'))
+        self.assertEqual(self.tokens(HtmlToTxt2Tags, '<p>a</b></p>')[1], ('WORD', 'a'))
+
+class LongTokenTests(unittest.TestCase):
+    '''
+    Linie z jednym słowem o długości 1 MB (np. base64, adresy URL) i długie
+    ciągi spacji przed znacznikiem zamykającym - jedno słowo to jeden token,
+    a czas lexera jest liniowy.
+    '''
+
+    size = 1024 * 1024
+    # ok. 0,04 s na słowo; przy czasie kwadratowym byłyby to minuty
+    max_time = 5.0
+    tokens = LexerTests.tokens
+
+    def timed(self, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.assertLess(time.perf_counter() - start, self.max_time)
+        return result
+
+    def test_formatted_blob(self):
+        blob = 'QUJD' * (self.size // 4)
+        for translator_type, tag in [(Txt2TagsToHTML, '**'), (Txt2TagsToHTML, '//'), (TextileToHTML, '*')]:
+            tokens = self.timed(self.tokens, translator_type, tag + blob + tag + '\n')
+            self.assertEqual([value for _, value in tokens], [tag, blob, tag, '\n'])
+            self.assertIn(blob, self.timed(registry.get(translator_type).run, tag + blob + tag + '\n'))
+        # znaki znacznika pojedynczo w słowie
+        word = 'a*' * (self.size // 2) + 'a'
+        self.assertEqual(self.timed(self.tokens, Txt2TagsToHTML, '**' + word + '**\n')[1], ('WORD', word))
+
+    def test_html_blob(self):
+        blob = 'QUJD' * (self.size // 4)
+        self.assertEqual(self.timed(self.tokens, HtmlToTxt2Tags, '<p><b>' + blob + '</b></p>')[2], ('WORD', blob))
+        word = 'a<' * (self.size // 2)
+        self.assertEqual(self.timed(self.tokens, HtmlToTxt2Tags, '<p>' + word + '</p>')[1], ('WORD', word))
+        t = registry.get(HtmlToTxt2Tags)
+        self.assertEqual(self.timed(t.run, '<p>a' + ' ' * self.size + '</p>').strip(), 'a')
+
+class PlainFastPathTests(unittest.TestCase):
+    '''
+    Bloki bez znaczników zamieniane na akapity bez parsowania.
+    '''
+
+    texts = {
+        Txt2TagsToHTML: 'Some  plain\ntext \n\n= Head =\n\n- a\n- b\n\nmore  words\n\n  - indented\n\nend\\\\\n\nlast',
+        TextileToHTML: 'Some  plain\ntext \n\nh2. Head\n\n* a\n* b\n\nmore  *bold*\n\nlast\nline',
+    }
+
+    def convert(self, translator_type, text, fast):
+        t = registry.get(translator_type)
+        t.plain_fast_path = fast
+        return t, (t.run(text), t.document(text))
+
+    def test_same_output(self):
+        for translator_type, text in self.texts.items():
+            t, fast = self.convert(translator_type, text, True)
+            self.assertEqual(fast, self.convert(translator_type, text, False)[1])
+            self.assertGreater(t.block_stats['plain'], 0)
+            self.assertGreater(t.block_stats['parsed'], 0)
+
+    def test_plain_blocks(self):
+        t, (html, _) = self.convert(Txt2TagsToHTML, 'a  b\n c\n\nd', True)
+        self.assertEqual(html, '<p>a b\nc</p><p>d</p>')
+        self.assertEqual(t.block_stats, {'plain': 4, 'parsed': 0})
+        t, (html, _) = self.convert(TextileToHTML, 'a  b\n c', True)
+        self.assertEqual(html, '<p>a b <br/> c</p>')
+
+    # błąd składni odrzuca wcześniejsze bloki - wynik jak przy parsowaniu całości
+    def test_syntax_error(self):
+        text = 'x\n\n**a\n\nb'
+        with contextlib.redirect_stderr(io.StringIO()):
+            t, fast = self.convert(Txt2TagsToHTML, text, True)
+            self.assertEqual(fast, self.convert(Txt2TagsToHTML, text, False)[1])
+        self.assertEqual(fast[0], '<p>b</p>')
+        self.assertEqual(t.block_stats, {'plain': 0, 'parsed': 0})
+
+class StreamingTests(unittest.TestCase):
+    '''
+    Konwersja strumieniowa częściami tekstu (iter_convert).
+    '''
+
+    formats = ['html', 'txt2tags', 'textile', 'dokuwiki']
+
+    def setUp(self):
+        with open('tests/document.t2t') as f:
+            self.text = f.read()
+
+    # złączone części to wynik convert() (bez translatora bezpośredniego),
+    # także przez HTML
+    def test_same_output(self):
+        for output_t in self.formats:
+            for use_document in [True, False]:
+                smc = SimpleMarkupConverter(input_t='txt2tags', output_t=output_t,
+                                            use_document=use_document, use_direct=False)
+                parts = list(smc.iter_convert(self.text, 1))
+                self.assertGreater(len(parts), 1)
+                self.assertEqual(''.join(parts), smc.convert(self.text)[1], output_t)
+
+    # wejście jako ciąg kawałków (np. plik) - podział nie zależy od kawałków
+    def test_chunks(self):
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='textile')
+        with open('tests/document.t2t') as f:
+            self.assertEqual(list(smc.iter_convert(f, 100)), list(smc.iter_convert(self.text, 100)))
+        t = registry.get(Txt2TagsToHTML)
+        self.assertEqual(list(t.split(iter('- a\n- b\n\n- c\n\nx\n\n  y\n\nz'), 1)),
+                         ['- a\n- b', '- c', 'x\n\n  y', 'z'])
+        self.assertEqual(list(t.split(iter('- a\n- b\n\n- c\n \n\nx'), 1, separators=True)),
+                         ['- a\n- b\n\n', '- c\n \n\n', 'x'])
+
+    # błąd składni przerywa konwersję zamiast odrzucać wcześniejszy tekst
+    def test_syntax_error(self):
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='html')
+        parts = smc.iter_convert('x\n\n**a\n\nb', 1)
+        self.assertEqual(next(parts), '<p>x</p>')
+        with self.assertRaises(ConversionError) as e:
+            next(parts)
+        self.assertEqual(e.exception.exit_code, Exit.TRANSLATION_ERROR)
+        # położenie błędu w całym dokumencie (koniec '**a')
+        self.assertIn('at index 6', str(e.exception))
+
+    # położenie błędu lexera liczone od początku dokumentu, jak w convert()
+    def test_lexer_error_position(self):
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='html')
+        text = self.text + '\n\n**a**\n\n==\t=]]\n\n_aa'
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(smc.convert(text), (Exit.TRANSLATION_ERROR, None))
+        for processes in [None, 2]:
+            with self.assertRaises(ConversionError) as e:
+                list(smc.iter_convert(text, 100, processes))
+            self.assertEqual(str(e.exception), output.getvalue().strip())
+        self.assertIn('at index %d' % (len(self.text) + 15), str(e.exception))
+
+    # translator bezpośredni dla kolejnych części, pełna konwersja dla
+    # części, których nie da się nim przetłumaczyć
+    def test_direct(self):
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='dokuwiki')
+        parts = list(smc.iter_convert(self.text, 100))
+        self.assertGreater(len(parts), 1)
+        self.assertEqual(''.join(parts), smc.convert(self.text)[1])
+        full = SimpleMarkupConverter(input_t='txt2tags', output_t='dokuwiki', use_direct=False)
+        self.assertEqual(list(smc.iter_convert('* a\n\n- b', 1)),
+                         [full.convert('* a\n\n')[1], smc.translator[smc.DIRECT].run('- b')])
+
+    # części w procesach - wynik identyczny z konwersją w jednym procesie
+    def test_processes(self):
+        for output_t in ['html', 'dokuwiki']:
+            smc = SimpleMarkupConverter(input_t='txt2tags', output_t=output_t, use_direct=False)
+            self.assertEqual(list(smc.iter_convert(self.text, 100, processes=2)),
+                             list(smc.iter_convert(self.text, 100)))
+        with self.assertRaises(ConversionError):
+            list(smc.iter_convert(self.text + '\n\n**a', 100, processes=2))
+
+    def test_cli(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'out.textile')
+            subprocess.check_call([sys.executable, 'main.py', 'txt2tags', 'textile',
+                                   'tests/document.t2t', '-o', path, '-j', '2', '-c', '100'])
+            smc = SimpleMarkupConverter(input_t='txt2tags', output_t='textile')
+            with open(path) as f:
+                self.assertEqual(f.read(), smc.convert(self.text)[1])
+        finally:
+            shutil.rmtree(directory)
+
+    # wynik na standardowe wyjście jak print() całości
+    def test_cli_stdout(self):
+        output = subprocess.check_output([sys.executable, 'main.py', 'txt2tags', 'textile',
+                                          'tests/document.t2t', '-c', '100'])
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='textile')
+        self.assertEqual(output.decode(), smc.convert(self.text)[1] + '\n')
+
+    # "-" - wynik ze standardowego wejścia pojawia się przed końcem danych
+    def test_cli_pipe(self):
+        process = subprocess.Popen([sys.executable, 'main.py', 'txt2tags', 'html', '-', '-c', '100'],
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        first = []
+        reader = threading.Thread(target=lambda: first.append(process.stdout.read(1)))
+        reader.start()
+        process.stdin.write(self.text.encode())
+        process.stdin.flush()
+        reader.join(20)
+        self.assertEqual(first, [b'<'])
+        process.stdin.write(b'\n\nend')
+        process.stdin.close()
+        output = first[0] + process.stdout.read()
+        process.stdout.close()
+        self.assertEqual(process.wait(), Exit.SUCCESS)
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='html')
+        self.assertEqual(output.decode(), smc.convert(self.text + '\n\nend')[1] + '\n')
+
+    # domyślnie także para z translatorem bezpośrednim jest tłumaczona
+    # częściami - wynik pojawia się przed końcem danych
+    def test_cli_pipe_direct(self):
+        process = subprocess.Popen([sys.executable, 'main.py', 'txt2tags', 'dokuwiki', '-'],
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        text = self.text * (2 * SimpleMarkupConverter.chunk_size // len(self.text) + 1)
+        first = []
+        reader = threading.Thread(target=lambda: first.append(process.stdout.read(1)))
+        reader.start()
+        process.stdin.write(text.encode())
+        process.stdin.flush()
+        reader.join(20)
+        self.assertEqual(first, [b'='])
+        process.stdin.write(b'\n\nend')
+        process.stdin.close()
+        output = first[0] + process.stdout.read()
+        process.stdout.close()
+        self.assertEqual(process.wait(), Exit.SUCCESS)
+        smc = SimpleMarkupConverter(input_t='txt2tags', output_t='dokuwiki')
+        self.assertEqual(output.decode(), smc.convert(text + '\n\nend')[1] + '\n')
+
+    # błąd składni nie zostawia częściowego wyniku - plik -o bez zmian
+    def test_cli_error(self):
+        directory = tempfile.mkdtemp()
+        try:
+            source = os.path.join(directory, 'in.t2t')
+            path = os.path.join(directory, 'out.html')
+            for name, text in [(source, self.text + '\n\n**a'), (path, 'old')]:
+                with open(name, 'w') as f:
+                    f.write(text)
+            exit_code = subprocess.call([sys.executable, 'main.py', 'txt2tags', 'html', source,
+                                         '-o', path, '-c', '100'], stdout=subprocess.DEVNULL)
+            self.assertEqual(exit_code, Exit.TRANSLATION_ERROR)
+            with open(path) as f:
+                self.assertEqual(f.read(), 'old')
+            self.assertEqual(sorted(os.listdir(directory)), ['in.t2t', 'out.html'])
+        finally:
+            shutil.rmtree(directory)
+
+    # błąd składni, który convert() pomija: przed zapisaniem pierwszej
+    # części i z -o po błędzie w części wynik i kod wyjścia jak z convert(),
+    # a po zapisanej części konwersja przerwana
+    def test_cli_lenient(self):
+        directory = tempfile.mkdtemp()
+        try:
+            source = os.path.join(directory, 'in.t2t')
+            path = os.path.join(directory, 'out.textile')
+            text = 'lorem **ipsum\n\nsit amet\n'
+            with open(source, 'w') as f:
+                f.write(text)
+            with contextlib.redirect_stdout(io.StringIO()):
+                expected = SimpleMarkupConverter(input_t='txt2tags', output_t='textile').convert(text)
+            self.assertEqual(expected[0], Exit.SUCCESS)
+
+            for args in [[source], [source, '-c', '1'], ['-', '-c', '1']]:
+                process = subprocess.run([sys.executable, 'main.py', 'txt2tags', 'textile'] + args,
+                                         input=text.encode(), stdout=subprocess.PIPE)
+                self.assertEqual(process.returncode, Exit.SUCCESS, args)
+                self.assertTrue(process.stdout.decode().endswith(expected[1] + '\n'), args)
+
+            for args in [[], ['-c', '1'], ['-c', '1', '-j', '2']]:
+                exit_code = subprocess.call([sys.executable, 'main.py', 'txt2tags', 'textile', source,
+                                             '-o', path] + args, stdout=subprocess.DEVNULL)
+                self.assertEqual(exit_code, Exit.SUCCESS, args)
+                with open(path) as f:
+                    self.assertEqual(f.read(), expected[1], args)
+                os.remove(path)
+
+            process = subprocess.run([sys.executable, 'main.py', 'txt2tags', 'textile', '-', '-c', '1'],
+                                     input=('x\n\n' + text).encode(), stdout=subprocess.PIPE)
+            self.assertEqual(process.returncode, Exit.TRANSLATION_ERROR)
+            output = process.stdout.decode()
+            self.assertTrue(output.startswith('x\n\n'))
+            self.assertIn('at index 16', output)
+        finally:
+            shutil.rmtree(directory)
+
+    # bez -c, -j i -o wynik na standardowe wyjście też jest zapisywany
+    # częściami - pierwsza pojawia się przed końcem konwersji (plik
+    # wejściowy to potok nazwany, więc konwersja czeka na resztę danych)
+    def test_cli_stdout_parts(self):
+        directory = tempfile.mkdtemp()
+        try:
+            source = os.path.join(directory, 'in.t2t')
+            os.mkfifo(source)
+            process = subprocess.Popen([sys.executable, 'main.py', 'txt2tags', 'html', source],
+                                       stdout=subprocess.PIPE)
+            text = self.text * (2 * SimpleMarkupConverter.chunk_size // len(self.text) + 1)
+            first = []
+            reader = threading.Thread(target=lambda: first.append(process.stdout.read(1)))
+            reader.start()
+            with open(source, 'w') as f:
+                f.write(text)
+                f.flush()
+                reader.join(20)
+                self.assertEqual(first, [b'<'])
+                f.write('\n\nend')
+            output = first[0] + process.stdout.read()
+            process.stdout.close()
+            self.assertEqual(process.wait(), Exit.SUCCESS)
+            smc = SimpleMarkupConverter(input_t='txt2tags', output_t='html')
+            self.assertEqual(output.decode(), smc.convert(text + '\n\nend')[1] + '\n')
+        finally:
+            shutil.rmtree(directory)
+
+class ReadInputTests(unittest.TestCase):
+    '''
+    Odczyt pliku wejściowego przez mmap (read_text, read_chunks).
+    '''
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    # tekst jak z open() w trybie tekstowym, także dla pustego pliku
+    def test_same_as_open(self):
+        for text in ['', 'żółw\r\nłoś\rźrebię\n\n**ab**\r\n' * 1000]:
+            with open(self.path, 'w', newline='') as f:
+                f.write(text)
+            with open(self.path) as f:
+                expected = f.read()
+            with open(self.path, 'rb') as f:
+                self.assertEqual(read_text(f), expected)
+            # kawałki (co najmniej strona pliku) dzielą znaki wielobajtowe i pary \r\n
+            for size in [1, 5000, 10 ** 6]:
+                with open(self.path, 'rb') as f:
+                    chunks = list(read_chunks(f, size))
+                self.assertEqual(''.join(chunks), expected)
+                self.assertNotIn('', chunks)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+'''
+Pamięć podręczna wyników translatorów wejściowych (HTML albo drzewa
+dokumentu), wspólna dla wielu konwerterów.
+
+Kluczem jest format wejściowy, rodzaj wyniku i skrót treści, więc kolejna
+konwersja niezmienionego tekstu (np. do innego formatu) pomija parsowanie
+i wykonuje tylko etap wyjściowy. Wyniki nie są zmieniane (napisy, tablice
+drzew dokumentu), dlatego można je współdzielić między konwerterami i wątkami.
+'''
+
+import collections
+import hashlib
+import threading
+
+
+class IntermediateCache(object):
+    '''
+    Pamięć LRU z dwoma limitami: liczba wyników (max_entries) i ich łączny
+    rozmiar w znakach (max_size, None - bez limitu). Najdawniej używane
+    wyniki są usuwane, aż oba limity są spełnione; wynik większy niż
+    max_size nie jest zapamiętywany.
+    '''
+
+    def __init__(self, max_entries=128, max_size=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        # klucz -> (wynik, rozmiar)
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(input_t, kind, text):
+        '''
+        Klucz wyniku: format wejściowy, rodzaj wyniku ('html', 'document')
+        i skrót SHA-1 tekstu.
+        '''
+        digest = hashlib.sha1(text.encode('utf-8', 'surrogatepass')).hexdigest()
+        return (input_t, kind, digest)
+
+    @staticmethod
+    def size(value):
+        '''
+        Rozmiar wyniku w znakach: długość HTML albo tekstu drzewa dokumentu
+        i liczba elementów jego tablic.
+        '''
+        if isinstance(value, str):
+            return len(value)
+        return len(value.text) + len(value.kinds) + len(value.ends)
+
+    def get(self, key):
+        '''
+        Zwraca zapamiętany wynik albo None.
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.size(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            if self.max_size is not None and size > self.max_size:
+                return
+            self._entries[key] = (value, size)
+            self._size += size
+            while len(self._entries) > self.max_entries or \
+                    self.max_size is not None and self._size > self.max_size:
+                self._size -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        '''
+        Liczba i rozmiar wyników, trafienia, chybienia i współczynnik trafień.
+        '''
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'size': self._size,
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+            }
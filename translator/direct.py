@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+'''
+Bezpośrednie translatory między językami o tej samej składni wewnątrz
+linii (txt2tags i DokuWiki: **, //, __, \\\\) - bez HTML i bez parsowania.
+
+Przepisywana jest tylko składnia blokowa (nagłówki i punkty list),
+reszta tekstu jest kopiowana bez zmian.
+'''
+
+from .translator import Translator
+import re
+
+
+class LineTranslator(Translator):
+    '''
+    Bazowa klasa translatorów przepisujących początki linii.
+
+    Podklasy ustawiają:
+     blocks    - lista par (wyrażenie, zamiana) dla linii ze składnią
+                 blokową języka źródłowego,
+     ambiguous - wyrażenie dla linii, które w języku docelowym miałyby
+                 inne znaczenie niż w źródłowym (np. zwykła linia
+                 zaczynająca się od znacznika listy języka docelowego).
+
+    Gdy tekst zawiera takie linie, run() zwraca None, a konwerter
+    używa pełnej konwersji przez translatory wejściowy i wyjściowy.
+    '''
+
+    blocks = ()
+    ambiguous = None
+
+    def __init__(self):
+        super().__init__()
+        self.log.debug('%s constructor' % self.__class__.__name__)
+        # jedno wyrażenie dla wszystkich rodzajów linii - jeden przebieg po tekście
+        self.block_re = re.compile('|'.join('(?P<b%d>%s)' % (n, regex)
+                                            for n, (regex, _) in enumerate(self.blocks)),
+                                   re.MULTILINE)
+        self.replace = dict(('b%d' % n, replace) for n, (_, replace) in enumerate(self.blocks))
+        self.ambiguous_re = re.compile(self.ambiguous, re.MULTILINE)
+
+    def run(self, text):
+        match = self.ambiguous_re.search(text)
+        if match:
+            self.log.debug('Direct translation not possible: %r' % match.group(0))
+            return None
+        return self.block_re.sub(lambda m: self.replace[m.lastgroup](m), text)
+
+
+# Wyrażenie dla linii nagłówka z n_min..n_max znakami = po obu stronach
+# (grupy level i text).
+def heading_re(n_min, n_max):
+    return r'^[ \t]*(?P<level>={%d,%d})(?!=)[ \t]*(?P<text>\S[^=\n]*?)[ \t]*(?P=level)[ \t]*$' % (n_min, n_max)
+
+
+# Zamiana linii nagłówka; marks - liczba znaków = w języku docelowym
+# dla liczby znaków = w źródle.
+def heading(marks):
+    def replace(m):
+        target = '=' * marks(len(m.group('level')))
+        return '%s %s %s' % (target, m.group('text'), target)
+    return replace
+
+
+def prefix(text):
+    return lambda m: text
+
+
+# Wyrażenie dla zagnieżdżonej listy, która zmienia rodzaj (markers - znaki
+# obu rodzajów, indent - wcięcie): pełna konwersja kończy wtedy listę
+# zewnętrzną, a bezpośrednie przepisanie zachowałoby zagnieżdżenie.
+def mixed_nested_re(indent, markers):
+    return r'^%s(?P<marker>[%s])\ .*\n(?:(?!\ *[%s]\ ).*\n)*?%s(?!(?P=marker))[%s]\ ' % (indent, markers, markers, indent, markers)
+
+
+# Koniec akapitu (PAREND) zjada wcięcie następnej linii, więc wcięty punkt
+# listy po pustej linii jest w obu językach zwykłym tekstem. Dopasowanie
+# pustych linii razem z wcięciem (bez zmian) nie pozwala go przepisać.
+# Po łamaniu linii (\\) puste linie nie są końcem akapitu i wcięcie
+# zostaje - tak jak block_end w DocumentTranslator.
+KEEP_INDENTED = (r'(?<![\s\\])[ \t]*\n\s*\n[ \t]+(?=[-+*]\ )', lambda m: m.group(0))
+
+
+class Txt2TagsToDokuWiki(LineTranslator):
+    '''
+    Translator txt2tags -> DokuWiki bez pośrednictwa HTML
+    '''
+
+    blocks = (
+        KEEP_INDENTED,
+        # = nagłówek =  ->  ====== nagłówek ======
+        (heading_re(1, 5), heading(lambda n: 7 - n)),
+        # wypunktowanie I i II poziomu
+        (r'^-\ (?=\S)', prefix('* ')),
+        (r'^\ +-\ (?=\S)', prefix('  * ')),
+        # lista numerowana I i II poziomu
+        (r'^\+\ (?=\S)', prefix('- ')),
+        (r'^\ +\+\ (?=\S)', prefix('  - ')),
+    )
+
+    # punkty listy DokuWiki, które w txt2tags są zwykłym tekstem,
+    # znaki = poza nagłówkami (w obu językach zaczynają nagłówek)
+    # i zagnieżdżone listy zmieniające rodzaj
+    ambiguous = r'^(?:\ \ )?\*\ (?=\S)|^(?!%s).*(?<!\S)=|%s' % (heading_re(1, 5), mixed_nested_re(r'\ +', '-+'))
+
+
+class DokuWikiToTxt2Tags(LineTranslator):
+    '''
+    Translator DokuWiki -> txt2tags bez pośrednictwa HTML
+    '''
+
+    blocks = (
+        KEEP_INDENTED,
+        # ====== nagłówek ======  ->  = nagłówek =
+        (heading_re(2, 6), heading(lambda n: 7 - n)),
+        # wypunktowanie I i II poziomu
+        (r'^\*\ (?=\S)', prefix('- ')),
+        (r'^\ \ \*\ (?=\S)', prefix(' - ')),
+        # lista numerowana I i II poziomu
+        (r'^-\ (?=\S)', prefix('+ ')),
+        (r'^\ \ -\ (?=\S)', prefix(' + ')),
+    )
+
+    # punkty listy txt2tags, które w DokuWiki są zwykłym tekstem,
+    # znaki = poza nagłówkami (w obu językach zaczynają nagłówek)
+    # i zagnieżdżone listy zmieniające rodzaj
+    ambiguous = r'^(?:\ *\+|\ -|\ {3,}-)\ (?=\S)|^(?!%s).*(?<!\S)=|%s' % (heading_re(2, 6), mixed_nested_re(r'\ \ ', '*-'))
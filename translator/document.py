@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+
+'''
+Drzewo dokumentu - reprezentacja pośrednia między translatorami.
+
+Translatory wejściowe budują dokument przez budowniczego przekazanego
+w kontekście przebiegu (p.lexer.context):
+ HtmlBuilder - od razu tekst HTML (dotychczasowy język wewnętrzny),
+ TreeBuilder - drzewo węzłów z tego modułu.
+
+Drzewo zapisuje w docelowym języku znaczników Renderer (podklasy
+w modułach translatorów wyjściowych), bez ponownego parsowania HTML.
+
+Tekst jest w drzewie zwykłymi napisami - kolejne słowa połączone spacją.
+Gotowy dokument (Document) nie trzyma węzłów, tylko płaskie równoległe
+tablice zdarzeń i jeden napis z całym tekstem; węzły bloków są odtwarzane
+przy odczycie, po jednym bloku.
+'''
+
+from .list_indent import ListIndent
+from array import array
+import logging
+
+
+class Node(object):
+    '''
+    Węzeł drzewa dokumentu; children to krotka węzłów i słów.
+
+    Węzły istnieją w czasie budowania i odczytu bloku - Document przechowuje
+    drzewo w płaskich tablicach.
+    '''
+
+    __slots__ = ('children',)
+
+    def __init__(self, children=()):
+        self.children = tuple(children)
+
+    def _fields(self):
+        return [(name, getattr(self, name)) for cls in type(self).__mro__
+                for name in getattr(cls, '__slots__', ())]
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._fields() == other._fields()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__,
+                           ', '.join('%s=%r' % item for item in sorted(self._fields())))
+
+
+class Paragraph(Node):
+    __slots__ = ()
+
+
+class Heading(Node):
+    __slots__ = ('level',)
+
+    def __init__(self, level, children=()):
+        super().__init__(children)
+        self.level = level
+
+
+class List(Node):
+    '''
+    Lista wypunktowana albo numerowana (ordered); elementami są
+    pozycje (Item) i listy zagnieżdżone.
+    '''
+    __slots__ = ('ordered',)
+
+    def __init__(self, ordered=False, children=()):
+        super().__init__(children)
+        self.ordered = ordered
+
+
+class Item(Node):
+    __slots__ = ()
+
+
+class Bold(Node):
+    __slots__ = ()
+
+
+class Italic(Node):
+    __slots__ = ()
+
+
+class Underline(Node):
+    __slots__ = ()
+
+
+class LineBreak(Node):
+    '''
+    Łamanie linii - bez zawartości, TreeBuilder używa jednej instancji.
+    '''
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__()
+
+
+# Kody zdarzeń dokumentu (jeden bajt): węzeł z zawartością to zdarzenie
+# początku i _END po zawartości; poziom nagłówka jest częścią kodu
+# (_HEADING + poziom), a _TEXT to kolejny fragment napisu z tekstem.
+_TEXT, _END, _LINE_BREAK, _PARAGRAPH, _BULLETS, _NUMBERS, _ITEM, _BOLD, _ITALIC, _UNDERLINE, _HEADING = range(11)
+
+_CODES = {Paragraph: _PARAGRAPH, Item: _ITEM, Bold: _BOLD, Italic: _ITALIC, Underline: _UNDERLINE}
+_NODES = dict((code, cls) for cls, code in _CODES.items())
+
+
+class Document(object):
+    '''
+    Cały dokument - bloki (akapity, nagłówki, listy).
+
+    Drzewo jest zapisane w kolejności przejścia (pre-order) w płaskich
+    tablicach: kinds - kody zdarzeń (po bajcie), ends - końce kolejnych
+    fragmentów tekstu w napisie text z tekstem wszystkich węzłów. Zajmuje
+    więc około 1-2 bajtów na zdarzenie więcej niż sam tekst, a nie kilka
+    obiektów na każdy węzeł. blocks() odtwarza węzły kolejnych bloków.
+    '''
+
+    __slots__ = ('kinds', 'ends', 'text')
+
+    def __init__(self, children=()):
+        self.kinds = array('B')
+        ends = array('q')
+        texts = []
+        self._flatten(children, texts, ends)
+        self.text = ''.join(texts)
+        # tablice bez zapasu po dopisywaniu; końce po 4 bajty, jeśli wystarczą
+        self.kinds = array('B', self.kinds)
+        self.ends = array('I' if len(self.text) < 2 ** 32 else 'q', ends)
+
+    def _flatten(self, nodes, texts, ends):
+        kinds = self.kinds
+        for node in nodes:
+            if isinstance(node, str):
+                texts.append(node)
+                kinds.append(_TEXT)
+                ends.append((ends[-1] if ends else 0) + len(node))
+            elif isinstance(node, LineBreak):
+                kinds.append(_LINE_BREAK)
+            else:
+                if isinstance(node, Heading):
+                    kinds.append(_HEADING + node.level)
+                elif isinstance(node, List):
+                    kinds.append(_NUMBERS if node.ordered else _BULLETS)
+                else:
+                    kinds.append(_CODES[type(node)])
+                self._flatten(node.children, texts, ends)
+                kinds.append(_END)
+
+    def blocks(self):
+        '''
+        Węzły kolejnych bloków dokumentu (odtwarzane przy każdym wywołaniu).
+        '''
+        text = self.text
+        ends = iter(self.ends)
+        start = 0
+        # otwarte węzły: (kod, zawartość)
+        stack = []
+        for kind in self.kinds:
+            if kind == _TEXT:
+                end = next(ends)
+                node = text[start:end]
+                start = end
+            elif kind == _LINE_BREAK:
+                node = TreeBuilder._line_break
+            elif kind == _END:
+                code, children = stack.pop()
+                if code >= _HEADING:
+                    node = Heading(code - _HEADING, children)
+                elif code in (_BULLETS, _NUMBERS):
+                    node = List(code == _NUMBERS, children)
+                else:
+                    node = _NODES[code](children)
+            else:
+                stack.append((kind, []))
+                continue
+            if stack:
+                stack[-1][1].append(node)
+            else:
+                yield node
+
+    @property
+    def children(self):
+        return tuple(self.blocks())
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.kinds == other.kinds and \
+            list(self.ends) == list(other.ends) and self.text == other.text
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'Document(%r)' % (list(self.blocks()),)
+
+
+# === budowniczowie ===
+
+# Reguły gramatyk przekazują budowniczemu:
+#  parts - listę elementów jednej linii (słowa, łamania linii, formatowanie),
+#  lines - listę linii (list elementów) akapitu, pozycji listy czy nagłówka,
+#  entries - listę pozycji listy i list zagnieżdżonych,
+#  blocks - listę bloków dokumentu.
+
+class HtmlBuilder(object):
+    '''
+    Budowniczy tekstu HTML - daje dokładnie ten sam HTML co dawniej
+    reguły gramatyk translatorów wejściowych.
+    '''
+
+    def text(self, lines):
+        return '\n'.join(' '.join(parts) for parts in lines)
+
+    def document(self, blocks):
+        return ''.join(blocks)
+
+    # separated=False - po akapicie bez pustej linii następuje kolejny blok
+    def paragraph(self, lines, separated=True):
+        return '<p>%s</p>%s' % (self.text(lines), '' if separated else '\n')
+
+    def heading(self, level, lines):
+        return '<h%s>%s</h%s>' % (level, self.text(lines), level)
+
+    def bullet_list(self, entries):
+        return '<ul>%s</ul>' % '\n'.join(entries)
+
+    def numbered_list(self, entries):
+        return '<ol>%s</ol>' % '\n'.join(entries)
+
+    def item(self, lines):
+        return '<li>%s</li>' % self.text(lines)
+
+    def bold(self, parts):
+        return '<b>%s</b>' % ' '.join(parts)
+
+    def italic(self, parts):
+        return '<i>%s</i>' % ' '.join(parts)
+
+    def underline(self, parts):
+        return '<u>%s</u>' % ' '.join(parts)
+
+    def line_break(self):
+        return '<br/>'
+
+
+class TreeBuilder(object):
+    '''
+    Budowniczy drzewa dokumentu.
+    '''
+
+    _line_break = LineBreak()
+
+    def text(self, lines):
+        return self.merge(part for parts in lines for part in parts)
+
+    def merge(self, parts):
+        '''
+        Sąsiednie słowa są łączone spacją w jeden napis - zapis i tak
+        rozdziela elementy pojedynczą spacją, a drzewo ma wtedy o wiele
+        mniej obiektów.
+        '''
+        merged = []
+        words = []
+        for part in parts:
+            if isinstance(part, str):
+                words.append(part)
+                continue
+            if words:
+                merged.append(' '.join(words))
+                words = []
+            merged.append(part)
+        if words:
+            merged.append(' '.join(words))
+        return merged
+
+    def document(self, blocks):
+        return Document(blocks)
+
+    def paragraph(self, lines, separated=True):
+        return Paragraph(self.text(lines))
+
+    def heading(self, level, lines):
+        return Heading(level, self.text(lines))
+
+    def bullet_list(self, entries):
+        return List(False, entries)
+
+    def numbered_list(self, entries):
+        return List(True, entries)
+
+    def item(self, lines):
+        return Item(self.text(lines))
+
+    def bold(self, parts):
+        return Bold(self.merge(parts))
+
+    def italic(self, parts):
+        return Italic(self.merge(parts))
+
+    def underline(self, parts):
+        return Underline(self.merge(parts))
+
+    def line_break(self):
+        return self._line_break
+
+
+# === zapis drzewa ===
+
+class Renderer(object):
+    '''
+    Zapis drzewa dokumentu w języku znaczników.
+
+    Wynik jest taki sam, jak z translatora HTML -> język znaczników
+    uruchomionego na HTML-u z HtmlBuilder. Dotyczy to także wcięć list:
+    stan ListIndent zmienia się w tej samej kolejności co w lexerze
+    i parserze translatora (pozycja listy i koniec listy są przetwarzane
+    dopiero po odczytaniu kolejnego znacznika).
+    '''
+
+    # elementy składni - ustawiane w podklasach
+    line_break = '\n'
+    bold = '%s'
+    italic = '%s'
+    underline = '%s'
+
+    def __init__(self):
+        self.log = logging.getLogger(self.__class__.__name__)
+
+    def heading(self, level, text):
+        return '%s\n\n' % text
+
+    # początek pozycji listy wypunktowanej / numerowanej na poziomie indent
+    def bullet(self, indent):
+        return ''
+
+    def number(self, indent):
+        return ''
+
+    def text(self, parts):
+        out = []
+        for part in parts:
+            if isinstance(part, str):
+                out.append(part)
+            elif isinstance(part, LineBreak):
+                out.append(self.line_break)
+            elif isinstance(part, Bold):
+                out.append(self.bold % self.text(part.children))
+            elif isinstance(part, Italic):
+                out.append(self.italic % self.text(part.children))
+            elif isinstance(part, Underline):
+                out.append(self.underline % self.text(part.children))
+            else:
+                raise TypeError('Unexpected inline node: %r' % (part,))
+        return ' '.join(out)
+
+    def render(self, document):
+        out = []
+        context = ListIndent(self.log)
+        # akcja czekająca na odczytanie kolejnego znacznika (jak lookahead parsera)
+        pending = []
+
+        def token(action=None):
+            if action:
+                action()
+            while pending:
+                pending.pop(0)()
+
+        def emit_list(node):
+            token(context.delay_inc_indent)
+            marker = self.number if node.ordered else self.bullet
+            for n, entry in enumerate(node.children):
+                if n:
+                    out.append('\n')
+                if isinstance(entry, List):
+                    emit_list(entry)
+                    continue
+                token()
+                index = len(out)
+                out.append(None)
+                content = self.text(entry.children)
+                token()
+
+                def item(index=index, marker=marker, content=content):
+                    out[index] = marker(context.indent_lvl) + content
+                    context.change_indent()
+                pending.append(item)
+            token(context.delay_dec_indent)
+            index = len(out)
+            out.append(None)
+
+            def end(index=index):
+                if context.list_final:
+                    out[index] = '\n\n\n'
+                    context.list_final = False
+                else:
+                    out[index] = ''
+            pending.append(end)
+
+        for block in document.blocks():
+            if isinstance(block, List):
+                emit_list(block)
+                continue
+            token()
+            if isinstance(block, Paragraph):
+                out.append('%s\n\n' % self.text(block.children))
+            elif isinstance(block, Heading):
+                out.append(self.heading(block.level, self.text(block.children)))
+            else:
+                raise TypeError('Unexpected block node: %r' % (block,))
+        token()
+
+        return ''.join(out)
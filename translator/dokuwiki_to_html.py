@@ -1,16 +1,21 @@
-from translator.translator import Translator
-import re
+from translator.translator import DocumentTranslator
 
-class DokuWikiToHTML(Translator):
+class DokuWikiToHTML(DocumentTranslator):
     '''
     Translator DokuWiki -> HTML (języka wewnętrznego)
     '''
         
     def __init__(self):
         super().__init__()
-        self.log.debug('%s constructor' % self.__class__.__name__)
+        self.log.debug('%s constructor', self.__class__.__name__)
         
     
+    # Koniec akapitu (PAREND) tam, gdzie daje go lexer - nie po \\
+    # (łamanie linii zjada kolejne puste linie).
+    block_end = r'(?<![\s\\])[ \t\r\f\v]*(?:\n\s*){2,}'
+    # znaczniki formatowania, nagłówka, łamania linii i punktów list
+    markup = r'\*\*|//|__|=|\\\\|^\ *[-*]\ '
+
     tokens = (
         'PAREND',
         'NEWLINE',
@@ -50,13 +55,13 @@ class DokuWikiToHTML(Translator):
     def t_INITIAL_is_us_BOLD_S(self, t):
         r'\*\*(\ )*(?=[^\s])'
         t.lexer.push_state('bs')
-        self.log.debug('BOLD_S token: ' + t.value)
+        self.log.debug('BOLD_S token: %s', t.value)
         return t
     
     def t_INITIAL_bs_us_ITALIC_S(self, t):
         r'\/\/(\ )*(?=[^\s])'
         t.lexer.push_state('is')
-        self.log.debug('ITALIC_S token: ' + t.value)
+        self.log.debug('ITALIC_S token: %s', t.value)
         return t
     
     def t_INITIAL_bs_is_UNDERLINE_S(self, t):
@@ -68,7 +73,7 @@ class DokuWikiToHTML(Translator):
 
     def t_tagend_BOLD_E_E(self, t):
         r'\*\*(?=\/\/|\_\_)'
-        self.log.debug('t_be_BOLD_E_X: ' + t.value)
+        self.log.debug('t_be_BOLD_E_X: %s', t.value)
         t.lexer.pop_state()
         t.lexer.pop_state()
         t.lexer.push_state('tagend')
@@ -77,10 +82,10 @@ class DokuWikiToHTML(Translator):
  
     def t_tagend_BOLD_E(self, t):
         r'\*\*'
-        self.log.debug('**<- ' + str(t.lexer.lexstatestack))
+        self.log.debug('**<- %s', t.lexer.lexstatestack)
         t.lexer.pop_state()
         t.lexer.pop_state()
-        self.log.debug('t_be_BOLD_E: ' + t.value)
+        self.log.debug('t_be_BOLD_E: %s', t.value)
         return t
 
 
@@ -95,7 +100,7 @@ class DokuWikiToHTML(Translator):
         r'\/\/'
         t.lexer.pop_state()
         t.lexer.pop_state()
-        self.log.debug('t_ie_ITALIC_E: ' + t.value)
+        self.log.debug('t_ie_ITALIC_E: %s', t.value)
         return t
     
 
@@ -117,7 +122,7 @@ class DokuWikiToHTML(Translator):
         r'={2,6}'
         lvl = 7- t.value.count('=')
         t.lexer.push_state('head%s' % str(lvl))
-        t.value = '<h%s>' % str(lvl)
+        t.value = lvl
         self.log.debug('H>')
         return t
     
@@ -158,51 +163,53 @@ class DokuWikiToHTML(Translator):
 
     def t_INITIAL_BULLET1(self, t):
         r'^\*\ (?=\S)'
-        self.log.debug('Bullet: [%s]' % (t.value))
+        self.log.debug('Bullet: [%s]', t.value)
         return t
     
     def t_INITIAL_BULLET2(self, t):
         r'^\ \ \*\ (?=\S)'
-        self.log.debug('Bullet II: [%s]' % (t.value))
+        self.log.debug('Bullet II: [%s]', t.value)
         return t
     
 
     def t_INITIAL_NUM_BULLET1(self, t):
         r'^-\ (?=\S)'
-        self.log.debug('Num bullet: [%s]' % (t.value))
+        self.log.debug('Num bullet: [%s]', t.value)
         return t
     
     def t_INITIAL_NUM_BULLET2(self, t):
         r'^\ \ -\ (?=\S)'
-        self.log.debug('Num bullet II: [%s]' % (t.value))
+        self.log.debug('Num bullet II: [%s]', t.value)
         return t
 
 
     def t_ANY_break_BREAKLINE(self, t):
         r'\\\\\s*\n'
         self.log.debug('BREAKLINE')
-        t.value = r'<br/>'
         return t
 
 
     def t_bs_is_us_WORD(self, t):
-        r'[^\s]+?(?=(\*\*)|(\/\/)|(\_\_))'
+        r'[^\s][^\s*/_]*(?:(?:\*(?!\*)|/(?!/)|_(?!_))[^\s*/_]*)*(?=\*\*|//|__)'
         t.lexer.push_state('tagend')
-        self.log.debug('WORD ending tag token: ' + t.value)
+        self.log.debug('WORD ending tag token: %s', t.value)
         return t
 
     def t_head_WORD(self, t):
         r'[^\s]+(?=\=)'
-        self.log.debug('head WORD token: ' + t.value)
+        self.log.debug('head WORD token: %s', t.value)
         return t
 
     def t_ANY_WORD(self, t):
-        r'[^\s]+'
-        check_break = re.match(r'(\w+)(?=\\\\)', t.value)
+        r'(?P<break_word>\w+)\\\\\S*|[^\s]+'
+        # słowo, po którym od razu następuje znacznik łamania linii
+        # (grupa break_word wyrażenia lexera - bez drugiego wyrażenia)
+        check_break = t.lexer.lexmatch.group('break_word')
         if check_break:
-            t.value = check_break.group(0)
+            # odcięcie \\ od słowa
+            t.value = check_break
             t.lexer.lexpos -= 2
-        self.log.debug('WORD normal token: ' + t.value)
+        self.log.debug('WORD normal token: %s', t.value)
         return t
 
 
@@ -219,14 +226,15 @@ class DokuWikiToHTML(Translator):
         '''
         document    : document block
         '''
-        self.log.debug('document: document (%s) block (%s)' % (p[1], p[2]))
-        p[0] = p[1] + p[2]
+        self.log.debug('document: document block (%s)', p[2])
+        p[1].extend(p[2])
+        p[0] = p[1]
     
     def p_document_single(self, p):
         '''
         document    : block
         '''
-        self.log.debug('document: block (%s)' % (p[1]))
+        self.log.debug('document: block (%s)', p[1])
         p[0] =  p[1]
     
     def p_block(self, p):
@@ -235,16 +243,16 @@ class DokuWikiToHTML(Translator):
                     | list1
                     | enum1
         '''
-        self.log.debug('block: %s' % (p[1]))
-        p[0] = p[1]
+        self.log.debug('block: %s', p[1])
+        p[0] = [p[1]]
 
     
     def p_block_par(self, p):
         '''
         block    : paragraph PAREND
         '''
-        self.log.debug('block: par %s' % (p[1]))
-        p[0] = '<p>%s</p>' % (p[1])
+        self.log.debug('block: par %s', p[1])
+        p[0] = [p.lexer.context.paragraph(p[1])]
 
     def p_block_par_head(self, p):
         '''
@@ -252,15 +260,15 @@ class DokuWikiToHTML(Translator):
                 | paragraph list1
                 | paragraph enum1
         '''
-        self.log.debug('block: par (%s) other (%s)' %(p[1], p[2]))
-        p[0] = '<p>%s</p>\n%s' % (p[1], p[2])
+        self.log.debug('block: par (%s) other (%s)', p[1], p[2])
+        p[0] = [p.lexer.context.paragraph(p[1], separated=False), p[2]]
 
     def p_list(self, p):
         '''
         list1    : list_pos1
         list2    : list_pos2
         '''
-        p[0] = '<ul>%s</ul>' % (p[1])
+        p[0] = p.lexer.context.bullet_list(p[1])
 
 
     def p_list_pos(self, p):
@@ -270,7 +278,8 @@ class DokuWikiToHTML(Translator):
                         | list_pos1 enum2
         list_pos2    : list_pos2 list_content2
         '''
-        p[0] = '%s\n%s' % (p[1], p[2])
+        p[1].append(p[2])
+        p[0] = p[1]
 
     def p_list_pos_single(self, p):
         '''
@@ -279,7 +288,7 @@ class DokuWikiToHTML(Translator):
                         | enum2
         list_pos2    : list_content2
         '''
-        p[0] = p[1]
+        p[0] = [p[1]]
 
 
     def p_list_content(self, p):
@@ -287,7 +296,7 @@ class DokuWikiToHTML(Translator):
         list_content1    : BULLET1 paragraph
         list_content2    : BULLET2 paragraph
         '''
-        p[0] = '<li>%s</li>' % (p[2])
+        p[0] = p.lexer.context.item(p[2])
 
 
     def p_enum(self, p):
@@ -295,7 +304,7 @@ class DokuWikiToHTML(Translator):
         enum1    : enum_pos1
         enum2    : enum_pos2
         '''
-        p[0] = '<ol>%s</ol>' % (p[1])
+        p[0] = p.lexer.context.numbered_list(p[1])
 
 
     def p_enum_pos(self, p):
@@ -305,7 +314,8 @@ class DokuWikiToHTML(Translator):
                         | enum_pos1 list2
         enum_pos2    : enum_pos2 enum_content2
         '''
-        p[0] = '%s\n%s' % (p[1], p[2])
+        p[1].append(p[2])
+        p[0] = p[1]
 
     def p_enum_pos_single(self, p):
         '''
@@ -314,44 +324,46 @@ class DokuWikiToHTML(Translator):
                         | list2
         enum_pos2    : enum_content2
         '''
-        p[0] = p[1]
+        p[0] = [p[1]]
 
     def p_enum_content(self, p):
         '''
         enum_content1    : NUM_BULLET1 paragraph
         enum_content2    : NUM_BULLET2 paragraph
         '''
-        p[0] = '<li>%s</li>' % (p[2])
+        p[0] = p.lexer.context.item(p[2])
 
 
     def p_paragraph(self, p):
         '''
         paragraph   : line_content
         '''
-        self.log.debug('pc: lc %s' % (p[1]))
-        p[0] = p[1]
+        self.log.debug('pc: lc %s', p[1])
+        p[0] = [p[1]]
         
 
     def p_paragraph_wnl(self, p):
         '''
         paragraph   : paragraph NEWLINE line_content
         '''
-        self.log.debug('pc: pc %s NL lc %s' % (p[1], p[3]))
-        p[0] = p[1] + '\n' + p[3]
+        self.log.debug('pc: pc NL lc %s', p[3])
+        p[1].append(p[3])
+        p[0] = p[1]
         
 
     def p_line_content(self, p):
         '''
         line_content   : line_content element
         '''
-        self.log.debug('lc: lc %s element %s' % (p[1], p[2]))
-        p[0] = p[1] + ' ' + p[2]
+        self.log.debug('lc: lc element %s', p[2])
+        p[1].extend(p[2])
+        p[0] = p[1]
     
     def p_line_content_single(self, p):
         '''
         line_content    : element
         '''
-        self.log.debug('lc (single) %s' % (p[1]))
+        self.log.debug('lc (single) %s', p[1])
         p[0] = p[1]
         
 
@@ -360,14 +372,14 @@ class DokuWikiToHTML(Translator):
         line_content    : 
         '''
         self.log.debug('lc BLANK')
-        p[0] = ''
+        p[0] = []
         
     
     def p_heading(self, p):
         '''
         heading    : HEADING_S plain HEADING_E
         '''
-        p[0] = '%s%s%s' % (p[1], p[2], p[3])
+        p[0] = p.lexer.context.heading(p[1], [p[2]])
             
     def p_element(self, p):
         '''
@@ -376,14 +388,14 @@ class DokuWikiToHTML(Translator):
                     | italic
                     | underline
         '''
-        self.log.debug('element: (...) (%s)' % (p[1]))
+        self.log.debug('element: (...) (%s)', p[1])
         p[0] = p[1]
         
     def p_bold(self, p):
         '''
         bold    : BOLD_S line_content bold_end
         '''
-        p[0] = '<b>%s</b>' % p[2]
+        p[0] = [p.lexer.context.bold(p[2])]
         
     def p_bold_end(self, p):
         '''
@@ -396,7 +408,7 @@ class DokuWikiToHTML(Translator):
         '''
         italic    : ITALIC_S line_content italic_end
         '''
-        p[0] = '<i>%s</i>' % p[2]
+        p[0] = [p.lexer.context.italic(p[2])]
         
     def p_italic_end(self, p):
         '''
@@ -409,7 +421,7 @@ class DokuWikiToHTML(Translator):
         '''
         underline    : UNDERLINE_S line_content underline_end
         '''
-        p[0] = '<u>%s</u>' % p[2]
+        p[0] = [p.lexer.context.underline(p[2])]
         
     def p_underline_end(self, p):
         '''
@@ -421,17 +433,28 @@ class DokuWikiToHTML(Translator):
     def p_plain(self, p):
         '''
         plain    : plain WORD
-                    | plain BREAKLINE
         '''
-        self.log.debug('plain: plain (%s) WORD (%s)' % (p[1], p[2]))
+        self.log.debug('plain: plain WORD (%s)', p[2])
 
-        p[0] = p[1] + ' ' + p[2]
+        p[1].append(p[2])
+        p[0] = p[1]
+        
+    def p_plain_break(self, p):
+        '''
+        plain    : plain BREAKLINE
+        '''
+        p[1].append(p.lexer.context.line_break())
+        p[0] = p[1]
         
     def p_plain_last(self, p):
         '''
         plain    : WORD
-                    | BREAKLINE
         '''
-        self.log.debug('plain: WORD (%s)' % p[1])
-        p[0] = p[1]
-
+        self.log.debug('plain: WORD (%s)', p[1])
+        p[0] = [p[1]]
+        
+    def p_plain_break_last(self, p):
+        '''
+        plain    : BREAKLINE
+        '''
+        p[0] = [p.lexer.context.line_break()]
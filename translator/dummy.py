@@ -5,24 +5,18 @@ from .translator import Translator
 class PassTranslator(Translator):
     '''
     Pusty translator, który zwraca ten sam tekst, który otrzymał.
+    
+    Nie ma gramatyki, więc nie buduje lexera ani parsera,
+    a SimpleMarkupConverter w ogóle pomija go przy konwersji.
     '''
     
     output = ''
+    
+    identity = True
 
     def __init__(self):
         super().__init__()
         self.log.debug('PassTranslator constructor')
     
-
-    tokens = (
-        'PLAIN_TEXT',
-    )
-    
-    t_PLAIN_TEXT = r'(.|\n)+'
-    
-
-    def p_text(self, p):
-        '''
-        text    : PLAIN_TEXT
-        '''
-        p[0] = p[1]
+    def run(self, text):
+        return text
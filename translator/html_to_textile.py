@@ -1,7 +1,28 @@
 # -*- coding: utf-8 -*-
 
+from .document import Renderer
+from .list_indent import ListIndent
 from .translator import Translator
-import re
+
+
+class TextileRenderer(Renderer):
+    '''
+    Zapis drzewa dokumentu w Textile (odpowiednik translatora HtmlToTextile).
+    '''
+
+    line_break = '\n'
+    bold = '*%s*'
+    italic = '_%s_'
+    underline = '+%s+'
+
+    def heading(self, level, text):
+        return 'h%s. %s\n\n' % (level, text)
+
+    def bullet(self, indent):
+        return '%s* ' % ('*' * indent)
+
+    def number(self, indent):
+        return '%s# ' % ('#' * indent)
 
 
 class HtmlToTextile(Translator):
@@ -11,42 +32,13 @@ class HtmlToTextile(Translator):
         
     def __init__(self):
         super().__init__()
-        self.log.debug('%s constructor' % self.__class__.__name__)
+        self.log.debug('%s constructor', self.__class__.__name__)
 
-    # o ile ma zawiększyć następnym razem wcięcie listy
-    indent_next = 0
-    # aktualny poziom wcięcia listy
-    indent_lvl = -1
-    # czy to koniec glównego bloku listy
-    list_final = False
-    
-    # Jeśli jest to pierwsze wejście do <ul>, zwiększa natychmiast,
-    # jeśli nie - będzie oczekiwać na wywołanie change_indent
-    def delay_inc_indent(self):
-        if self.indent_lvl == -1:
-            self.log.debug('first inc indent')
-            self.indent_lvl += 1
-        else:
-            self.log.debug('next inc indent')
-            self.indent_next = 1
-        
-    # Jeśli jest to ostatnie wyjście z </ul>, zmniejsza natychmiast,
-    # jeśli nie - będzie oczekiwać na wywołanie change_indent
-    def delay_dec_indent(self):
-        if self.indent_lvl == 0:
-            self.log.debug('last dec indent')
-            self.indent_lvl -= 1
-            self.list_final = True
-        else:
-            self.log.debug('next dec indent')
-            self.indent_next = -1
-        
-    
-    # zmiana aktualnego poziomu wcięcia
-    def change_indent(self):
-        self.log.debug('change_indent: %s -> %s' % (self.indent_lvl, self.indent_lvl+self.indent_next))
-        self.indent_lvl += self.indent_next
-        self.indent_next = 0
+    renderer = TextileRenderer
+
+    # stan wcięcia list jest osobny dla każdego przebiegu (lexer.context)
+    def new_context(self):
+        return ListIndent(self.log)
 
     tokens = (
         'PAR_S',
@@ -118,10 +110,11 @@ class HtmlToTextile(Translator):
     
     def t_INITIAL_H_S(self, t):
         r'\<h\d\>'
-        lvl = re.match(r'\<h(\d)\>', t.value).group(1)
+        # poziom to zawsze trzeci znak tokenu: <h<poziom>>
+        lvl = t.value[2]
         t.lexer.push_state('h%s' % (lvl))
         t.value = 'h%s.' % int(lvl)
-        self.log.debug('Heading start level: %s' % (lvl))
+        self.log.debug('Heading start level: %s', lvl)
         return t
     
     def t_h1_H_E(self, t):
@@ -203,14 +196,14 @@ class HtmlToTextile(Translator):
     def t_INITIAL_ul_ol_UL_S(self, t):
         r'\<ul\>'
         t.lexer.push_state('ul')
-        self.delay_inc_indent()
+        t.lexer.context.delay_inc_indent()
         self.log.debug(r'<ul>')
         return t
 
     def t_ul_UL_E(self, t):
         r'\<\/ul\>'
         t.lexer.pop_state()
-        self.delay_dec_indent()
+        t.lexer.context.delay_dec_indent()
         self.log.debug(r'</ul>')
         return t
 
@@ -219,14 +212,14 @@ class HtmlToTextile(Translator):
     def t_INITIAL_ul_ol_OL_S(self, t):
         r'\<ol\>'
         t.lexer.push_state('ol')
-        self.delay_inc_indent()
+        t.lexer.context.delay_inc_indent()
         self.log.debug(r'<ol>')
         return t
 
     def t_ol_OL_E(self, t):
         r'\<\/ol\>'
         t.lexer.pop_state()
-        self.delay_dec_indent()
+        t.lexer.context.delay_dec_indent()
         self.log.debug(r'</ol>')
         return t
 
@@ -250,15 +243,15 @@ class HtmlToTextile(Translator):
     # w którym może bezpośrednio leżeć słowo.
     # Słowo, po którym następuje koniec jakiegoś taga.
     def t_p_b_i_u_li_h1_h2_h3_h4_h5_WORD(self, t):
-        r'[^\s]+?(?=\s*\<\/)'
-        self.log.debug('WORD tag end token: ' + t.value)
-        self.log.debug(str(t.lexer.lexstatestack) + ' -> ' + str(t.lexer.lexstate))
+        r'[^\s][^\s<]*(?:<(?!/)[^\s<]*)*(?=\s*</)'
+        self.log.debug('WORD tag end token: %s', t.value)
+        self.log.debug('%s -> %s', t.lexer.lexstatestack, t.lexer.lexstate)
         return t
     
     # Słowo wykrywane we wszystkich trybach
     def t_WORD(self, t):
         r'[^\s]+'
-        self.log.debug('WORD normal token: ' + t.value)
+        self.log.debug('WORD normal token: %s', t.value)
         return t
     
         
@@ -270,15 +263,16 @@ class HtmlToTextile(Translator):
         '''
         document    : document block
         '''
-        self.log.debug('document: document (%s) block (%s)' % (p[1], p[2]))
-        p[0] = p[1] + p[2]
+        self.log.debug('document: document block (%s)', p[2])
+        p[1].append(p[2])
+        p[0] = p[1]
     
     def p_document_single(self, p):
         '''
         document    : block
         '''
-        self.log.debug('document: block (%s)' % (p[1]))
-        p[0] =  p[1]
+        self.log.debug('document: block (%s)', p[1])
+        p[0] = [p[1]]
     
     # akapit oddzielony od dołu
     def p_block_par(self, p):
@@ -288,15 +282,15 @@ class HtmlToTextile(Translator):
                     | enum
                     | heading
         '''
-        self.log.debug('block: (...) (%s)' % (p[1]))
+        self.log.debug('block: (...) (%s)', p[1])
         p[0] = '%s' % (p[1])
         
     def p_paragraph(self, p):
         '''
         paragraph    : PAR_S content PAR_E
         '''
-        self.log.debug('par <p> content (%s) <\/p>' % (p[2]))
-        p[0] = '%s\n\n' % (p[2])
+        self.log.debug('par <p> content (%s) <\/p>', p[2])
+        p[0] = '%s\n\n' % ' '.join(p[2])
 
     # sytuacja wyjątkowa, ale takie też są generowane
     def p_paragraph_empty(self, p):
@@ -310,14 +304,15 @@ class HtmlToTextile(Translator):
         '''
         content   : content element
         '''
-        self.log.debug('content: content %s element %s' % (p[1], p[2]))
-        p[0] = p[1] + ' ' + p[2]
+        self.log.debug('content: content element %s', p[2])
+        p[1].extend(p[2])
+        p[0] = p[1]
 
     def p_content_single(self, p):
         '''
         content   : element
         '''
-        self.log.debug('content: (single) element (%s)' % (p[1]))
+        self.log.debug('content: (single) element (%s)', p[1])
         p[0] = p[1]
         
     def p_element(self, p):
@@ -327,7 +322,7 @@ class HtmlToTextile(Translator):
                     | italic
                     | underline
         '''
-        self.log.debug('element (%s)' % (p[1]))
+        self.log.debug('element (%s)', p[1])
         p[0] = p[1]
         
     def p_plain(self, p):
@@ -335,16 +330,17 @@ class HtmlToTextile(Translator):
         plain    : plain WORD
                     | plain BR
         '''
-        self.log.debug(r'plain multi (%s) word (%s)' % (p[1], p[2]))
-        p[0] = p[1] + ' ' + p[2]
+        self.log.debug(r'plain multi word (%s)', p[2])
+        p[1].append(p[2])
+        p[0] = p[1]
         
     def p_plain_single(self, p):
         '''
         plain   : WORD
                 | BR
         '''
-        self.log.debug(r'plain single word (%s)' % (p[1]))
-        p[0] = p[1]
+        self.log.debug(r'plain single word (%s)', p[1])
+        p[0] = [p[1]]
 
     # --- obsługa tagów formatowania ---
 
@@ -352,22 +348,22 @@ class HtmlToTextile(Translator):
         '''
         bold    : BOLD_S content BOLD_E
         '''
-        self.log.debug(r'bold <b> content (%s) </b>' % (p[2]))
-        p[0] = '*%s*' % (p[2])
+        self.log.debug(r'bold <b> content (%s) </b>', p[2])
+        p[0] = ['*%s*' % ' '.join(p[2])]
     
     def p_italic(self, p):
         '''
         italic    : ITALIC_S content ITALIC_E
         '''
-        self.log.debug(r'italic <i> content (%s) </i>' % (p[2]))
-        p[0] = '_%s_' % (p[2])
+        self.log.debug(r'italic <i> content (%s) </i>', p[2])
+        p[0] = ['_%s_' % ' '.join(p[2])]
     
     def p_underline(self, p):
         '''
         underline    : UNDERLINE_S content UNDERLINE_E
         '''
-        self.log.debug(r'underline <u> content (%s) </u>' % (p[2]))
-        p[0] = '+%s+' % (p[2])
+        self.log.debug(r'underline <u> content (%s) </u>', p[2])
+        p[0] = ['+%s+' % ' '.join(p[2])]
     
     # ------
     
@@ -377,34 +373,37 @@ class HtmlToTextile(Translator):
         '''
         list    : UL_S list_content UL_E
         '''
-        self.log.debug(r'list <ul> list_content (%s) </ul> lvl %s' % (p[2], self.indent_lvl))
-        if self.list_final: # koniec całej listy
-            p[0] = '%s\n\n\n' % (p[2])
-            self.list_final = False
+        context = p.lexer.context
+        self.log.debug(r'list <ul> list_content (%s) </ul> lvl %s', p[2], context.indent_lvl)
+        if context.list_final: # koniec całej listy
+            p[0] = '%s\n\n\n' % '\n'.join(p[2])
+            context.list_final = False
         else: # koniec poziomu na liście
-            p[0] = '%s' % (p[2])
+            p[0] = '\n'.join(p[2])
         
     def p_list_content(self, p):
         '''
         list_content    : list_content list_pos 
         '''
-        self.log.debug(r'list_content list_content (%s) list_pos (%s)' % (p[1], p[2]))
-        p[0] = '%s\n%s' % (p[1], p[2])
+        self.log.debug(r'list_content list_content list_pos (%s)', p[2])
+        p[1].append(p[2])
+        p[0] = p[1]
         
     def p_list_content_single(self, p):
         '''
         list_content    : list_pos
         '''
-        self.log.debug(r'list_content list_pos (%s)' % (p[1]))
-        p[0] = p[1]
+        self.log.debug(r'list_content list_pos (%s)', p[1])
+        p[0] = [p[1]]
         
     def p_list_pos(self, p):
         '''
         list_pos    : LI_S content LI_E
         '''
-        self.log.debug(r'list_pos <li> content (%s) </li>' % (p[2]))
-        p[0] = '%s* %s' % ('*'*self.indent_lvl, p[2])
-        self.change_indent()
+        self.log.debug(r'list_pos <li> content (%s) </li>', p[2])
+        context = p.lexer.context
+        p[0] = '%s* %s' % ('*'*context.indent_lvl, ' '.join(p[2]))
+        context.change_indent()
         
     # lista zagnieżdżona
     def p_list_pos_nested(self, p):
@@ -412,7 +411,7 @@ class HtmlToTextile(Translator):
         list_pos    : list
                     | enum
         '''
-        self.log.debug(r'list_pos nested (%s)' % (p[1]))
+        self.log.debug(r'list_pos nested (%s)', p[1])
         p[0] = p[1]
         
     # --- obsługa listy numerowanej ---
@@ -421,41 +420,44 @@ class HtmlToTextile(Translator):
         '''
         enum    : OL_S enum_content OL_E
         '''
-        self.log.debug(r'enum <ol> enum_content (%s) </ol>' % (p[2]))
-        if self.list_final: # koniec całej listy
-            p[0] = '%s\n\n\n' % (p[2])
-            self.list_final = False
+        self.log.debug(r'enum <ol> enum_content (%s) </ol>', p[2])
+        context = p.lexer.context
+        if context.list_final: # koniec całej listy
+            p[0] = '%s\n\n\n' % '\n'.join(p[2])
+            context.list_final = False
         else: # koniec poziomu na liście
-            p[0] = '%s' % (p[2])
+            p[0] = '\n'.join(p[2])
         
     def p_enum_content(self, p):
         '''
         enum_content    : enum_content enum_pos 
         '''
-        self.log.debug(r'enum_content enum_content (%s) enum_pos (%s)' % (p[1], p[2]))
-        p[0] = '%s\n%s' % (p[1], p[2])
+        self.log.debug(r'enum_content enum_content enum_pos (%s)', p[2])
+        p[1].append(p[2])
+        p[0] = p[1]
         
     def p_enum_content_single(self, p):
         '''
         enum_content    : enum_pos
         '''
-        self.log.debug(r'enum_content enum_pos (%s)' % (p[1]))
-        p[0] = p[1]
+        self.log.debug(r'enum_content enum_pos (%s)', p[1])
+        p[0] = [p[1]]
         
     def p_enum_pos(self, p):
         '''
         enum_pos    : LI_S content LI_E
         '''
-        self.log.debug(r'enum_pos <li> content (%s) </li>' % (p[2]))
-        p[0] = '%s# %s' % ('#'*self.indent_lvl, p[2])
-        self.change_indent()
+        self.log.debug(r'enum_pos <li> content (%s) </li>', p[2])
+        context = p.lexer.context
+        p[0] = '%s# %s' % ('#'*context.indent_lvl, ' '.join(p[2]))
+        context.change_indent()
         
     def p_enum_pos_nested(self, p):
         '''
         enum_pos    : list
                     | enum
         '''
-        self.log.debug(r'enum_pos nested (%s)' % (p[1]))
+        self.log.debug(r'enum_pos nested (%s)', p[1])
         p[0] = p[1]
         
     # --- obsługa nagłówków
@@ -464,5 +466,5 @@ class HtmlToTextile(Translator):
         '''
         heading    : H_S plain H_E
         '''
-        self.log.debug(r'heading <h*> plain (%s) </h*>' % (p[2]))
-        p[0] = '%s %s\n\n' % (p[1], p[2])
+        self.log.debug(r'heading <h*> plain (%s) </h*>', p[2])
+        p[0] = '%s %s\n\n' % (p[1], ' '.join(p[2]))
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+class ListIndent(object):
+    '''
+    Stan wcięcia list translatorów HTML -> język znaczników.
+    
+    Tworzony osobno dla każdego przebiegu (Translator.new_context),
+    więc jedna instancja translatora może obsługiwać wiele konwersji
+    naraz, a przerwane parsowanie nie zostawia stanu dla następnego.
+    '''
+    
+    def __init__(self, log):
+        self.log = log
+        # o ile ma zawiększyć następnym razem wcięcie listy
+        self.indent_next = 0
+        # aktualny poziom wcięcia listy
+        self.indent_lvl = -1
+        # czy to koniec glównego bloku listy
+        self.list_final = False
+    
+    # Jeśli jest to pierwsze wejście do <ul>, zwiększa natychmiast,
+    # jeśli nie - będzie oczekiwać na wywołanie change_indent
+    def delay_inc_indent(self):
+        if self.indent_lvl == -1:
+            self.log.debug('first inc indent')
+            self.indent_lvl += 1
+        else:
+            self.log.debug('next inc indent')
+            self.indent_next = 1
+        
+    # Jeśli jest to ostatnie wyjście z </ul>, zmniejsza natychmiast,
+    # jeśli nie - będzie oczekiwać na wywołanie change_indent
+    def delay_dec_indent(self):
+        if self.indent_lvl == 0:
+            self.log.debug('last dec indent')
+            self.indent_lvl -= 1
+            self.list_final = True
+        else:
+            self.log.debug('next dec indent')
+            self.indent_next = -1
+        
+    
+    # zmiana aktualnego poziomu wcięcia
+    def change_indent(self):
+        self.log.debug('change_indent: %s -> %s', self.indent_lvl, self.indent_lvl+self.indent_next)
+        self.indent_lvl += self.indent_next
+        self.indent_next = 0
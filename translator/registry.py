@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+'''
+Rejestr translatorów wspólny dla całego procesu.
+
+Każda klasa translatora jest budowana raz (prototyp), a kolejne konwersje
+dostają jej tanie kopie (Translator.clone) - bez ponownego budowania
+lexera i parsera. Klasę można podać także jako ścieżkę importu
+(np. 'translator.txt2tags.Txt2TagsToHTML') - moduł jest wtedy importowany
+dopiero przy pierwszym użyciu.
+'''
+
+import importlib
+import threading
+
+# klasa translatora -> zbudowany prototyp
+_prototypes = {}
+_lock = threading.Lock()
+
+# liczniki: kopie wydane z gotowego prototypu / zbudowane prototypy
+stats = {'hits': 0, 'builds': 0}
+
+
+def load_class(path):
+    '''
+    Importuje moduł i zwraca klasę translatora wskazaną ścieżką importu.
+    '''
+    module_name, class_name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def get(translator_type):
+    '''
+    Zwraca kopię translatora danej klasy (lub ścieżki importu klasy),
+    budując prototyp przy pierwszym użyciu.
+    '''
+    if isinstance(translator_type, str):
+        translator_type = load_class(translator_type)
+    with _lock:
+        prototype = _prototypes.get(translator_type)
+        if prototype is None:
+            prototype = translator_type()
+            _prototypes[translator_type] = prototype
+            stats['builds'] += 1
+        else:
+            stats['hits'] += 1
+    return prototype.clone()
+
+
+def clear():
+    '''
+    Usuwa wszystkie prototypy (np. po zmianie katalogu tablic).
+    '''
+    with _lock:
+        _prototypes.clear()
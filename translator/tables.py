@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+'''
+Pamięć podręczna tablic LALR i tablic lexera generowanych przez PLY.
+
+Każda klasa translatora ma własny plik tablic (wcześniej wszystkie
+translatory nadpisywały wspólny moduł parsetab), opatrzony wersją formatu
+i sprawdzany sygnaturą gramatyki - zmiana gramatyki wymusza przebudowanie.
+
+Tablice lexera (lextab) PLY nie zawierają sygnatury, dlatego jej skrót
+jest częścią nazwy pliku - zmiana reguł t_* daje po prostu inny plik.
+'''
+
+import hashlib
+import importlib.util
+import os
+import ply.lex as lex
+import ply.yacc as yacc
+
+# wersja formatu plików tablic - jej zmiana unieważnia wszystkie tablice
+TABLE_VERSION = 1
+
+# Katalog z tablicami. Można go zmienić zmienną środowiskową SMC_TABLE_DIR
+# albo przypisaniem tables.table_dir przed konstrukcją translatorów.
+table_dir = os.environ.get('SMC_TABLE_DIR') or \
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tables')
+
+# tryb zoptymalizowanego lexera: reguły są wczytywane z plików lextab
+# zamiast walidacji i kompilacji każdej reguły osobno
+optimize_lexer = True
+
+# liczniki: ile razy tablice wczytano z pliku, a ile razy przebudowano
+# (lex_signatures - ile razy liczono sygnaturę reguł lexera z refleksji)
+stats = {'loaded': 0, 'rebuilt': 0, 'lex_loaded': 0, 'lex_rebuilt': 0, 'lex_signatures': 0}
+
+# sygnatury reguł lexera: (klasa translatora, flagi) -> skrót
+_lexer_signatures = {}
+
+
+def parse_table_path(cls, directory=None):
+    '''
+    Ścieżka pliku tablic parsera dla klasy translatora.
+    '''
+    return os.path.join(directory or table_dir,
+                        '%s_v%d.parsetab.pickle' % (cls.__name__, TABLE_VERSION))
+
+
+def lex_table_name(cls, signature):
+    '''
+    Nazwa modułu lextab dla klasy translatora i sygnatury jej reguł.
+    '''
+    return 'lextab_%s_v%d_%s' % (cls.__name__, TABLE_VERSION, signature)
+
+
+def lex_table_path(cls, signature, directory=None):
+    '''
+    Ścieżka pliku lextab dla klasy translatora.
+    '''
+    return os.path.join(directory or table_dir,
+                        lex_table_name(cls, signature) + '.py')
+
+
+def lexer_signature(module, reflags):
+    '''
+    Skrót reguł lexera: tokenów, stanów, literałów, flag i wyrażeń
+    regularnych w kolejności, w jakiej PLY składa je w główne wyrażenie.
+    Działa zarówno dla instancji, jak i dla klasy translatora.
+    '''
+    ldict = dict((k, getattr(module, k)) for k in dir(module))
+    linfo = lex.LexerReflect(ldict, log=lex.NullLogger(), reflags=reflags)
+    linfo.get_all()
+
+    parts = [lex.__tabversion__, int(reflags), tuple(linfo.tokens),
+             repr(linfo.literals), sorted(linfo.stateinfo.items())]
+    for state in sorted(linfo.stateinfo):
+        parts.append(state)
+        parts.append([(name, getattr(f, 'regex', f.__doc__))
+                      for name, f in linfo.funcsym[state]])
+        parts.append(linfo.strsym[state])
+        parts.append(linfo.ignore.get(state))
+        parts.append(getattr(linfo.errorf.get(state), '__name__', None))
+    stats['lex_signatures'] += 1
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def class_lexer_signature(cls, reflags):
+    '''
+    Sygnatura reguł lexera klasy translatora - liczona (z refleksją reguł)
+    raz na klasę w procesie; reguły t_* są atrybutami klasy.
+    '''
+    key = (cls, int(reflags))
+    signature = _lexer_signatures.get(key)
+    if signature is None:
+        signature = _lexer_signatures[key] = lexer_signature(cls, reflags)
+    return signature
+
+
+def _load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_lexer(translator, debug=0, reflags=0):
+    '''
+    Zwraca lexer dla translatora. W trybie optimize_lexer wczytuje reguły
+    z pliku lextab (bez walidacji i kompilacji pojedynczych reguł; refleksja
+    reguł dla sygnatury - raz na klasę), a gdy pliku nie ma - buduje lexer
+    normalnie i zapisuje jego tablice.
+    '''
+    if not optimize_lexer:
+        return lex.lex(module=translator, debug=debug, reflags=reflags)
+
+    log = translator.log
+    cls = translator.__class__
+    signature = class_lexer_signature(cls, reflags)
+    name = lex_table_name(cls, signature)
+    path = lex_table_path(cls, signature)
+
+    if os.path.exists(path):
+        try:
+            ldict = dict((k, getattr(translator, k)) for k in dir(translator))
+            # brak funkcji t_error dla stanu PLY zapisuje jako None
+            ldict[None] = None
+            # lexoptimize pozostaje wyłączone - lexer nadal sprawdza
+            # typy zwracanych tokenów, tak jak bez tablic
+            lexer = lex.Lexer()
+            lexer.readtab(_load_module(name, path), ldict)
+            stats['lex_loaded'] += 1
+            log.debug('Lexer tables loaded: %s' % path)
+            return lexer
+        except Exception as e:
+            log.debug('Lexer tables not loaded (%s): %s' % (path, e))
+
+    lexer = lex.lex(module=translator, debug=debug, reflags=reflags)
+
+    directory = os.path.dirname(path)
+    tmp_name = '%s_%d_tmp' % (name, os.getpid())
+    try:
+        os.makedirs(directory, exist_ok=True)
+        lexer.writetab(tmp_name, directory)
+        os.replace(os.path.join(directory, tmp_name + '.py'), path)
+    except (IOError, OSError) as e:
+        log.warning('Cannot write lexer tables %s: %s' % (path, e))
+
+    stats['lex_rebuilt'] += 1
+    log.info('Lexer tables rebuilt: %s' % path)
+    return lexer
+
+
+def reflect_grammar(module):
+    '''
+    Zbiera informacje o gramatyce tak samo jak yacc.yacc().
+    Działa zarówno dla instancji, jak i dla klasy translatora.
+    '''
+    pdict = dict((k, getattr(module, k)) for k in dir(module))
+    pinfo = yacc.ParserReflect(pdict, log=yacc.NullLogger())
+    pinfo.get_all()
+    return pinfo
+
+
+def build_parser(translator, debug=0):
+    '''
+    Zwraca parser dla translatora: wczytuje tablice z pliku, jeśli ich
+    sygnatura zgadza się z gramatyką, w przeciwnym razie buduje je od nowa
+    i zapisuje w katalogu table_dir.
+    '''
+    log = translator.log
+    path = parse_table_path(translator.__class__)
+
+    pinfo = reflect_grammar(translator)
+    if not pinfo.error:
+        lr = yacc.LRTable()
+        try:
+            if lr.read_pickle(path) == pinfo.signature():
+                lr.bind_callables(pinfo.pdict)
+                stats['loaded'] += 1
+                log.debug('Parse tables loaded: %s' % path)
+                return yacc.LRParser(lr, pinfo.error_func)
+            log.debug('Parse tables out of date: %s' % path)
+        except Exception as e:
+            log.debug('Parse tables not loaded (%s): %s' % (path, e))
+
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as e:
+        log.warning('Cannot create table directory %s: %s' % (directory, e))
+
+    # zapis do pliku tymczasowego i podmiana - równoległe procesy
+    # nigdy nie odczytają w połowie zapisanych tablic
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    parser = yacc.yacc(module=translator, debug=debug, outputdir=directory,
+                       picklefile=tmp_path)
+    if os.path.exists(tmp_path):
+        os.replace(tmp_path, path)
+
+    stats['rebuilt'] += 1
+    log.info('Parse tables rebuilt: %s' % path)
+    return parser
+
+
+def stale_tables(cls, directory=None):
+    '''
+    Lista plików tablic klasy translatora, których brakuje albo których
+    sygnatura nie zgadza się z obecną gramatyką (np. po zmianie reguł).
+    '''
+    stale = []
+    if not cls.tokens:
+        return stale
+
+    path = parse_table_path(cls, directory)
+    try:
+        signature = yacc.LRTable().read_pickle(path)
+    except Exception:
+        signature = None
+    if signature != reflect_grammar(cls).signature():
+        stale.append(path)
+
+    path = lex_table_path(cls, class_lexer_signature(cls, cls.lex_reflags), directory)
+    if not os.path.exists(path):
+        stale.append(path)
+
+    return stale
@@ -1,16 +1,29 @@
-from translator.translator import Translator
-import re
+from translator.translator import DocumentTranslator
 
-class TextileToHTML(Translator):
+class TextileToHTML(DocumentTranslator):
     '''
     Translator Textile -> HTML (języka wewnętrznego)
     '''
         
     def __init__(self):
         super().__init__()
-        self.log.debug('%s constructor' % self.__class__.__name__)
+        self.log.debug('%s constructor', self.__class__.__name__)
         
     
+    # Puste linie kończące akapit (parend) - tylko znaki białe pomijane przez lexer.
+    block_end = r'(?<![\s\\])[ \t\r\f\v]*(?:\n[ \t\r\f\v]*){2,}'
+    # znaczniki formatowania, nagłówka i punktów list; = po słowie
+    # pasuje do reguły t_head_WORD (błąd lexera)
+    markup = r'[*_+=]|^\#|^h\d\.\ '
+
+    # nowe linie w akapicie są łamaniem linii (jak w p_paragraph_wnl)
+    def plain_paragraph(self, lines, builder):
+        parts = list(lines[0])
+        for line in lines[1:]:
+            parts.append(builder.line_break())
+            parts.extend(line)
+        return builder.paragraph([parts])
+
     tokens = (
 #        'PAREND',
         'NEWLINE',
@@ -48,26 +61,26 @@ class TextileToHTML(Translator):
     # nie jest wymagany znak drukowalny w linii wypunktowania
     def t_INITIAL_BULLET1(self, t):
         r'^\*\ '
-        self.log.debug('Bullet: [%s]' % (t.value))
+        self.log.debug('Bullet: [%s]', t.value)
         return t
     
     # drugi poziom wypunktowania
     def t_INITIAL_BULLET2(self, t):
         r'^\*(\*)+\ '
-        self.log.debug('Bullet II: [%s]' % (t.value))
+        self.log.debug('Bullet II: [%s]', t.value)
         return t
     
     # wg specyfikacji po - musi wystąpić dokładnie jedna spacja po #
     # nie jest wymagany znak drukowalny w linii wyliczenia
     def t_INITIAL_NUM_BULLET1(self, t):
         r'^\#\ '
-        self.log.debug('Num bullet: [%s]' % (t.value))
+        self.log.debug('Num bullet: [%s]', t.value)
         return t
     
     # drugi poziom wypunktowania
     def t_INITIAL_NUM_BULLET2(self, t):
         r'^\#(\#)+\ '
-        self.log.debug('Num bullet II: [%s]' % (t.value))
+        self.log.debug('Num bullet II: [%s]', t.value)
         return t
     
     # ------ tagi startujące formatowanie ------
@@ -82,7 +95,7 @@ class TextileToHTML(Translator):
         r'\*(?=[^\s])'
         # dorzucenie stanu otwartego bold
         t.lexer.push_state('bs')
-        self.log.debug('BOLD_S token: ' + t.value)
+        self.log.debug('BOLD_S token: %s', t.value)
         return t
     
     # znacznik rozpoczynający kursywę: //<znak>
@@ -91,13 +104,13 @@ class TextileToHTML(Translator):
         r'\_(?=[^\s])'
         # dorzucenie stanu otwartego italic
         t.lexer.push_state('is')
-        self.log.debug('ITALIC_S token: ' + t.value)
+        self.log.debug('ITALIC_S token: %s', t.value)
         return t
     
     def t_INITIAL_bs_is_UNDERLINE_S(self, t):
         r'\+(?=[^\s])'
         t.lexer.push_state('us')
-        self.log.debug('UNDERLINE_S token: ' + t.value)
+        self.log.debug('UNDERLINE_S token: %s', t.value)
         return t
     
     # ------ tagi kończące formatowanie ------
@@ -108,7 +121,7 @@ class TextileToHTML(Translator):
     # **// **__
     def t_tagend_BOLD_E_E(self, t):
         r'\*(?=\+|\_)'
-        self.log.debug('t_be_BOLD_E_E: ' + t.value)
+        self.log.debug('t_be_BOLD_E_E: %s', t.value)
         t.lexer.pop_state() # tag end
         t.lexer.pop_state() # tag start
         t.lexer.push_state('tagend')
@@ -119,11 +132,11 @@ class TextileToHTML(Translator):
     # do jakiegoś innego tokena. W tym celu używa się flagi format['bold'].  
     def t_tagend_BOLD_E(self, t):
         r'\*'
-        self.log.debug('*<- ' + str(t.lexer.lexstatestack))
+        self.log.debug('*<- %s', t.lexer.lexstatestack)
         # zdjęcie stanu tagend - koniec bold
         t.lexer.pop_state()
         t.lexer.pop_state() # tag start
-        self.log.debug('t_be_BOLD_E: ' + t.value)
+        self.log.debug('t_be_BOLD_E: %s', t.value)
         return t
 
     # --- ITALIC ---
@@ -142,7 +155,7 @@ class TextileToHTML(Translator):
         # zdjęcie stanu ie - koniec italic
         t.lexer.pop_state()
         t.lexer.pop_state() # tag start
-        self.log.debug('t_ie_ITALIC_E: ' + t.value)
+        self.log.debug('t_ie_ITALIC_E: %s', t.value)
         return t
     
     # --- UNDERLINE ---
@@ -167,9 +180,10 @@ class TextileToHTML(Translator):
     # np.: h1. Nagłówek
     def t_HEADING_S(self, t):
         r'^h\d\.\ '
-        lvl = re.match(r'h(\d)\.\ ', t.value).group(1)
-        t.value = 'h%s' % lvl
-        self.log.debug('Heading start level: %s' % (lvl))
+        # poziom to zawsze drugi znak tokenu: h<poziom>.
+        lvl = t.value[1]
+        t.value = int(lvl)
+        self.log.debug('Heading start level: %s', lvl)
         return t
 
 
@@ -180,22 +194,22 @@ class TextileToHTML(Translator):
     # Znaków taga nie bierzemy do wyniku wyrażenia regularnego
     # - będą użyte przy pobraniu taga zamykającego.
     def t_bs_is_us_WORD(self, t):
-        r'[^\s]+?(?=(\*)|(\+)|(\_))'
+        r'[^\s][^\s*+_]*(?=[*+_])'
         # lexer gotowy na pobranie znaków zamykających bold
         t.lexer.push_state('tagend')
-        self.log.debug('WORD ending tag token: ' + t.value)
+        self.log.debug('WORD ending tag token: %s', t.value)
         return t
 
     # Ostatnie słowo w nagłówku przed =
     def t_head_WORD(self, t):
         r'[^\s]+(?=\=)'
-        self.log.debug('head WORD token: ' + t.value)
+        self.log.debug('head WORD token: %s', t.value)
         return t
 
     # Słowo wykrywane we wszystkich trybach
     def t_ANY_WORD(self, t):
         r'[^\s]+'
-        self.log.debug('WORD normal token: ' + t.value);
+        self.log.debug('WORD normal token: %s', t.value)
         return t
 
     # --- NOWE LINIE
@@ -227,14 +241,15 @@ class TextileToHTML(Translator):
         '''
         document    : document block
         '''
-        self.log.debug('document: document (%s) block (%s)' % (p[1], p[2]))
-        p[0] = p[1] + p[2]
+        self.log.debug('document: document block (%s)', p[2])
+        p[1].extend(p[2])
+        p[0] = p[1]
     
     def p_document_single(self, p):
         '''
         document    : block
         '''
-        self.log.debug('document: block (%s)' % (p[1]))
+        self.log.debug('document: block (%s)', p[1])
         p[0] =  p[1]
     
     # blok: różne
@@ -248,8 +263,8 @@ class TextileToHTML(Translator):
                     | enum1
                     | enum1 eat_lines
         '''
-        self.log.debug('block: %s' % (p[1]))
-        p[0] = p[1]
+        self.log.debug('block: %s', p[1])
+        p[0] = [p[1]]
 
     
     # akapit oddzielony od dołu
@@ -257,8 +272,8 @@ class TextileToHTML(Translator):
         '''
         block    : paragraph parend
         '''
-        self.log.debug('block: par %s' % (p[1]))
-        p[0] = '<p>%s</p>' % (p[1])
+        self.log.debug('block: par %s', p[1])
+        p[0] = [p.lexer.context.paragraph([p[1]])]
 
         # Poniższa możliwość wyłączona w Textile.
         # Niektóre parsery PHP dają "popsute" wyjście w takim przypadku.
@@ -281,8 +296,8 @@ class TextileToHTML(Translator):
         list1    : list_pos1
         list2    : list_pos2
         '''
-        self.log.debug('list#: list_pos# (%s)' % (p[1]))
-        p[0] = '<ul>%s</ul>' % (p[1])
+        self.log.debug('list#: list_pos# (%s)', p[1])
+        p[0] = p.lexer.context.bullet_list(p[1])
 
     # Pozycja listy.
     # Dla I poziomu: albo kolejna pozycja zwykła, albo zagnieżdżona lista
@@ -294,8 +309,9 @@ class TextileToHTML(Translator):
                         | list_pos1 enum2
         list_pos2    : list_pos2 list_content2
         '''
-        self.log.debug('list_pos#: list_pos# (%s) list_content/list/enum (%s)' % (p[1], p[2]))
-        p[0] = '%s\n%s' % (p[1], p[2])
+        self.log.debug('list_pos#: list_pos# list_content/list/enum (%s)', p[2])
+        p[1].append(p[2])
+        p[0] = p[1]
 
     # Pojedyncza pozycja listy, podobnie jak w p_list_pos.
     def p_list_pos_single(self, p):
@@ -305,8 +321,8 @@ class TextileToHTML(Translator):
                         | enum2
         list_pos2    : list_content2
         '''
-        self.log.debug('list_pos# single: list_content/list/enum (%s)' % (p[1]))
-        p[0] = p[1]
+        self.log.debug('list_pos# single: list_content/list/enum (%s)', p[1])
+        p[0] = [p[1]]
 
     # Zwykła zawartość pozycji listy: punkt odpowiedniego poziomu i treść
     def p_list_content(self, p):
@@ -314,8 +330,8 @@ class TextileToHTML(Translator):
         list_content1    : BULLET1 line_content NEWLINE
         list_content2    : BULLET2 line_content NEWLINE
         '''
-        self.log.debug('list_content#: BULLET line_content (%s) NEWLINE' % (p[2]))
-        p[0] = '<li>%s</li>' % (p[2])
+        self.log.debug('list_content#: BULLET line_content (%s) NEWLINE', p[2])
+        p[0] = p.lexer.context.item([p[2]])
 
     # === lista numerowana ===
     
@@ -326,7 +342,7 @@ class TextileToHTML(Translator):
         enum1    : enum_pos1
         enum2    : enum_pos2
         '''
-        p[0] = '<ol>%s</ol>' % (p[1])
+        p[0] = p.lexer.context.numbered_list(p[1])
 
     # Pozycja enumy.
     # Dla I poziomu: albo kolejna pozycja zwykła, albo zagnieżdżona enuma
@@ -338,7 +354,8 @@ class TextileToHTML(Translator):
                         | enum_pos1 list2
         enum_pos2    : enum_pos2 enum_content2
         '''
-        p[0] = '%s\n%s' % (p[1], p[2])
+        p[1].append(p[2])
+        p[0] = p[1]
 
     # Pojedyncza pozycja enumy, podobnie jak w p_enum_pos.
     def p_enum_pos_single(self, p):
@@ -348,7 +365,7 @@ class TextileToHTML(Translator):
                         | list2
         enum_pos2    : enum_content2
         '''
-        p[0] = p[1]
+        p[0] = [p[1]]
 
     # Zwykła zawartość pozycji enumy: punkt odpowiedniego poziomu i treść
     def p_enum_content(self, p):
@@ -356,7 +373,7 @@ class TextileToHTML(Translator):
         enum_content1    : NUM_BULLET1 line_content NEWLINE
         enum_content2    : NUM_BULLET2 line_content NEWLINE
         '''
-        p[0] = '<li>%s</li>' % (p[2])
+        p[0] = p.lexer.context.item([p[2]])
 
 
 
@@ -367,7 +384,7 @@ class TextileToHTML(Translator):
         '''
         paragraph   : line_content
         '''
-        self.log.debug('pc: lc %s' % (p[1]))
+        self.log.debug('pc: lc %s', p[1])
         p[0] = p[1]
         
     # Zawartość akapitu ze znakami nowej linii wewnątrz
@@ -375,8 +392,10 @@ class TextileToHTML(Translator):
         '''
         paragraph   : paragraph NEWLINE line_content
         '''
-        self.log.debug('pc: pc %s NL lc %s' % (p[1], p[3]))
-        p[0] = p[1] + ' <br/> ' + p[3]
+        self.log.debug('pc: pc NL lc %s', p[3])
+        p[1].append(p.lexer.context.line_break())
+        p[1].extend(p[3])
+        p[0] = p[1]
     
     # specjalnie na potrzeby ignorowania nowych linii w tworzeniu nagłówka
     # produkcja multiline
@@ -385,15 +404,16 @@ class TextileToHTML(Translator):
         '''
         multiline   : line_content
         '''
-        self.log.debug('multiline: lc %s' % (p[1]))
-        p[0] = p[1]
+        self.log.debug('multiline: lc %s', p[1])
+        p[0] = [p[1]]
         
     def p_multiline_wnl(self, p):
         '''
         multiline   : multiline NEWLINE line_content
         '''
-        self.log.debug('multiline: multiline %s NL lc %s' % (p[1], p[3]))
-        p[0] = p[1] + '\n' + p[3]
+        self.log.debug('multiline: multiline NL lc %s', p[3])
+        p[1].append(p[3])
+        p[0] = p[1]
     
     
     # Zawartość pojedynczej linii (wiele elementów)
@@ -401,15 +421,16 @@ class TextileToHTML(Translator):
         '''
         line_content   : line_content element
         '''
-        self.log.debug('lc: lc %s element %s' % (p[1], p[2]))
-        p[0] = p[1] + ' ' + p[2]
+        self.log.debug('lc: lc element %s', p[2])
+        p[1].extend(p[2])
+        p[0] = p[1]
     
     # Zawartość pojedynczej linii - jedyny, bądź pierwszy element
     def p_line_content_single(self, p):
         '''
         line_content    : element
         '''
-        self.log.debug('lc (single) %s' % (p[1]))
+        self.log.debug('lc (single) %s', p[1])
         p[0] = p[1]
     
     
@@ -419,7 +440,7 @@ class TextileToHTML(Translator):
         '''
         heading    : HEADING_S multiline parend
         '''
-        p[0] = r'<%s>%s</%s>' % (p[1], p[2], p[1])
+        p[0] = p.lexer.context.heading(p[1], p[2])
     
     
     # --- tekst i formatowanie
@@ -431,14 +452,14 @@ class TextileToHTML(Translator):
                     | italic
                     | underline
         '''
-        self.log.debug('element: (...) (%s)' % (p[1]))
+        self.log.debug('element: (...) (%s)', p[1])
         p[0] = p[1]
     
     def p_bold(self, p):
         '''
         bold    : BOLD_S line_content bold_end
         '''
-        p[0] = '<b>%s</b>' % p[2]
+        p[0] = [p.lexer.context.bold(p[2])]
         
     def p_bold_end(self, p):
         '''
@@ -451,7 +472,7 @@ class TextileToHTML(Translator):
         '''
         italic    : ITALIC_S line_content italic_end
         '''
-        p[0] = '<i>%s</i>' % p[2]
+        p[0] = [p.lexer.context.italic(p[2])]
         
     def p_italic_end(self, p):
         '''
@@ -464,7 +485,7 @@ class TextileToHTML(Translator):
         '''
         underline    : UNDERLINE_S line_content underline_end
         '''
-        p[0] = '<u>%s</u>' % p[2]
+        p[0] = [p.lexer.context.underline(p[2])]
         
     def p_underline_end(self, p):
         '''
@@ -477,16 +498,17 @@ class TextileToHTML(Translator):
         '''
         plain    : plain WORD
         '''
-        self.log.debug('plain: plain (%s) WORD (%s)' % (p[1], p[2]))
+        self.log.debug('plain: plain WORD (%s)', p[2])
         # między dwoma ciągami znaków jest zawsze pojedyncza spacja
-        p[0] = p[1] + ' ' + p[2]
+        p[1].append(p[2])
+        p[0] = p[1]
         
     def p_plain_last(self, p):
         '''
         plain    : WORD
         '''
-        self.log.debug('plain: WORD (%s)' % p[1])
-        p[0] = p[1]
+        self.log.debug('plain: WORD (%s)', p[1])
+        p[0] = [p[1]]
         
     # === paragraph end ===    
         
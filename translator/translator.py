@@ -1,9 +1,64 @@
 # -*- coding: utf-8 -*-
 
+import ast
+import copy
+import inspect
+import itertools
 import logging
-import ply.lex as lex
-import ply.yacc as yacc
 import re
+import textwrap
+import threading
+import types
+import warnings
+import ply.lex as lex
+from . import tables
+from .document import HtmlBuilder, TreeBuilder
+
+
+class _DropTrace(ast.NodeTransformer):
+    '''
+    Zamienia instrukcje self.log.debug(...) na pass.
+    '''
+
+    dropped = 0
+
+    def visit_Expr(self, node):
+        f = node.value.func if isinstance(node.value, ast.Call) else None
+        if isinstance(f, ast.Attribute) and f.attr == 'debug' and \
+                isinstance(f.value, ast.Attribute) and f.value.attr == 'log' and \
+                isinstance(f.value.value, ast.Name) and f.value.value.id == 'self':
+            self.dropped += 1
+            return ast.copy_location(ast.Pass(), node)
+        return node
+
+
+def untraced(func):
+    '''
+    Kopia funkcji bez wywołań self.log.debug(...) - skompilowana z kodu
+    źródłowego, z tymi samymi numerami linii i dokumentacją. Zwraca samą
+    funkcję, gdy nie ma w niej takich wywołań albo kodu nie da się odczytać.
+    '''
+    if func.__code__.co_freevars:
+        return func
+    try:
+        source = textwrap.dedent(inspect.getsource(func))
+    except (OSError, TypeError):
+        return func
+    filename = func.__code__.co_filename
+    # ostrzeżenia (np. o sekwencjach \ w napisach) zgłosił już import modułu
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        tree = ast.parse(source, filename)
+        transformer = _DropTrace()
+        tree = transformer.visit(tree)
+        if not transformer.dropped:
+            return func
+        ast.increment_lineno(tree, func.__code__.co_firstlineno - 1)
+        code = compile(tree, filename, 'exec')
+    namespace = {}
+    exec(code, func.__globals__, namespace)
+    return namespace[func.__name__]
+
 
 class Translator(object):
     '''
@@ -13,30 +68,434 @@ class Translator(object):
      my_lex   - lexer
      my_yacc  - parser
      log      - logger
+
+    Tablice parsera i lexera są przechowywane osobno dla każdej klasy
+    (patrz moduł tables).
     '''
     
     tokens = ()
     precedence = ()
+    # flagi wyrażeń regularnych lexera
+    lex_reflags = re.MULTILINE
+    # translator zwracający tekst bez zmian (pomijany przez konwerter)
+    identity = False
+    # klasa zapisu drzewa dokumentu (translator.document.Renderer)
+    # dla translatorów wyjściowych; None - brak zapisu z drzewa
+    renderer = None
+    
+    # lexer i parser (my_lex, my_yacc); kopia z clone() wiąże je ze sobą
+    # dopiero przy pierwszym użyciu (_bind_source - translator, z którego
+    # pochodzą), bo zwykle parsuje parą bez komunikatów debug
+    _lex = None
+    _yacc = None
+    _bind_source = None
     # TODO: przełącznik na debug
     debug = 0
+    # przy wyłączonym poziomie DEBUG parsowanie używa funkcji t_* i p_*
+    # bez wywołań self.log.debug (False - zawsze oryginalne funkcje)
+    strip_trace = True
         
     def __init__(self):
         self.log = logging.getLogger(self.__class__.__name__)
         self.log.debug('Translator constructor')
-        self.my_lex = lex.lex(module=self, debug=self.debug, reflags=re.MULTILINE)
-        self.my_yacc = yacc.yacc(module=self, debug=self.debug)
+        # translatory bez gramatyki (np. PassTranslator) nie budują lexera i parsera
+        if self.tokens:
+            self.my_lex = tables.build_lexer(self, debug=self.debug, reflags=self.lex_reflags)
+            self.my_yacc = tables.build_parser(self, debug=self.debug)
     
-    def run(self, text):
+    def _bind_traced(self):
+        source = self._bind_source
+        if source is not None:
+            self._bind_source = None
+            self._lex, self._yacc = source.bind(lambda f: getattr(self, f.__name__))
+
+    @property
+    def my_lex(self):
+        self._bind_traced()
+        return self._lex
+
+    @my_lex.setter
+    def my_lex(self, lexer):
+        self._bind_traced()
+        self._lex = lexer
+
+    @property
+    def my_yacc(self):
+        self._bind_traced()
+        return self._yacc
+
+    @my_yacc.setter
+    def my_yacc(self, parser):
+        self._bind_traced()
+        self._yacc = parser
+
+    def new_context(self):
+        '''
+        Stan pojedynczego przebiegu translatora, dostępny w regułach
+        jako t.lexer.context i p.lexer.context. Domyślnie brak.
+        '''
+        return None
+    
+    def clone(self):
+        '''
+        Tania kopia translatora do jednej konwersji.
+        
+        Lexer jest kopiowany przez lexer.clone(), parser współdzieli tablice
+        z oryginałem. Funkcje t_* i p_* są wiązane z kopią, więc stan
+        zmieniany w trakcie parsowania nie przenosi się między kopiami.
+        Wiązanie odbywa się przy pierwszym użyciu pary (my_lex i my_yacc
+        albo untraced_parser()), więc kopia wiąże tylko tę, której używa.
+        '''
+        c = copy.copy(self)
+        c._untraced = None
+        if self._lex is not None:
+            c._bind_source = self._bind_source or self
+        return c
+    
+    def bind(self, rebind):
+        '''
+        Kopie lexera i parsera z funkcjami t_* i p_* zamienionymi
+        przez rebind(funkcja).
+        '''
+        def rebind_f(f):
+            return f and rebind(f)
+        
+        # niezwiązana kopia korzysta z lexera i parsera źródła - funkcje
+        # są zamieniane przez rebind, więc nie trzeba wiązać ich wcześniej
+        source = self._bind_source or self
+        my_lex, my_yacc = source._lex, source._yacc
+        lexer = my_lex.clone()
+        lexer.lexstatestack = []
+        lexer.lexstatere = dict(
+            (state, [(cre, [f and (rebind_f(f[0]), f[1]) for f in findex])
+                     for cre, findex in ritem])
+            for state, ritem in my_lex.lexstatere.items())
+        lexer.lexstateerrorf = dict((state, rebind_f(f))
+                                    for state, f in my_lex.lexstateerrorf.items())
+        lexer.lexstateeoff = dict((state, rebind_f(f))
+                                  for state, f in my_lex.lexstateeoff.items())
+        lexer.begin(my_lex.lexstate)
+        
+        parser = copy.copy(my_yacc)
+        parser.productions = [copy.copy(prod) for prod in my_yacc.productions]
+        for prod in parser.productions:
+            if prod.func:
+                prod.callable = rebind(getattr(self, prod.func))
+        parser.errorfunc = rebind_f(my_yacc.errorfunc)
+        return lexer, parser
+    
+    # lexer i parser z funkcjami bez komunikatów debug (budowane przy pierwszym użyciu)
+    _untraced = None
+    
+    def untraced_parser(self):
+        '''
+        Para (lexer, parser), której funkcje t_* i p_* nie zawierają
+        wywołań self.log.debug - używana, gdy poziom DEBUG jest wyłączony.
+        '''
+        if self._untraced is None:
+            cls = self.__class__
+            functions = cls.__dict__.get('_untraced_functions')
+            if functions is None:
+                functions = cls._untraced_functions = {}
+            
+            def rebind(f):
+                name = f.__name__
+                if name not in functions:
+                    functions[name] = untraced(getattr(cls, name))
+                return types.MethodType(functions[name], self)
+            
+            self._untraced = self.bind(rebind)
+        return self._untraced
+    
+    def run(self, text, strict=False):
+        '''
+        Wynik translatora dla tekstu (None, gdy parsowanie się nie powiodło).
+
+        strict - błąd składni zgłasza wyjątek ParseError zamiast domyślnej
+        obsługi PLY (komunikat i odrzucenie dotychczasowego wyniku).
+        '''
         if text == '':
             return ''
+        result = self.parse(text, self.new_context(), strict_errors if strict else None)
+        # reguły gramatyki zbierają fragmenty wyniku w listach (bez sklejania
+        # napisów w każdej redukcji) - łączone są raz, tutaj
+        if isinstance(result, list):
+            return ''.join(result)
+        return result
+    
+    def parse(self, text, context, errorfunc=None):
+        '''
+        Parsowanie tekstu z podanym kontekstem przebiegu; zwraca wynik
+        reguły startowej gramatyki (None, gdy parsowanie się nie powiodło).
+
+        errorfunc - funkcja wywoływana przy błędzie składni zamiast
+        domyślnej obsługi PLY (komunikat i odrzucenie dotychczasowego wyniku).
+        '''
+        # dodanie nowej linii i końca akapitu na końcu pliku - upraszcza gramatyki
+        text = text + '\n\n\n'
+        
+        # Każdy przebieg ma własną kopię lexera (zaczynającą w stanie
+        # początkowym) i parsera oraz własny kontekst - jedna instancja
+        # translatora może obsługiwać wiele wątków, a błąd w jednym
+        # tekście nie wpływa na kolejne.
+        # jedno sprawdzenie poziomu logowania na przebieg - przy wyłączonym
+        # DEBUG reguły nie wywołują nawet self.log.debug
+        if not self.strip_trace or self.log.isEnabledFor(logging.DEBUG):
+            lexer, parser = self.my_lex, self.my_yacc
         else:
-            # dodanie nowej linii i końca akapitu na końcu pliku - upraszcza gramatyki
-            text = text + '\n\n\n'
-            
-#            if self.debug == 0:
-#                print('Parsing:')
-#                print('--------')
-#                print(text)
-#                print('--------')
-                          
-            return self.my_yacc.parse(input=text, lexer=self.my_lex, debug=self.debug)
+            lexer, parser = self.untraced_parser()
+        lexer = copy.copy(lexer)
+        lexer.lexstatestack = []
+        lexer.begin('INITIAL')
+        lexer.context = context
+        parser = copy.copy(parser)
+        if errorfunc is not None:
+            parser.errorfunc = errorfunc
+        
+#        if self.debug == 0:
+#            print('Parsing:')
+#            print('--------')
+#            print(text)
+#            print('--------')
+                      
+        return parser.parse(input=text, lexer=lexer, debug=self.debug)
+    
+    def render(self, document):
+        '''
+        Zapis drzewa dokumentu (translator.document) w języku wyjściowym
+        translatora, bez parsowania HTML. Wymaga klasy renderer.
+        '''
+        return self.renderer().render(document)
+
+
+class DocumentTranslator(Translator):
+    '''
+    Bazowa klasa translatorów język znaczników -> dokument.
+    
+    Reguły gramatyki budują dokument przez budowniczego z kontekstu
+    przebiegu (p.lexer.context): run() daje tekst HTML, a document()
+    drzewo dokumentu, które translatory wyjściowe zapisują metodą render().
+
+    Szybka ścieżka (plain_fast_path): tekst jest dzielony na bloki w miejscach,
+    gdzie lexer daje koniec akapitu; bloki bez znaczników stają się akapitami
+    od razu, a parser dostaje tylko fragmenty ze znacznikami. Podklasy ustawiają:
+     block_end - wyrażenie końca bloku (pustych linii), po którym parser
+                 zaczyna kolejny blok od stanu początkowego,
+     markup    - wyrażenie znaczników języka (blok z dopasowaniem jest parsowany).
+    Liczniki bloków: block_stats (plain - szybka ścieżka, parsed - parser).
+    '''
+
+    plain_fast_path = True
+    block_end = None
+    markup = None
+
+    # liczniki wszystkich instancji są zmieniane pod jedną blokadą
+    _stats_lock = threading.Lock()
+
+    def __init__(self):
+        super().__init__()
+        self.block_stats = {'plain': 0, 'parsed': 0}
+        if self.block_end is not None:
+            self.block_end_re = re.compile(self.block_end)
+            # znaki białe, których lexer nie pomija (błąd lexera) - też do parsera
+            self.markup_re = re.compile(r'%s|[^\S \t\r\f\v\n]' % self.markup, re.MULTILINE)
+
+    def clone(self):
+        c = super().clone()
+        c.block_stats = {'plain': 0, 'parsed': 0}
+        return c
+
+    def new_context(self):
+        return HtmlBuilder()
+    
+    def run(self, text, strict=False):
+        return self.build(text, HtmlBuilder(), strict)
+    
+    def document(self, text, strict=False):
+        '''
+        Drzewo dokumentu (translator.document.Document) dla tekstu
+        albo None, gdy parsowanie się nie powiodło.
+        '''
+        return self.build(text, TreeBuilder(), strict)
+    
+    def build(self, text, builder, strict=False):
+        if text == '':
+            return builder.document([])
+        blocks = None
+        if strict:
+            # błąd w dowolnym bloku przerywa parsowanie (wyjątek) - nie ma
+            # ponownego parsowania całego tekstu
+            if self.block_end is None:
+                blocks = self.parse(text, builder, strict_errors)
+            else:
+                blocks = self.parse_blocks(text, builder)
+        elif self.plain_fast_path and self.block_end is not None:
+            try:
+                blocks = self.parse_blocks(text, builder)
+            except Exception:
+                # błąd składni albo lexera - ponowne parsowanie całego tekstu
+                # da ten sam błąd (i komunikat) co bez szybkiej ścieżki
+                self.log.debug('Block parse failed, parsing whole text')
+        if blocks is None and not strict:
+            blocks = self.parse(text, builder)
+        if blocks is None:
+            return None
+        return builder.document(blocks)
+
+    def plain_paragraph(self, lines, builder):
+        '''
+        Akapit z linii słów bloku bez znaczników - tak, jak buduje go
+        gramatyka (słowa rozdzielone pojedynczą spacją).
+        '''
+        return builder.paragraph(lines)
+
+    def parse_blocks(self, text, builder):
+        '''
+        Bloki dokumentu z szybką ścieżką dla bloków bez znaczników
+        (gdy plain_fast_path jest włączone).
+
+        Błąd składni któregoś fragmentu zgłasza ParseError, a błąd lexera
+        LexError; build() poza trybem strict parsuje wtedy cały tekst jeszcze
+        raz (PLY po błędzie składni odrzuca wcześniejsze bloki, więc wynik
+        zależy od całego tekstu).
+        '''
+        # tekst tak jak w parse() - ostatni blok też kończy koniec akapitu
+        text = text + '\n\n\n'
+        # bloki: [początek, koniec, czy zaczyna się w środku linii, linie słów]
+        blocks = []
+        pos = 0
+        mid_line = False
+        for m in self.block_end_re.finditer(text):
+            # spacje na końcu linii należą do bloku (np. '* ' to punkt listy Textile)
+            blocks.append([pos, text.index('\n', m.start()), mid_line, None])
+            pos = m.end()
+            # koniec akapitu zjada wcięcie następnej linii
+            mid_line = text[pos - 1] != '\n'
+        if pos < len(text):
+            blocks.append([pos, len(text), mid_line, None])
+
+        # bez szybkiej ścieżki wszystkie bloki trafiają do parsera
+        if self.plain_fast_path:
+            for block in blocks:
+                start, end = block[0], block[1]
+                if not self.markup_re.search(text, start, end):
+                    lines = [line.split() for line in text[start:end].split('\n')]
+                    # pusta linia - na początku tekstu albo wewnątrz bloku, gdy
+                    # puste linie nie kończą akapitu (np. po \\) - do parsera
+                    if all(lines):
+                        block[3] = lines
+        # Blok ze znacznikami zaczynający się w środku linii nie może być
+        # parsowany osobno (^ w wyrażeniach lexera pasowałoby do jego
+        # początku) - jest parsowany razem z poprzednim blokiem.
+        for n in range(len(blocks) - 1, 0, -1):
+            if blocks[n][3] is None and blocks[n][2]:
+                blocks[n - 1][3] = None
+
+        result = []
+        plain = parsed = 0
+        start = None
+        for n, (block_start, stop, _, lines) in enumerate(blocks):
+            if lines is None:
+                parsed += 1
+                if start is None:
+                    start = block_start
+                # fragment do parsowania kończy się przed kolejnym blokiem bez znaczników
+                if n + 1 < len(blocks) and blocks[n + 1][3] is None:
+                    continue
+                # bez dodanego końca akapitu - parse() dodaje go sam
+                try:
+                    part = self.parse(text[start:min(stop, len(text) - 3)], builder, strict_errors)
+                except (lex.LexError, ParseError) as e:
+                    # położenie błędu w całym tekście, jak bez podziału na bloki
+                    raise shift_error(e, start)
+                if part is None:
+                    return None
+                result.extend(part)
+                start = None
+            else:
+                plain += 1
+                result.append(self.plain_paragraph(lines, builder))
+
+        with self._stats_lock:
+            self.block_stats['plain'] += plain
+            self.block_stats['parsed'] += parsed
+        return result
+
+    def split(self, source, size, offsets=False, separators=False):
+        '''
+        Dzieli tekst na części co najmniej size znaków (ostatnia może być
+        krótsza) na końcach bloków, po których parser zaczyna od stanu
+        początkowego - nigdy wewnątrz akapitu, nagłówka ani listy i nigdy
+        przed blokiem zaczynającym się w środku linii. Puste linie między
+        częściami są pomijane. Dla tekstu bez błędów wynik translatora dla
+        całości to złączone wyniki części.
+
+        source - napis albo ciąg kawałków tekstu (np. plik otwarty w trybie
+        tekstowym); w pamięci jest tylko tekst od ostatniego podziału.
+        offsets - zamiast części pary (początek części w tekście, część);
+        separators - puste linie między częściami zostają na końcu części
+        (złączone części to cały tekst, np. dla translatora bezpośredniego).
+        '''
+        if isinstance(source, str):
+            source = [source]
+        size = max(size, 1)
+        pending = []
+        length = 0
+        # początek bufora w tekście
+        base = 0
+        # długość, od której bufor jest przeszukiwany - rośnie, gdy nie było
+        # w nim podziału, więc długi blok nie jest przeszukiwany wiele razy
+        threshold = size
+        # None - koniec tekstu, bufor jest przeszukiwany ostatni raz
+        for chunk in itertools.chain(source, [None]):
+            if chunk is not None:
+                pending.append(chunk)
+                length += len(chunk)
+                if length < threshold:
+                    continue
+            text = ''.join(pending)
+            last = 0
+            for m in self.block_end_re.finditer(text):
+                # koniec bloku na końcu bufora może się jeszcze wydłużyć,
+                # a po wcięciu następny blok zaczyna się w środku linii
+                if m.end() == len(text) or text[m.end() - 1] != '\n':
+                    continue
+                cut = text.index('\n', m.start())
+                if cut - last >= size:
+                    part = text[last:m.end() if separators else cut]
+                    yield (base + last, part) if offsets else part
+                    last = m.end()
+            pending = [text[last:]]
+            base += last
+            length = len(text) - last
+            threshold = max(size, 2 * length)
+        if length:
+            yield (base, pending[0]) if offsets else pending[0]
+
+
+class ParseError(Exception):
+    '''
+    Błąd składni w trybie strict (zamiast domyślnej obsługi PLY).
+    '''
+
+
+def shift_error(error, offset):
+    '''
+    Błąd lexera (LexError) albo składni (ParseError) z położeniem
+    przesuniętym o offset znaków - dla tekstu, który jest fragmentem
+    większego tekstu.
+    '''
+    message = re.sub(r'(?<=at index )\d+', lambda m: str(int(m.group(0)) + offset), str(error), 1)
+    if isinstance(error, ParseError):
+        return ParseError(message)
+    return lex.LexError(message, error.text)
+
+
+def strict_errors(token):
+    '''
+    Funkcja błędu składni parsera (Translator.parse, errorfunc) - zgłasza
+    ParseError z tokenem, przy którym wystąpił błąd (None - koniec tekstu).
+    '''
+    if token is None:
+        raise ParseError('Syntax error at end of input')
+    raise ParseError('Syntax error at index %d, token %s: %r' % (token.lexpos, token.type, token.value))
@@ -1,16 +1,21 @@
-from translator.translator import Translator
-import re
+from translator.translator import DocumentTranslator
 
-class Txt2TagsToHTML(Translator):
+class Txt2TagsToHTML(DocumentTranslator):
     '''
     Translator txt2tags -> XML (języka wewnętrznego)
     '''
         
     def __init__(self):
         super().__init__()
-        self.log.debug('%s constructor' % self.__class__.__name__)
+        self.log.debug('%s constructor', self.__class__.__name__)
         
     
+    # Koniec akapitu (PAREND) tam, gdzie daje go lexer - nie po \\
+    # (łamanie linii zjada kolejne puste linie).
+    block_end = r'(?<![\s\\])[ \t\r\f\v]*(?:\n\s*){2,}'
+    # znaczniki formatowania, nagłówka, łamania linii i punktów list
+    markup = r'\*\*|//|__|=|\\\\|^\ *[-+]\ '
+
     tokens = (
         'PAREND',
         'NEWLINE',
@@ -60,7 +65,7 @@ class Txt2TagsToHTML(Translator):
         r'\*\*(?=[^\s])'
         # dorzucenie stanu otwartego bold
         t.lexer.push_state('bs')
-        self.log.debug('BOLD_S token: ' + t.value)
+        self.log.debug('BOLD_S token: %s', t.value)
         return t
     
     # znacznik rozpoczynający kursywę: //<znak>
@@ -69,7 +74,7 @@ class Txt2TagsToHTML(Translator):
         r'\/\/(?=[^\s])'
         # dorzucenie stanu otwartego italic
         t.lexer.push_state('is')
-        self.log.debug('ITALIC_S token: ' + t.value)
+        self.log.debug('ITALIC_S token: %s', t.value)
         return t
     
     def t_INITIAL_bs_is_UNDERLINE_S(self, t):
@@ -86,7 +91,7 @@ class Txt2TagsToHTML(Translator):
     # **// **__
     def t_tagend_BOLD_E_E(self, t):
         r'\*\*(?=\/\/|\_\_)'
-        self.log.debug('t_be_BOLD_E_X: ' + t.value)
+        self.log.debug('t_be_BOLD_E_X: %s', t.value)
         t.lexer.pop_state() # tag end
         t.lexer.pop_state() # tag start
         t.lexer.push_state('tagend')
@@ -97,11 +102,11 @@ class Txt2TagsToHTML(Translator):
     # do jakiegoś innego tokena. W tym celu używa się flagi format['bold'].  
     def t_tagend_BOLD_E(self, t):
         r'\*\*'
-        self.log.debug('**<- ' + str(t.lexer.lexstatestack))
+        self.log.debug('**<- %s', t.lexer.lexstatestack)
         # zdjęcie stanu tagend - koniec bold
         t.lexer.pop_state()
         t.lexer.pop_state() # tag start
-        self.log.debug('t_be_BOLD_E: ' + t.value)
+        self.log.debug('t_be_BOLD_E: %s', t.value)
         return t
 
     # --- ITALIC ---
@@ -120,7 +125,7 @@ class Txt2TagsToHTML(Translator):
         # zdjęcie stanu ie - koniec italic
         t.lexer.pop_state()
         t.lexer.pop_state() # tag start
-        self.log.debug('t_ie_ITALIC_E: ' + t.value)
+        self.log.debug('t_ie_ITALIC_E: %s', t.value)
         return t
     
     # --- UNDERLINE ---
@@ -146,7 +151,7 @@ class Txt2TagsToHTML(Translator):
         r'={1,5}'
         lvl = t.value.count('=')
         t.lexer.push_state('head%s' % str(lvl))
-        t.value = '<h%s>' % str(lvl)
+        t.value = lvl
         self.log.debug('H>')
         return t
     
@@ -190,25 +195,25 @@ class Txt2TagsToHTML(Translator):
     # wg specyfikacji po - musi wystąpić dokładnie jedna spacja po -
     def t_INITIAL_BULLET1(self, t):
         r'^-\ (?=\S)'
-        self.log.debug('Bullet: [%s]' % (t.value))
+        self.log.debug('Bullet: [%s]', t.value)
         return t
     
     # drugi poziom wypunktowania
     def t_INITIAL_BULLET2(self, t):
         r'^(\ )+-\ (?=\S)'
-        self.log.debug('Bullet II: [%s]' % (t.value))
+        self.log.debug('Bullet II: [%s]', t.value)
         return t
     
     # wg specyfikacji po - musi wystąpić dokładnie jedna spacja po -
     def t_INITIAL_NUM_BULLET1(self, t):
         r'^\+\ (?=\S)'
-        self.log.debug('Num bullet: [%s]' % (t.value))
+        self.log.debug('Num bullet: [%s]', t.value)
         return t
     
     # drugi poziom wypunktowania
     def t_INITIAL_NUM_BULLET2(self, t):
         r'^(\ )+\+\ (?=\S)'
-        self.log.debug('Num bullet II: [%s]' % (t.value))
+        self.log.debug('Num bullet II: [%s]', t.value)
         return t
 
 
@@ -218,7 +223,6 @@ class Txt2TagsToHTML(Translator):
     def t_ANY_break_BREAKLINE(self, t):
         r'\\\\\s*\n'
         self.log.debug('BREAKLINE')
-        t.value = r'<br/>'
         return t
 
     # Szukamy pierwszego wystąpienia zamykającego taga, 
@@ -226,29 +230,29 @@ class Txt2TagsToHTML(Translator):
     # Znaków taga nie bierzemy do wyniku wyrażenia regularnego
     # - będą użyte przy pobraniu taga zamykającego.
     def t_bs_is_us_WORD(self, t):
-        r'[^\s]+?(?=(\*\*)|(\/\/)|(\_\_))'
+        r'[^\s][^\s*/_]*(?:(?:\*(?!\*)|/(?!/)|_(?!_))[^\s*/_]*)*(?=\*\*|//|__)'
         # lexer gotowy na pobranie znaków zamykających bold
         t.lexer.push_state('tagend')
-        self.log.debug('WORD ending tag token: ' + t.value)
+        self.log.debug('WORD ending tag token: %s', t.value)
         return t
 
     # Ostatnie słowo w nagłówku przed =
     def t_head_WORD(self, t):
         r'[^\s]+(?=\=)'
-        self.log.debug('head WORD token: ' + t.value)
+        self.log.debug('head WORD token: %s', t.value)
         return t
 
     # Słowo wykrywane we wszystkich trybach
     def t_ANY_WORD(self, t):
-        r'[^\s]+'
-        # sprawdzenie, czy od razu po słowie nie następuje
-        # znacznik łamania linii
-        check_break = re.match(r'(\w+)(?=\\\\)', t.value)
+        r'(?P<break_word>\w+)\\\\\S*|[^\s]+'
+        # słowo, po którym od razu następuje znacznik łamania linii
+        # (grupa break_word wyrażenia lexera - bez drugiego wyrażenia)
+        check_break = t.lexer.lexmatch.group('break_word')
         if check_break:
             # odcięcie \\ od słowa
-            t.value = check_break.group(0)
+            t.value = check_break
             t.lexer.lexpos -= 2
-        self.log.debug('WORD normal token: ' + t.value)
+        self.log.debug('WORD normal token: %s', t.value)
         return t
 
     # --- NOWE LINIE
@@ -274,14 +278,15 @@ class Txt2TagsToHTML(Translator):
         '''
         document    : document block
         '''
-        self.log.debug('document: document (%s) block (%s)' % (p[1], p[2]))
-        p[0] = p[1] + p[2]
+        self.log.debug('document: document block (%s)', p[2])
+        p[1].extend(p[2])
+        p[0] = p[1]
     
     def p_document_single(self, p):
         '''
         document    : block
         '''
-        self.log.debug('document: block (%s)' % (p[1]))
+        self.log.debug('document: block (%s)', p[1])
         p[0] =  p[1]
     
     # blok: różne
@@ -291,8 +296,8 @@ class Txt2TagsToHTML(Translator):
                     | list1
                     | enum1
         '''
-        self.log.debug('block: %s' % (p[1]))
-        p[0] = p[1]
+        self.log.debug('block: %s', p[1])
+        p[0] = [p[1]]
 
     
     # akapit oddzielony od dołu
@@ -300,8 +305,8 @@ class Txt2TagsToHTML(Translator):
         '''
         block    : paragraph PAREND
         '''
-        self.log.debug('block: par %s' % (p[1]))
-        p[0] = '<p>%s</p>' % (p[1])
+        self.log.debug('block: par %s', p[1])
+        p[0] = [p.lexer.context.paragraph(p[1])]
 
     # akapit, po którym od razu następuje nagłówek
     def p_block_par_head(self, p):
@@ -310,8 +315,8 @@ class Txt2TagsToHTML(Translator):
                 | paragraph list1
                 | paragraph enum1
         '''
-        self.log.debug('block: par (%s) other (%s)' %(p[1], p[2]))
-        p[0] = '<p>%s</p>\n%s' % (p[1], p[2])
+        self.log.debug('block: par (%s) other (%s)', p[1], p[2])
+        p[0] = [p.lexer.context.paragraph(p[1], separated=False), p[2]]
 
     # === lista ===
     
@@ -322,7 +327,7 @@ class Txt2TagsToHTML(Translator):
         list1    : list_pos1
         list2    : list_pos2
         '''
-        p[0] = '<ul>%s</ul>' % (p[1])
+        p[0] = p.lexer.context.bullet_list(p[1])
 
     # Pozycja listy.
     # Dla I poziomu: albo kolejna pozycja zwykła, albo zagnieżdżona lista
@@ -334,7 +339,8 @@ class Txt2TagsToHTML(Translator):
                         | list_pos1 enum2
         list_pos2    : list_pos2 list_content2
         '''
-        p[0] = '%s\n%s' % (p[1], p[2])
+        p[1].append(p[2])
+        p[0] = p[1]
 
     # Pojedyncza pozycja listy, podobnie jak w p_list_pos.
     def p_list_pos_single(self, p):
@@ -344,7 +350,7 @@ class Txt2TagsToHTML(Translator):
                         | enum2
         list_pos2    : list_content2
         '''
-        p[0] = p[1]
+        p[0] = [p[1]]
 
     # Zwykła zawartość pozycji listy: punkt odpowiedniego poziomu i treść
     def p_list_content(self, p):
@@ -352,7 +358,7 @@ class Txt2TagsToHTML(Translator):
         list_content1    : BULLET1 paragraph
         list_content2    : BULLET2 paragraph
         '''
-        p[0] = '<li>%s</li>' % (p[2])
+        p[0] = p.lexer.context.item(p[2])
 
     # === lista numerowana ===
     
@@ -363,7 +369,7 @@ class Txt2TagsToHTML(Translator):
         enum1    : enum_pos1
         enum2    : enum_pos2
         '''
-        p[0] = '<ol>%s</ol>' % (p[1])
+        p[0] = p.lexer.context.numbered_list(p[1])
 
     # Pozycja enumy.
     # Dla I poziomu: albo kolejna pozycja zwykła, albo zagnieżdżona enuma
@@ -375,7 +381,8 @@ class Txt2TagsToHTML(Translator):
                         | enum_pos1 list2
         enum_pos2    : enum_pos2 enum_content2
         '''
-        p[0] = '%s\n%s' % (p[1], p[2])
+        p[1].append(p[2])
+        p[0] = p[1]
 
     # Pojedyncza pozycja enumy, podobnie jak w p_enum_pos.
     def p_enum_pos_single(self, p):
@@ -385,7 +392,7 @@ class Txt2TagsToHTML(Translator):
                         | list2
         enum_pos2    : enum_content2
         '''
-        p[0] = p[1]
+        p[0] = [p[1]]
 
     # Zwykła zawartość pozycji enumy: punkt odpowiedniego poziomu i treść
     def p_enum_content(self, p):
@@ -393,7 +400,7 @@ class Txt2TagsToHTML(Translator):
         enum_content1    : NUM_BULLET1 paragraph
         enum_content2    : NUM_BULLET2 paragraph
         '''
-        p[0] = '<li>%s</li>' % (p[2])
+        p[0] = p.lexer.context.item(p[2])
 
 
 
@@ -404,31 +411,33 @@ class Txt2TagsToHTML(Translator):
         '''
         paragraph   : line_content
         '''
-        self.log.debug('pc: lc %s' % (p[1]))
-        p[0] = p[1]
+        self.log.debug('pc: lc %s', p[1])
+        p[0] = [p[1]]
         
     # Zawartość akapitu ze znakami nowej linii wewnątrz
     def p_paragraph_wnl(self, p):
         '''
         paragraph   : paragraph NEWLINE line_content
         '''
-        self.log.debug('pc: pc %s NL lc %s' % (p[1], p[3]))
-        p[0] = p[1] + '\n' + p[3]
+        self.log.debug('pc: pc NL lc %s', p[3])
+        p[1].append(p[3])
+        p[0] = p[1]
         
     # Zawartość pojedynczej linii (wiele elementów)
     def p_line_content(self, p):
         '''
         line_content   : line_content element
         '''
-        self.log.debug('lc: lc %s element %s' % (p[1], p[2]))
-        p[0] = p[1] + ' ' + p[2]
+        self.log.debug('lc: lc element %s', p[2])
+        p[1].extend(p[2])
+        p[0] = p[1]
     
     # Zawartość pojedynczej linii - jedyny, bądź pierwszy element
     def p_line_content_single(self, p):
         '''
         line_content    : element
         '''
-        self.log.debug('lc (single) %s' % (p[1]))
+        self.log.debug('lc (single) %s', p[1])
         p[0] = p[1]
         
     # Pusta linia - może pojawić się na końcu pliku
@@ -437,14 +446,14 @@ class Txt2TagsToHTML(Translator):
         line_content    : 
         '''
         self.log.debug('lc BLANK')
-        p[0] = ''
+        p[0] = []
         
     
     def p_heading(self, p):
         '''
         heading    : HEADING_S plain HEADING_E
         '''
-        p[0] = '%s%s%s' % (p[1], p[2], p[3])
+        p[0] = p.lexer.context.heading(p[1], [p[2]])
             
     def p_element(self, p):
         '''
@@ -453,14 +462,14 @@ class Txt2TagsToHTML(Translator):
                     | italic
                     | underline
         '''
-        self.log.debug('element: (...) (%s)' % (p[1]))
+        self.log.debug('element: (...) (%s)', p[1])
         p[0] = p[1]
         
     def p_bold(self, p):
         '''
         bold    : BOLD_S line_content bold_end
         '''
-        p[0] = '<b>%s</b>' % p[2]
+        p[0] = [p.lexer.context.bold(p[2])]
         
     def p_bold_end(self, p):
         '''
@@ -473,7 +482,7 @@ class Txt2TagsToHTML(Translator):
         '''
         italic    : ITALIC_S line_content italic_end
         '''
-        p[0] = '<i>%s</i>' % p[2]
+        p[0] = [p.lexer.context.italic(p[2])]
         
     def p_italic_end(self, p):
         '''
@@ -486,7 +495,7 @@ class Txt2TagsToHTML(Translator):
         '''
         underline    : UNDERLINE_S line_content underline_end
         '''
-        p[0] = '<u>%s</u>' % p[2]
+        p[0] = [p.lexer.context.underline(p[2])]
         
     def p_underline_end(self, p):
         '''
@@ -498,16 +507,28 @@ class Txt2TagsToHTML(Translator):
     def p_plain(self, p):
         '''
         plain    : plain WORD
-                    | plain BREAKLINE
         '''
-        self.log.debug('plain: plain (%s) WORD (%s)' % (p[1], p[2]))
+        self.log.debug('plain: plain WORD (%s)', p[2])
         # między dwoma ciągami znaków jest zawsze pojedyncza spacja
-        p[0] = p[1] + ' ' + p[2]
+        p[1].append(p[2])
+        p[0] = p[1]
+        
+    def p_plain_break(self, p):
+        '''
+        plain    : plain BREAKLINE
+        '''
+        p[1].append(p.lexer.context.line_break())
+        p[0] = p[1]
         
     def p_plain_last(self, p):
         '''
         plain    : WORD
-                    | BREAKLINE
         '''
-        self.log.debug('plain: WORD (%s)' % p[1])
-        p[0] = p[1]
+        self.log.debug('plain: WORD (%s)', p[1])
+        p[0] = [p[1]]
+        
+    def p_plain_break_last(self, p):
+        '''
+        plain    : BREAKLINE
+        '''
+        p[0] = [p.lexer.context.line_break()]